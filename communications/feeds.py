@@ -0,0 +1,195 @@
+# communications/feeds.py
+
+"""
+iCalendar and JSON feeds of NGO events, global and per NGO.
+
+Each feed is rendered once and kept, together with its ETag and
+Last-Modified stamp, in the shared 'event_feeds' cache namespace
+(core/cache.py) and in a per-process copy that lives for
+EVENT_FEED_CACHE_SECONDS. Polls are answered from the per-process copy, so
+steady-state polling (including the 304s for clients sending If-None-Match /
+If-Modified-Since) never touches the database, even when the shared cache
+is the database cache table.
+
+Event saves/deletes and volunteer changes drop the affected feeds after
+commit (so a concurrent rebuild cannot re-cache the old rows): at once in
+the process that made the change and in the shared cache. Other workers
+keep serving their copy until it expires.
+"""
+
+import hashlib
+import json
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from core.cache import CacheNamespace, LRUCache
+from users.models import NGOProfile
+from .models import Event
+
+FEED_FORMATS = {
+    'ics': 'text/calendar; charset=utf-8',
+    'json': 'application/json',
+}
+
+feed_cache = CacheNamespace('event_feeds')
+# This process's copies of the feeds in feed_cache.
+_local_feeds = LRUCache()
+
+
+def _cache_key(fmt, ngo_id=None):
+    scope = f'ngo:{ngo_id}' if ngo_id else 'all'
+    return f'{scope}:{fmt}'
+
+
+def invalidate_event_feeds(ngo_ids=None):
+    """
+    Drops the global feeds and those of `ngo_ids` once the current transaction
+    commits. With ngo_ids=None every feed is dropped.
+    """
+    def invalidate():
+        if ngo_ids is None:
+            _local_feeds.clear()
+            feed_cache.invalidate()
+            return
+        keys = []
+        for fmt in FEED_FORMATS:
+            keys.append(_cache_key(fmt))
+            keys.extend(_cache_key(fmt, ngo_id) for ngo_id in ngo_ids)
+        for key in keys:
+            _local_feeds.delete(key)
+        feed_cache.delete(*keys)
+    transaction.on_commit(invalidate)
+
+
+def _feed_events(ngo_id=None):
+    since = timezone.now() - timedelta(days=settings.EVENT_FEED_PAST_DAYS)
+    events = Event.objects.filter(event_date__gte=since).select_related('ngo__ngoprofile').order_by('event_date', 'id')
+    if ngo_id:
+        events = events.filter(ngo_id=ngo_id)
+    return list(events[:settings.EVENT_FEED_MAX_EVENTS])
+
+
+# --- iCalendar (RFC 5545) ---
+
+def _ics_escape(value):
+    return (value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def _ics_fold(line):
+    """Folds a content line at 75 octets, as RFC 5545 requires."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts, limit = [], 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        while cut < len(encoded) and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1  # Don't split a multi-byte character.
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded, limit = encoded[cut:], 74
+    return '\r\n '.join(parts)
+
+
+def _ics_time(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _render_ics(events, name, host, event_url):
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Kindway//Events//EN',
+        'CALSCALE:GREGORIAN',
+        f'X-WR-CALNAME:{_ics_escape(name)}',
+    ]
+    for event in events:
+        ngo_name = event.ngo.ngoprofile.ngo_name if hasattr(event.ngo, 'ngoprofile') else event.ngo.username
+        # The organiser's login email stays private; the feed only names the NGO.
+        description = f"{event.description}\n\nOrganised by {ngo_name}"
+        if event.capacity:
+            description += f"\n\nVolunteers: {event.volunteer_count} / {event.capacity}"
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:event-{event.pk}@{host}',
+            f'DTSTAMP:{_ics_time(event.created_at)}',
+            f'DTSTART:{_ics_time(event.event_date)}',
+            f'SUMMARY:{_ics_escape(event.title)}',
+            f'DESCRIPTION:{_ics_escape(description)}',
+            f'LOCATION:{_ics_escape(event.location)}',
+            f'URL:{event_url}',
+        ]
+        if event.latitude is not None and event.longitude is not None:
+            lines.append(f'GEO:{event.latitude};{event.longitude}')
+        lines.append('END:VEVENT')
+    lines.append('END:VCALENDAR')
+    return ''.join(_ics_fold(line) + '\r\n' for line in lines)
+
+
+# --- JSON ---
+
+def _render_json(events, name, event_url):
+    return json.dumps({
+        'name': name,
+        'events': [
+            {
+                'id': event.pk,
+                'title': event.title,
+                'description': event.description,
+                'location': event.location,
+                'latitude': event.latitude,
+                'longitude': event.longitude,
+                'start': event.event_date,
+                'ngo_id': event.ngo_id,
+                'ngo_name': event.ngo.ngoprofile.ngo_name if hasattr(event.ngo, 'ngoprofile') else event.ngo.username,
+                'capacity': event.capacity,
+                'volunteer_count': event.volunteer_count,
+                'url': event_url,
+            }
+            for event in events
+        ],
+    }, cls=DjangoJSONEncoder)
+
+
+def get_event_feed(fmt, ngo_id=None):
+    """
+    Returns the cached feed as a dict {'body', 'etag', 'last_modified'},
+    rendering and caching it first if needed. Returns None for an unknown NGO.
+    """
+    key = _cache_key(fmt, ngo_id)
+    feed = _local_feeds.get(key, None)
+    if feed is None:
+        feed = feed_cache.get_or_set(key, lambda: _build_feed(fmt, ngo_id), settings.EVENT_FEED_CACHE_SECONDS)
+        if feed is not None:
+            _local_feeds.set(key, feed, settings.EVENT_FEED_CACHE_SECONDS)
+    return feed
+
+
+def _build_feed(fmt, ngo_id):
+    name = "Kindway events"
+    if ngo_id:
+        profile = NGOProfile.objects.filter(user_id=ngo_id).only('ngo_name').first()
+        if profile is None:
+            return None
+        name = f"{profile.ngo_name} events on Kindway"
+    # The cached body is shared by every caller, so links and UIDs come from the
+    # configured Site, never from the request's Host header.
+    host = Site.objects.get_current().domain
+    event_url = f"https://{host}{reverse('event_list')}"
+    events = _feed_events(ngo_id)
+    if fmt == 'ics':
+        body = _render_ics(events, name, host, event_url)
+    else:
+        body = _render_json(events, name, event_url)
+    feed = {
+        'body': body,
+        'etag': '"%s"' % hashlib.md5(body.encode('utf-8'), usedforsecurity=False).hexdigest(),
+        # Feeds are only rebuilt after a change, so build time is a safe Last-Modified.
+        'last_modified': timezone.now().replace(microsecond=0),
+    }
+    return feed
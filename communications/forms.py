@@ -4,10 +4,16 @@ from .models import Event , SuccessStory
 class EventForm(forms.ModelForm):
     class Meta:
         model = Event
-        fields = ['title', 'description', 'location', 'event_date']
+        fields = ['title', 'description', 'location', 'event_date', 'capacity']
         widgets = {
             'event_date': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
         }
+        labels = {
+            'capacity': 'Volunteer capacity',
+        }
+        help_texts = {
+            'capacity': 'Leave blank for no limit. Extra signups go on a waitlist.',
+        }
 class SuccessStoryForm(forms.ModelForm):
     class Meta:
         model = SuccessStory
@@ -6,14 +6,64 @@ class Event(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     location = models.CharField(max_length=255)
+    # Filled in from `location` by the background geocoder (communications/signals.py).
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
     event_date = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
 
     # This field will track all the users who have signed up to volunteer.
     volunteers = models.ManyToManyField(settings.AUTH_USER_MODEL, related_name='volunteered_events', blank=True)
+    # Maximum number of volunteers; blank means unlimited.
+    capacity = models.PositiveIntegerField(null=True, blank=True)
+    # Denormalized len(volunteers), maintained by communications/services.py
+    # so signups can be capacity-checked with a single conditional UPDATE.
+    volunteer_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['event_date'], name='communications_event_date_idx'),
+            # Serves "events near me": bounding box plus date range in one index scan.
+            models.Index(fields=['latitude', 'longitude', 'event_date'], name='communications_event_geo_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_location = instance.__dict__.get('location')
+        return instance
+
+    def save(self, *args, **kwargs):
+        # A new location invalidates the old coordinates; the geocoder refills them.
+        if self.pk and getattr(self, '_loaded_location', self.location) != self.location:
+            self.latitude = self.longitude = None
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'latitude', 'longitude'}
+        super().save(*args, **kwargs)
+        self._loaded_location = self.location
+
+    @property
+    def is_full(self):
+        return self.capacity is not None and self.volunteer_count >= self.capacity
+
+
+class EventWaitlistEntry(models.Model):
+    """A user waiting for a spot on a full event; promoted first come, first served."""
+    event = models.ForeignKey(Event, related_name='waitlist', on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='event_waitlist_entries', on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['event', 'user'], name='communications_waitlist_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} waiting for {self.event.title}"
     
 class SuccessStory(models.Model):
     name = models.CharField(max_length=100)
@@ -0,0 +1,141 @@
+# communications/services.py
+
+"""
+Volunteer signups with capacity limits, and event geocoding / radius search.
+
+A signup is a conditional UPDATE on Event.volunteer_count
+(... WHERE volunteer_count < capacity) followed by an INSERT into the
+volunteers through table, in one short transaction. The database only
+holds the event row for those two statements, so bursts of signups for a
+popular drive neither oversell it nor queue up behind long-held locks.
+The unique constraint on the through table makes repeated signups no-ops.
+"""
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.geo import distance_km, geocode, within_bounding_box
+from messaging.models import Notification
+from .feeds import invalidate_event_feeds
+from .models import Event, EventWaitlistEntry
+
+Volunteer = Event.volunteers.through
+
+# Results of sign_up_volunteer()
+SIGNED_UP = 'SIGNED_UP'
+ALREADY_SIGNED_UP = 'ALREADY_SIGNED_UP'
+WAITLISTED = 'WAITLISTED'
+ALREADY_WAITLISTED = 'ALREADY_WAITLISTED'
+CLOSED = 'CLOSED'
+
+
+def _claim_spot(event_id, user_id):
+    """Takes one free spot for the user. Returns True on success, False if full/past/duplicate."""
+    try:
+        with transaction.atomic():
+            won = Event.objects.filter(
+                Q(capacity__isnull=True) | Q(volunteer_count__lt=F('capacity')),
+                pk=event_id,
+                event_date__gt=timezone.now(),
+            ).update(volunteer_count=F('volunteer_count') + 1)
+            if not won:
+                return False
+            Volunteer.objects.create(event_id=event_id, customuser_id=user_id)
+    except IntegrityError:
+        # A concurrent duplicate signup got there first; the increment rolled back.
+        return False
+    return True
+
+
+def sign_up_volunteer(event, user):
+    """Signs `user` up for `event`, or puts them on the waitlist if it is full."""
+    if event.event_date <= timezone.now():
+        return CLOSED
+    if Volunteer.objects.filter(event_id=event.pk, customuser_id=user.pk).exists():
+        return ALREADY_SIGNED_UP
+    if _claim_spot(event.pk, user.pk):
+        invalidate_event_feeds([event.ngo_id])
+        return SIGNED_UP
+    if Volunteer.objects.filter(event_id=event.pk, customuser_id=user.pk).exists():
+        return ALREADY_SIGNED_UP
+    if event.capacity is None and not Event.objects.filter(pk=event.pk, event_date__gt=timezone.now()).exists():
+        return CLOSED
+
+    _, created = EventWaitlistEntry.objects.get_or_create(event=event, user=user)
+    return WAITLISTED if created else ALREADY_WAITLISTED
+
+
+def withdraw_volunteer(event, user):
+    """
+    Removes `user` from the event (or its waitlist) and hands the freed
+    spot to the first person on the waitlist. Returns True if a spot was freed.
+    """
+    with transaction.atomic():
+        removed, _ = Volunteer.objects.filter(event_id=event.pk, customuser_id=user.pk).delete()
+        if not removed:
+            EventWaitlistEntry.objects.filter(event=event, user=user).delete()
+            return False
+        Event.objects.filter(pk=event.pk).update(volunteer_count=F('volunteer_count') - 1)
+    promote_from_waitlist(event)
+    invalidate_event_feeds([event.ngo_id])
+    return True
+
+
+def promote_from_waitlist(event):
+    """Fills free spots on `event` from its waitlist, oldest entry first."""
+    for entry in EventWaitlistEntry.objects.filter(event=event).select_related('event'):
+        if not _claim_spot(event.pk, entry.user_id):
+            if Volunteer.objects.filter(event_id=event.pk, customuser_id=entry.user_id).exists():
+                entry.delete()  # Already volunteering; just drop the stale entry.
+                continue
+            break  # Full again (or the event has started).
+        entry.delete()
+        Notification.objects.create(
+            recipient_id=entry.user_id,
+            title=f"You're in! A spot opened up for '{event.title}'",
+            body="You have been moved from the waitlist to the volunteer list.",
+        )
+
+
+def recount_volunteers(event_ids):
+    """Re-derives volunteer_count from the through table (after admin edits, seeding, ...)."""
+    counts = Volunteer.objects.filter(event_id=OuterRef('pk')).values('event_id').annotate(n=Count('*')).values('n')
+    Event.objects.filter(pk__in=event_ids).update(volunteer_count=Coalesce(Subquery(counts), 0))
+
+
+# --- Location ---
+
+def geocode_event(event_id):
+    """Background task: resolves an event's free-text location into coordinates."""
+    event = Event.objects.filter(pk=event_id).only('location', 'ngo_id').first()
+    if event is None or not event.location:
+        return
+    coords = geocode(f"{event.location}, India")
+    if coords:
+        # Only if the location is still the one we looked up.
+        if Event.objects.filter(pk=event_id, location=event.location).update(latitude=coords[0], longitude=coords[1]):
+            invalidate_event_feeds([event.ngo_id])
+
+
+def events_near(queryset, center, radius_km, date_from=None, date_to=None):
+    """
+    Returns the events in `queryset` within `radius_km` of `center`, soonest
+    first, each with a `distance_km` attribute. The bounding box and date
+    range are answered together from communications_event_geo_idx; only the
+    few candidates inside the box get the exact distance check.
+    """
+    queryset = within_bounding_box(queryset, center, radius_km)
+    if date_from:
+        queryset = queryset.filter(event_date__gte=date_from)
+    if date_to:
+        queryset = queryset.filter(event_date__lt=date_to)
+
+    events = []
+    for event in queryset.order_by('event_date', 'id')[:settings.EVENTS_NEARBY_MAX_RESULTS]:
+        event.distance_km = round(distance_km(center, (event.latitude, event.longitude)), 1)
+        if event.distance_km <= radius_km:
+            events.append(event)
+    return events
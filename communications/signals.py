@@ -0,0 +1,53 @@
+# communications/signals.py
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from core.tasks import run_after_commit
+from users.models import NGOProfile
+from .feeds import invalidate_event_feeds
+from .models import Event
+from .services import geocode_event, recount_volunteers
+
+
+@receiver(post_save, sender=Event)
+def queue_event_geocoding(sender, instance, raw=False, **kwargs):
+    """Geocodes new or moved events on the background worker, after commit."""
+    if raw or not instance.location or instance.latitude is not None:
+        return
+    run_after_commit(geocode_event, instance.pk)
+
+
+@receiver(m2m_changed, sender=Event.volunteers.through)
+def sync_volunteer_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keeps Event.volunteer_count right when volunteers are edited through the
+    ORM directly (admin, shell, fixtures) instead of communications/services.py.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recount_volunteers([instance.pk])
+        invalidate_event_feeds([instance.ngo_id])
+    elif pk_set:
+        recount_volunteers(pk_set)
+        invalidate_event_feeds(set(Event.objects.filter(pk__in=pk_set).values_list('ngo_id', flat=True)))
+    else:
+        # user.volunteered_events.clear(): the affected events are gone from the
+        # through table already, so recount every event that may have changed.
+        recount_volunteers(Event.objects.filter(volunteer_count__gt=0).values('pk'))
+        invalidate_event_feeds()
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def drop_event_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate_event_feeds([instance.ngo_id])
+
+
+@receiver(post_save, sender=NGOProfile)
+def drop_ngo_event_feeds(sender, instance, raw=False, **kwargs):
+    """Feeds carry the NGO's name."""
+    if not raw:
+        invalidate_event_feeds([instance.user_id])
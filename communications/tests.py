@@ -1,3 +1,139 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.sites.models import Site
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import cache as two_tier_cache
+from messaging.models import Notification
+from users.models import CustomUser, NGOProfile
+from .feeds import invalidate_event_feeds
+from .models import Event, EventWaitlistEntry
+from .services import (
+    ALREADY_SIGNED_UP, CLOSED, SIGNED_UP, WAITLISTED, promote_from_waitlist, sign_up_volunteer, withdraw_volunteer,
+)
+
+
+def make_user(name, user_type='DONOR'):
+    return CustomUser.objects.create_user(name, f'{name}@example.com', 'pw', user_type=user_type)
+
+
+def make_event(ngo, **fields):
+    fields = {
+        'title': 'Beach clean-up', 'description': 'Bring gloves', 'location': 'Juhu Beach',
+        'event_date': timezone.now() + timedelta(days=7), **fields,
+    }
+    return Event.objects.create(ngo=ngo, **fields)
+
+
+class VolunteerSignupTests(TestCase):
+    def setUp(self):
+        self.event = make_event(make_user('ngo', 'NGO'), capacity=2)
+        self.users = [make_user(f'v{i}') for i in range(4)]
+
+    def test_signups_past_capacity_go_to_the_waitlist(self):
+        # Every signup works from the instance loaded before any of them ran,
+        # as concurrent requests would: its volunteer_count still says 0.
+        stale = Event.objects.get(pk=self.event.pk)
+        results = [sign_up_volunteer(stale, user) for user in self.users]
+
+        self.assertEqual(results, [SIGNED_UP, SIGNED_UP, WAITLISTED, WAITLISTED])
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.volunteer_count, self.event.volunteers.count()), (2, 2))
+        self.assertEqual(sign_up_volunteer(stale, self.users[0]), ALREADY_SIGNED_UP)
+        self.assertEqual(Event.objects.get(pk=self.event.pk).volunteer_count, 2)
+
+    def test_past_events_are_closed(self):
+        past = make_event(self.event.ngo, event_date=timezone.now() - timedelta(hours=1))
+        self.assertEqual(sign_up_volunteer(past, self.users[0]), CLOSED)
+        self.assertFalse(past.volunteers.exists())
+
+    def test_a_freed_spot_goes_to_the_oldest_waitlist_entry(self):
+        for user in self.users:
+            sign_up_volunteer(self.event, user)
+        self.assertTrue(withdraw_volunteer(self.event, self.users[0]))
+
+        self.assertEqual(set(self.event.volunteers.all()), {self.users[1], self.users[2]})
+        self.assertEqual([e.user for e in EventWaitlistEntry.objects.filter(event=self.event)], [self.users[3]])
+        self.assertEqual(Notification.objects.get().recipient, self.users[2])
+        self.assertEqual(Event.objects.get(pk=self.event.pk).volunteer_count, 2)
+
+    def test_promotion_skips_entries_of_people_already_volunteering(self):
+        sign_up_volunteer(self.event, self.users[0])
+        EventWaitlistEntry.objects.create(event=self.event, user=self.users[0])
+        EventWaitlistEntry.objects.create(event=self.event, user=self.users[1])
+        promote_from_waitlist(self.event)
+
+        self.assertEqual(set(self.event.volunteers.all()), {self.users[0], self.users[1]})
+        self.assertFalse(EventWaitlistEntry.objects.exists())
+        self.assertEqual(Event.objects.get(pk=self.event.pk).volunteer_count, 2)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EventsNearbyTests(TestCase):
+    def setUp(self):
+        two_tier_cache.clear()
+
+    def test_pincode_search_geocodes_each_pincode_once(self):
+        with mock.patch('users.services.geocode', return_value=(18.52, 73.85)) as geocode:
+            for _ in range(3):
+                response = Client().get(reverse('events_nearby'), {'pincode': '411001'})
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.context['has_location'])
+        geocode.assert_called_once_with("411001, IN", raise_errors=True)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class EventFeedTests(TestCase):
+    def setUp(self):
+        two_tier_cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_event_feeds()
+        Site.objects.update(domain='kindway.example')
+        Site.objects.clear_cache()
+        self.ngo = make_user('ngo', 'NGO')
+        NGOProfile.objects.create(user=self.ngo, ngo_name='Food Bank', address='Pune', latitude=18.52, longitude=73.85)
+        self.event = make_event(self.ngo, capacity=5)
+        self.url = reverse('ngo_event_feed', args=[self.ngo.pk, 'ics'])
+
+    def test_unchanged_feeds_are_answered_with_304_from_the_cache(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode().replace('\r\n ', '')  # Unfold long lines.
+        self.assertIn(f'UID:event-{self.event.pk}@kindway.example', body)
+        self.assertIn('Volunteers: 0 / 5', body)
+        self.assertNotIn('ngo@example.com', body)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+            dated = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual((cached.status_code, cached.content), (304, b''))
+        self.assertEqual(dated.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    @override_settings(
+        CACHE_L1_TIMEOUT=0,
+        CACHES={'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'kindway_cache'}},
+    )
+    def test_polls_stay_off_the_database_cache_after_the_l1_expires(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_a_signup_changes_the_feed(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            sign_up_volunteer(self.event, make_user('v0'))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('Volunteers: 1 / 5', response.content.decode().replace('\r\n ', ''))
+
+    def test_unknown_formats_and_ngos_are_404(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get(reverse('event_feed', args=['xml'])).status_code, 404)
+            self.assertEqual(self.client.get(reverse('ngo_event_feed', args=[self.ngo.pk + 100, 'json'])).status_code, 404)
@@ -3,7 +3,11 @@ from . import views
 
 urlpatterns = [
     path('', views.event_list, name='event_list'),
+    path('nearby/', views.events_nearby, name='events_nearby'),
+    path('feed.<str:fmt>', views.event_feed, name='event_feed'),
+    path('ngo/<int:ngo_id>/feed.<str:fmt>', views.event_feed, name='ngo_event_feed'),
     path('create/', views.create_event, name='create_event'),
     path('<int:event_id>/volunteer/', views.volunteer_for_event, name='volunteer_for_event'),
+    path('<int:event_id>/withdraw/', views.withdraw_from_event, name='withdraw_from_event'),
     path('story/submit/', views.submit_story, name='submit_story'),
 ]
\ No newline at end of file
@@ -1,7 +1,22 @@
+from datetime import datetime, time, timedelta
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.conf import settings
 from django.contrib import messages
-from .models import Event
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date
+from core.geo import GeocoderUnavailable
+from core.query_budget import query_budget
+from users.services import get_coords_from_pincode, profile_coordinates
+from .models import Event, EventWaitlistEntry
+from . import services
+from .feeds import FEED_FORMATS, get_event_feed
 from .forms import EventForm # We will create this form next
 
 @login_required
@@ -22,19 +37,143 @@ def create_event(request):
         form = EventForm()
     return render(request, 'communications/create_event.html', {'form': form})
 
+EVENTS_PER_PAGE = 12
+
+def _with_user_flags(events, user):
+    """Annotates user_volunteered / user_waitlisted for the signed-in user."""
+    if not user.is_authenticated:
+        return events
+    return events.annotate(
+        user_volunteered=Exists(
+            Event.volunteers.through.objects.filter(event_id=OuterRef('pk'), customuser_id=user.pk)
+        ),
+        user_waitlisted=Exists(
+            EventWaitlistEntry.objects.filter(event_id=OuterRef('pk'), user_id=user.pk)
+        ),
+    )
+
+def _parse_date_param(value):
+    """Parses a YYYY-MM-DD query parameter, ignoring anything malformed."""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+@query_budget(anonymous=2, donor=4)
 def event_list(request):
-    events = Event.objects.order_by('event_date')
-    return render(request, 'communications/event_list.html', {'events': events})
+    """
+    Lists upcoming events (or past ones with ?past=1), a page at a time.
+    Volunteer counts are denormalized on Event and "have I signed up / am I
+    waitlisted?" are annotated in SQL, so the page renders in a fixed number
+    of queries however many events it shows.
+    """
+    show_past = request.GET.get('past') == '1'
+    events = _with_user_flags(Event.objects.select_related('ngo__ngoprofile'), request.user)
+
+    now = timezone.now()
+    if show_past:
+        events = events.filter(event_date__lt=now).order_by('-event_date', '-id')
+    else:
+        events = events.filter(event_date__gte=now).order_by('event_date', 'id')
+
+    page = Paginator(events, EVENTS_PER_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'communications/event_list.html', {
+        'events': page,
+        'page_obj': page,
+        'show_past': show_past,
+    })
+
+@query_budget(anonymous=2, donor=4)
+def events_nearby(request):
+    """
+    Upcoming events within ?radius= km of the user's profile location, or of
+    ?pincode= if given, optionally limited to ?date_from= / ?date_to=.
+    """
+    pincode = request.GET.get('pincode', '').strip()
+    try:
+        radius = min(max(int(request.GET.get('radius', settings.EVENTS_NEARBY_RADIUS_KM)), 1), settings.EVENTS_NEARBY_MAX_RADIUS_KM)
+    except ValueError:
+        radius = settings.EVENTS_NEARBY_RADIUS_KM
+    date_from = _parse_date_param(request.GET.get('date_from'))
+    date_to = _parse_date_param(request.GET.get('date_to'))
+
+    center = None
+    if pincode:
+        try:
+            center = get_coords_from_pincode(pincode)
+        except GeocoderUnavailable:
+            messages.error(request, "The location service is unavailable. Please try again later.")
+        else:
+            if center is None:
+                messages.error(request, f"Could not find a location for pincode {pincode}.")
+    else:
+        center = profile_coordinates(request.user)
+
+    events = []
+    if center:
+        start = timezone.now()
+        if date_from:
+            start = max(start, timezone.make_aware(datetime.combine(date_from, time.min)))
+        end = None
+        if date_to:
+            end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), time.min))
+        base = _with_user_flags(Event.objects.select_related('ngo__ngoprofile'), request.user)
+        events = services.events_near(base, center, radius, start, end)
+
+    page = Paginator(events, EVENTS_PER_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'communications/events_nearby.html', {
+        'events': page,
+        'page_obj': page,
+        'has_location': center is not None,
+        'filters': {'pincode': pincode, 'radius': radius, 'date_from': date_from or '', 'date_to': date_to or ''},
+    })
+
+SIGNUP_MESSAGES = {
+    services.SIGNED_UP: (messages.success, "Thank you for volunteering for '{title}'!"),
+    services.ALREADY_SIGNED_UP: (messages.info, "You have already signed up for '{title}'."),
+    services.WAITLISTED: (messages.info, "'{title}' is full. You have been added to the waitlist and will be notified if a spot opens up."),
+    services.ALREADY_WAITLISTED: (messages.info, "You are already on the waitlist for '{title}'."),
+    services.CLOSED: (messages.error, "Signups for '{title}' are closed."),
+}
 
 @login_required
 def volunteer_for_event(request, event_id):
     if request.method == 'POST':
         event = get_object_or_404(Event, id=event_id)
-        # Add the current user to the volunteers list
-        event.volunteers.add(request.user)
-        messages.success(request, f"Thank you for volunteering for '{event.title}'!")
+        result = services.sign_up_volunteer(event, request.user)
+        notify, text = SIGNUP_MESSAGES[result]
+        notify(request, text.format(title=event.title))
     return redirect('event_list') # Redirect back to the events list
 
+@login_required
+def withdraw_from_event(request, event_id):
+    if request.method == 'POST':
+        event = get_object_or_404(Event, id=event_id)
+        if services.withdraw_volunteer(event, request.user):
+            messages.success(request, f"You are no longer volunteering for '{event.title}'.")
+        else:
+            messages.info(request, f"You have left the waitlist for '{event.title}'.")
+    return redirect('event_list')
+
+def event_feed(request, fmt, ngo_id=None):
+    """
+    Serves the global (or one NGO's) event feed as .ics or .json from the
+    feed cache, answering conditional requests with 304 Not Modified.
+    """
+    if fmt not in FEED_FORMATS:
+        raise Http404("Unknown feed format.")
+    feed = get_event_feed(fmt, ngo_id)
+    if feed is None:
+        raise Http404("No such NGO.")
+    last_modified = feed['last_modified'].timestamp()
+    response = get_conditional_response(request, etag=feed['etag'], last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(feed['body'], content_type=FEED_FORMATS[fmt])
+    response['ETag'] = feed['etag']
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=settings.EVENT_FEED_CLIENT_MAX_AGE)
+    return response
+
 from .forms import SuccessStoryForm
 
 def submit_story(request):
@@ -0,0 +1,159 @@
+# core/bench.py
+
+"""
+Per-view latency benchmarks, driven by `manage.py bench`.
+
+Each scenario requests one view through the Django test client as a
+donor, NGO, admin or anonymous persona, and records latency percentiles,
+the number of SQL queries and the bytes rendered. Personas are picked
+from the existing data (the busiest donor and NGO), so results track the
+dataset's real shape. Geocoding is answered locally from the seeded
+pincodes (core/geo_workload.py), so no run ever calls Nominatim.
+"""
+
+import statistics
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from unittest import mock
+
+from django.db import connection
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from donations.models import Category
+from messaging.models import Conversation
+from users.models import CustomUser, DonorProfile
+from .geo_workload import GeoWorkload
+from .metrics import QueryCounter
+
+Scenario = namedtuple('Scenario', 'name persona method url data')
+
+BENCH_ADMIN_USERNAME = 'bench-admin@example.com'
+
+
+@contextmanager
+def stub_geocoding():
+    """Resolves geocoder lookups from the seeded pincodes instead of the network."""
+    workload = GeoWorkload()
+
+    def geocode(self, query, *args, **kwargs):
+        coords = workload.locate(str(query).split(',')[0].strip())
+        return mock.Mock(latitude=coords[0], longitude=coords[1]) if coords else None
+
+    with mock.patch('geopy.geocoders.Nominatim.geocode', geocode):
+        yield
+
+
+def pick_personas():
+    """
+    Returns {'donor': user, 'ngo': user, 'admin': user, 'anonymous': None}.
+    The donor and NGO are the ones with the most conversations and offers, so
+    list views are measured at their heaviest. The admin is created if needed.
+    """
+    donor = (
+        CustomUser.objects.filter(user_type='DONOR', donorprofile__latitude__isnull=False)
+        .exclude(donorprofile__pincode='')
+        .annotate(n=Count('conversations')).order_by('-n', 'id').first()
+    )
+    ngo = (
+        CustomUser.objects.filter(user_type='NGO', ngoprofile__verification_status='VERIFIED')
+        .annotate(n=Count('received_offers')).order_by('-n', 'id').first()
+    )
+    admin = CustomUser.objects.filter(username=BENCH_ADMIN_USERNAME).first()
+    if admin is None:
+        admin = CustomUser.objects.create_superuser(BENCH_ADMIN_USERNAME, BENCH_ADMIN_USERNAME, None)
+    if donor is None or ngo is None:
+        raise ValueError("The database needs at least one donor and one verified NGO; run with --reseed.")
+    return {'donor': donor, 'ngo': ngo, 'admin': admin, 'anonymous': None}
+
+
+def build_scenarios(personas):
+    donor = personas['donor']
+    pincode = DonorProfile.objects.get(user=donor).pincode
+    conversation = Conversation.objects.filter(participants=donor).order_by('-updated_at').first()
+    category = Category.objects.filter(ngoprofile__isnull=False).first() or Category.objects.first()
+
+    scenarios = [
+        Scenario('index', 'anonymous', 'get', reverse('index'), None),
+        Scenario('index', 'donor', 'get', reverse('index'), None),
+        Scenario('search_ngo', 'donor', 'get', reverse('search_ngo'), {'pincode': pincode, 'radius': '25'}),
+        Scenario('dashboard', 'donor', 'get', reverse('dashboard'), None),
+        Scenario('dashboard', 'ngo', 'get', reverse('dashboard'), None),
+        Scenario('offer_donation_flow', 'donor', 'post', reverse('offer_donation_flow'), {
+            'title': 'Bench offer', 'description': 'Benchmark run', 'category': category.pk if category else '',
+            'delivery_type': 'PICKUP',
+        }),
+        Scenario('ngo_offer_list', 'ngo', 'get', reverse('ngo_offer_list'), None),
+        Scenario('offer_history', 'donor', 'get', reverse('offer_history'), None),
+        Scenario('conversation_list', 'donor', 'get', reverse('conversation_list'), None),
+        Scenario('conversation_list', 'ngo', 'get', reverse('conversation_list'), None),
+        Scenario('notification_list', 'donor', 'get', reverse('notification_list'), None),
+        Scenario('event_list', 'anonymous', 'get', reverse('event_list'), None),
+        Scenario('event_list', 'donor', 'get', reverse('event_list'), None),
+        Scenario('events_nearby', 'donor', 'get', reverse('events_nearby'), {'radius': '50'}),
+        Scenario('admin_dashboard', 'admin', 'get', reverse('admin_dashboard'), None),
+    ]
+    if conversation:
+        scenarios.append(Scenario(
+            'conversation_detail', 'donor', 'get', reverse('conversation_detail', args=[conversation.pk]), None,
+        ))
+    return scenarios
+
+
+def _request(client, scenario):
+    response = getattr(client, scenario.method)(scenario.url, scenario.data)
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    return response, len(body)
+
+
+def percentile(quantiles, p):
+    return round(quantiles[p - 1] * 1000, 2)
+
+
+def run_scenario(client, scenario, iterations, warmup):
+    """Times `iterations` requests after `warmup` unmeasured ones; returns a result dict."""
+    queries = QueryCounter()
+    with connection.execute_wrapper(queries):
+        response, size = _request(client, scenario)
+    for _ in range(max(warmup - 1, 0)):
+        _request(client, scenario)
+
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        _request(client, scenario)
+        samples.append(time.perf_counter() - start)
+
+    quantiles = statistics.quantiles(samples, n=100, method='inclusive') if len(samples) > 1 else samples * 99
+    return {
+        'name': scenario.name,
+        'persona': scenario.persona,
+        'method': scenario.method.upper(),
+        'url': scenario.url,
+        'status': response.status_code,
+        'iterations': iterations,
+        'p50_ms': percentile(quantiles, 50),
+        'p95_ms': percentile(quantiles, 95),
+        'p99_ms': percentile(quantiles, 99),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2),
+        'queries': queries.count,
+        'bytes': size,
+    }
+
+
+def run_benchmarks(scenarios, personas, iterations, warmup, only=None):
+    clients = {}
+    for name, user in personas.items():
+        clients[name] = Client(SERVER_NAME='localhost')
+        if user is not None:
+            clients[name].force_login(user)
+    # The N+1 detector wraps every query; keep its overhead out of the timings.
+    with override_settings(NPLUSONE_ENABLED=False):
+        return [
+            run_scenario(clients[scenario.persona], scenario, iterations, warmup)
+            for scenario in scenarios
+            if not only or scenario.name in only
+        ]
@@ -0,0 +1,240 @@
+# core/cache.py
+
+"""
+Two-tier cache: a small per-process LRU (L1) in front of the shared Django
+cache (L2, configured by CACHE_BACKEND in settings: the database cache table,
+a directory or locmem).
+
+Values live in namespaces. Keys are versioned per namespace, so
+`namespace.invalidate()` drops everything in it at once; `namespace.delete()`
+drops single keys. Versions start from the current time in microseconds, so
+if the backend evicts a version key (the DB cache culls at MAX_ENTRIES), the
+namespace restarts above every earlier version instead of reviving an old
+epoch's entries. Other processes keep serving their L1 copies for at most
+CACHE_L1_TIMEOUT seconds after an invalidation, so keep that short.
+
+On a miss only one caller (across all workers) recomputes a key; the others
+wait for its result instead of stampeding the database:
+
+    homepage = CacheNamespace('homepage', timeout=300)
+    stats = homepage.get_or_set('stats', compute_stats)
+
+Cached values are shared between callers; treat them as read-only. A
+compute function returning None is not cached.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache as l2
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.http import HttpResponse
+
+from . import metrics
+
+_MISSING = object()
+_SAFE_KEY = re.compile(r'[\w:./?=&%+-]{1,200}')
+
+
+class LRUCache:
+    """A thread-safe, size-bounded in-process cache with per-entry expiry."""
+
+    def __init__(self):
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=_MISSING):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout):
+        with self._lock:
+            self._data[key] = (time.monotonic() + timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > settings.CACHE_L1_MAX_ENTRIES:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_l1 = LRUCache()
+
+
+def _new_version():
+    return time.time_ns() // 1000
+
+
+def clear():
+    """Empties this process's L1 and the shared L2, e.g. after bulk loads that bypass signals."""
+    _l1.clear()
+    l2.clear()
+
+
+class CacheNamespace:
+    def __init__(self, name, timeout=None):
+        self.name = name
+        self.timeout = timeout
+
+    def _version_key(self):
+        return f'{self.name}:version'
+
+    def _version(self):
+        key = self._version_key()
+        version = _l1.get(key)
+        if version is _MISSING:
+            version = l2.get(key)
+            if version is None:
+                seed = _new_version()
+                l2.add(key, seed, None)
+                version = l2.get(key, seed)
+            _l1.set(key, version, settings.CACHE_L1_TIMEOUT)
+        return version
+
+    def _key(self, key):
+        key = str(key)
+        if not _SAFE_KEY.fullmatch(key):
+            # User input (search terms, paths) may hold spaces or be long.
+            key = hashlib.md5(key.encode('utf-8'), usedforsecurity=False).hexdigest()
+        return f'{self.name}:{self._version()}:{key}'
+
+    def _timeout(self, timeout):
+        if timeout is None:
+            timeout = self.timeout
+        return DEFAULT_TIMEOUT if timeout is None else timeout
+
+    def _store(self, full_key, value, timeout):
+        # Wrapped, so that a cached falsy value is told apart from a miss.
+        l2.set(full_key, (value,), timeout)
+        l1_timeout = settings.CACHE_L1_TIMEOUT
+        if timeout is not DEFAULT_TIMEOUT:
+            l1_timeout = min(timeout, l1_timeout)
+        _l1.set(full_key, value, l1_timeout)
+
+    def _lookup(self, full_key):
+        value = _l1.get(full_key)
+        if value is not _MISSING:
+            metrics.inc('kindway_cache_requests_total', {'cache': self.name, 'result': 'hit_l1'})
+            return value
+        wrapped = l2.get(full_key)
+        if wrapped is not None:
+            metrics.inc('kindway_cache_requests_total', {'cache': self.name, 'result': 'hit_l2'})
+            _l1.set(full_key, wrapped[0], settings.CACHE_L1_TIMEOUT)
+            return wrapped[0]
+        metrics.inc('kindway_cache_requests_total', {'cache': self.name, 'result': 'miss'})
+        return _MISSING
+
+    def get(self, key, default=None):
+        value = self._lookup(self._key(key))
+        return default if value is _MISSING else value
+
+    def set(self, key, value, timeout=None):
+        self._store(self._key(key), value, self._timeout(timeout))
+
+    def get_or_set(self, key, compute, timeout=None):
+        """
+        Returns the cached value of `key`, calling compute() to fill it on a
+        miss. Concurrent misses wait for the first caller's result (up to
+        CACHE_LOCK_TIMEOUT) rather than all recomputing it.
+        """
+        full_key = self._key(key)
+        value = self._lookup(full_key)
+        if value is not _MISSING:
+            return value
+
+        lock_key = f'{full_key}:lock'
+        deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+        while not l2.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+            # Someone else is computing it; use their result once it lands.
+            time.sleep(0.05)
+            wrapped = l2.get(full_key)
+            if wrapped is not None:
+                _l1.set(full_key, wrapped[0], settings.CACHE_L1_TIMEOUT)
+                return wrapped[0]
+            if time.monotonic() > deadline:
+                return compute()
+        try:
+            # The previous holder may have stored it just before releasing the lock.
+            wrapped = l2.get(full_key)
+            if wrapped is not None:
+                _l1.set(full_key, wrapped[0], settings.CACHE_L1_TIMEOUT)
+                return wrapped[0]
+            value = compute()
+            if value is not None:
+                self._store(full_key, value, self._timeout(timeout))
+            return value
+        finally:
+            l2.delete(lock_key)
+
+    def delete(self, *keys):
+        full_keys = [self._key(key) for key in keys]
+        for full_key in full_keys:
+            _l1.delete(full_key)
+        l2.delete_many(full_keys)
+
+    def invalidate(self):
+        """Drops every key in the namespace by moving it to a new version."""
+        key = self._version_key()
+        try:
+            version = l2.incr(key)
+        except ValueError:
+            version = _new_version()
+            l2.set(key, version, None)
+        _l1.set(key, version, settings.CACHE_L1_TIMEOUT)
+
+    # --- Helpers ---
+
+    def queryset(self, key, queryset, timeout=None):
+        """Evaluates `queryset` (with its select/prefetch_related) once and caches the list."""
+        return self.get_or_set(key, lambda: list(queryset), timeout)
+
+    def memoize(self, timeout=None):
+        """Decorator caching a function's result per positional arguments."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args):
+                return self.get_or_set(':'.join(str(arg) for arg in args), lambda: func(*args), timeout)
+            return wrapper
+        return decorator
+
+    def page(self, timeout=None):
+        """
+        View decorator caching whole pages for anonymous GET requests. Pages
+        that set cookies, use a CSRF token or show flash messages are never cached.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or request.user.is_authenticated or len(get_messages(request)):
+                    return view(request, *args, **kwargs)
+                key = f'page:{request.get_full_path()}'
+                cached = self.get(key)
+                if cached is not None:
+                    content, content_type = cached
+                    return HttpResponse(content, content_type=content_type)
+                response = view(request, *args, **kwargs)
+                if (response.status_code == 200 and not response.streaming and not response.cookies
+                        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')):
+                    self.set(key, (response.content, response['Content-Type']), timeout)
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,136 @@
+# core/coldstart.py
+
+"""
+Cold-start measurements, driven by `manage.py coldstart`.
+
+Every run starts a fresh Python process that does what a new serverless
+worker does: import kindway.wsgi (settings, app registry, signals, admin)
+and serve one request through the WSGI application. The process reports how
+long the import and the first request took. A separate run under
+`python -X importtime` shows which modules the import time goes to.
+"""
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+ImportedModule = namedtuple('ImportedModule', 'name self_ms cumulative_ms imported_by')
+
+_RESULT_MARKER = 'COLDSTART '
+_IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$')
+
+# Runs in the child process; the timer starts before Django is imported.
+_CHILD = '''
+import time
+start = time.perf_counter()
+from kindway.wsgi import application
+imported = time.perf_counter()
+
+import json
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+environ = {{'PATH_INFO': {path!r}, 'HTTP_HOST': {host!r}, 'wsgi.input': BytesIO()}}
+setup_testing_defaults(environ)
+status = []
+response = application(environ, lambda s, headers, exc_info=None: status.append(s))
+size = sum(len(chunk) for chunk in response)
+getattr(response, 'close', lambda: None)()
+done = time.perf_counter()
+print({marker!r} + json.dumps({{
+    'import_ms': (imported - start) * 1000,
+    'first_request_ms': (done - imported) * 1000,
+    'status': int(status[0].split()[0]),
+    'bytes': size,
+}}))
+'''
+
+
+def _run_child(path, host, warmup, importtime=False):
+    env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings.SETTINGS_MODULE, 'WARMUP_ENABLED': str(bool(warmup))}
+    command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-c',
+               _CHILD.format(path=path, host=host, marker=_RESULT_MARKER)]
+    start = time.perf_counter()
+    process = subprocess.run(command, cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    result = next((line for line in process.stdout.splitlines() if line.startswith(_RESULT_MARKER)), None)
+    if process.returncode or result is None:
+        raise RuntimeError(f"The cold-start process failed:\n{process.stderr[-2000:]}")
+    return {'process_ms': elapsed, **json.loads(result[len(_RESULT_MARKER):])}, process.stderr
+
+
+def parse_importtime(output):
+    """
+    Parses `python -X importtime` output into ImportedModule tuples, each with
+    the module that imported it. Modules imported from a function call (e.g.
+    an AppConfig.ready()) are attributed to the import that was running then.
+    """
+    modules = []
+    parents = []
+    # Parents are printed after their children; walk backwards so they come first.
+    for line in reversed(output.splitlines()):
+        match = _IMPORTTIME.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        depth = len(indent) // 2
+        del parents[depth:]
+        modules.append(ImportedModule(
+            name, int(self_us) / 1000, int(cumulative_us) / 1000, parents[-1] if parents else None,
+        ))
+        parents.append(name)
+    return modules
+
+
+def heaviest_modules(modules, limit, skip=('kindway.wsgi',)):
+    """
+    The `limit` heaviest modules by cumulative import time, counting only
+    those imported from another package: importing `geopy.distance` from
+    core.geo is listed with everything it pulls in, geopy's own submodules are not.
+    """
+    def package(name):
+        return name.split('.')[0] if name else None
+
+    entry_points = (
+        m for m in modules
+        if m.name not in skip and package(m.name) != package(m.imported_by)
+    )
+    return sorted(entry_points, key=lambda m: m.cumulative_ms, reverse=True)[:limit]
+
+
+def self_time_by_package(modules, limit):
+    """Returns [(top-level package, ms)] of import time spent in each package's own code."""
+    totals = {}
+    for module in modules:
+        package = module.name.split('.')[0]
+        totals[package] = totals.get(package, 0) + module.self_ms
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+
+def _summary(samples):
+    return {'median': round(statistics.median(samples), 1), 'min': round(min(samples), 1), 'max': round(max(samples), 1)}
+
+
+def measure(runs, path='/', host='localhost', warmup=False):
+    """
+    Starts `runs` fresh processes (plus one under -X importtime) and returns
+    the timings, the heaviest modules and the per-package import time.
+    """
+    results = [_run_child(path, host, warmup)[0] for _ in range(runs)]
+    _, importtime = _run_child(path, host, warmup, importtime=True)
+    modules = parse_importtime(importtime)
+    return {
+        'runs': results,
+        'process_ms': _summary([r['process_ms'] for r in results]),
+        'import_ms': _summary([r['import_ms'] for r in results]),
+        'first_request_ms': _summary([r['first_request_ms'] for r in results]),
+        'status': results[-1]['status'],
+        'modules': modules,
+    }
@@ -0,0 +1,113 @@
+# core/digests.py
+
+"""
+Weekly digest emails for NGOs and donors.
+
+Every number in a digest comes from one of three grouped aggregate
+queries (new offers per NGO, status changes per donor, unread messages
+per participant), so building digests for the whole user base costs a
+handful of queries instead of several per user.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Count, F, Q
+from django.template.loader import get_template
+
+from donations.models import DonationOffer, OfferStatusTransition
+from messaging.models import Conversation
+from users.models import CustomUser
+
+DIGEST_SUBJECT = "Your weekly Kindway summary"
+
+
+def _new_offers_by_ngo(since):
+    rows = (
+        DonationOffer.objects.filter(created_at__gte=since)
+        .values('ngo_id')
+        .annotate(
+            new_offers=Count('id'),
+            still_pending=Count('id', filter=Q(status='PENDING')),
+        )
+    )
+    return {row.pop('ngo_id'): row for row in rows}
+
+
+def _status_changes_by_donor(since):
+    rows = (
+        OfferStatusTransition.objects.filter(created_at__gte=since)
+        .values(donor_id=F('offer__donor_id'))
+        .annotate(
+            accepted=Count('id', filter=Q(to_status='ACCEPTED')),
+            rejected=Count('id', filter=Q(to_status='REJECTED')),
+        )
+    )
+    return {row.pop('donor_id'): row for row in rows}
+
+
+def _unread_messages_by_user():
+    Participant = Conversation.participants.through
+    rows = (
+        Participant.objects.values('customuser_id')
+        .annotate(unread=Count(
+            'conversation__messages',
+            filter=Q(conversation__messages__is_read=False)
+            & ~Q(conversation__messages__sender_id=F('customuser_id')),
+        ))
+        .filter(unread__gt=0)
+    )
+    return {row['customuser_id']: row['unread'] for row in rows}
+
+
+def build_digests(since):
+    """
+    Returns a list of digest dicts, one per user with something to report:
+    {'user_id', 'email', 'name', 'user_type', 'new_offers', 'still_pending',
+     'accepted', 'rejected', 'unread_messages'}.
+    """
+    stats = defaultdict(dict)
+    for user_id, row in _new_offers_by_ngo(since).items():
+        stats[user_id].update(row)
+    for user_id, row in _status_changes_by_donor(since).items():
+        stats[user_id].update(row)
+    for user_id, unread in _unread_messages_by_user().items():
+        stats[user_id]['unread_messages'] = unread
+
+    users = CustomUser.objects.filter(id__in=stats.keys(), is_active=True).exclude(email='').values(
+        'id', 'email', 'username', 'user_type', 'ngoprofile__ngo_name', 'donorprofile__full_name',
+    )
+    digests = []
+    for user in users.iterator():
+        digest = {
+            'user_id': user['id'],
+            'email': user['email'],
+            'name': user['ngoprofile__ngo_name'] or user['donorprofile__full_name'] or user['username'],
+            'user_type': user['user_type'],
+            'new_offers': 0, 'still_pending': 0, 'accepted': 0, 'rejected': 0, 'unread_messages': 0,
+        }
+        digest.update(stats[user['id']])
+        digests.append(digest)
+    return digests
+
+
+def render_digests(digests, since):
+    """
+    Renders every digest with templates loaded once.
+    Yields (digest, subject, text_body, html_body).
+    """
+    text_template = get_template('emails/weekly_digest.txt')
+    html_template = get_template('emails/weekly_digest.html')
+    for digest in digests:
+        context = {'digest': digest, 'since': since}
+        yield digest, DIGEST_SUBJECT, text_template.render(context), html_template.render(context)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,84 @@
+# core/geo.py
+
+"""
+Shared helpers for "within N km" lookups.
+
+Distance checks are done in two steps: a cheap latitude/longitude bounding
+box that the database can answer from an index, followed by an exact
+great-circle check in Python on the (small) set of candidates.
+
+geopy is only imported when geocode() is first called, so it stays out of
+the cold start of every worker (see `manage.py coldstart`).
+"""
+
+import logging
+import math
+import time
+
+from . import metrics
+from .profiling import timed
+
+logger = logging.getLogger(__name__)
+
+KM_PER_DEGREE_LATITUDE = 111.32
+# Mean earth radius, as used by geopy's great_circle.
+EARTH_RADIUS_KM = 6371.009
+
+
+class GeocoderUnavailable(Exception):
+    """The geocoding service failed (network error, timeout, rate limit), as opposed to finding nothing."""
+
+
+def bounding_box(center, radius_km):
+    """Returns (min_lat, max_lat, min_lng, max_lng) enclosing the circle around `center`."""
+    lat, lng = center
+    lat_delta = radius_km / KM_PER_DEGREE_LATITUDE
+    # Longitude degrees shrink towards the poles; clamp to avoid dividing by ~0.
+    cos_lat = max(math.cos(math.radians(lat)), 0.01)
+    lng_delta = radius_km / (KM_PER_DEGREE_LATITUDE * cos_lat)
+    return lat - lat_delta, lat + lat_delta, lng - lng_delta, lng + lng_delta
+
+
+def within_bounding_box(queryset, center, radius_km, lat_field='latitude', lng_field='longitude'):
+    """Narrows `queryset` to rows whose coordinates fall in the bounding box of the circle."""
+    min_lat, max_lat, min_lng, max_lng = bounding_box(center, radius_km)
+    return queryset.filter(**{
+        f'{lat_field}__range': (min_lat, max_lat),
+        f'{lng_field}__range': (min_lng, max_lng),
+    })
+
+
+def distance_km(a, b):
+    """Great-circle distance between two (lat, lng) pairs, in km."""
+    lat1, lng1, lat2, lng2 = map(math.radians, (*a, *b))
+    # Haversine formula; same results as geopy's great_circle without importing it.
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+def geocode(query, user_agent="kindway_app", timeout=5, raise_errors=False):
+    """
+    Looks `query` up with Nominatim. Returns (lat, lng), or None if nothing
+    matched or the service failed; with `raise_errors`, a failure raises
+    GeocoderUnavailable instead, so callers can tell the two apart. This is a
+    network round trip; keep it off the request path where possible (see
+    core/tasks.py).
+    """
+    from geopy.exc import GeopyError
+    from geopy.geocoders import Nominatim
+
+    start = time.perf_counter()
+    try:
+        with timed('geocode'):
+            location = Nominatim(user_agent=user_agent, timeout=timeout).geocode(query)
+    except GeopyError as exc:
+        logger.warning("Geocoding %r failed: %s", query, exc)
+        metrics.inc('kindway_geocoder_failures_total')
+        if raise_errors:
+            raise GeocoderUnavailable(str(exc)) from exc
+        return None
+    finally:
+        metrics.observe('kindway_geocoder_duration_seconds', time.perf_counter() - start)
+    if location:
+        return (location.latitude, location.longitude)
+    return None
@@ -0,0 +1,116 @@
+# core/geo_workload.py
+
+"""
+Synthetic, reproducible locations for seeding and benchmarks.
+
+Points are clustered around Indian city centroids, with cities picked in
+proportion to their population and the distance from the centre drawn from
+an exponential distribution (dense core, thinning suburbs, a long rural
+tail). Each point comes with a pincode that keeps the city's real 3-digit
+sorting-district prefix and encodes the ring and sector it fell into, so
+nearby points share pincodes and locate() can turn a pincode back into
+coordinates without calling a geocoder.
+"""
+
+import math
+import random
+from collections import namedtuple
+
+from .geo import KM_PER_DEGREE_LATITUDE
+
+City = namedtuple('City', 'name latitude longitude pincode_prefix population_millions core_radius_km')
+GeoPoint = namedtuple('GeoPoint', 'latitude longitude pincode city')
+
+CITY_CENTROIDS = {
+    city.name.lower(): city for city in [
+        City('Mumbai', 19.0760, 72.8777, '400', 20.7, 10),
+        City('Delhi', 28.6139, 77.2090, '110', 19.0, 12),
+        City('Kolkata', 22.5726, 88.3639, '700', 14.8, 9),
+        City('Bengaluru', 12.9716, 77.5946, '560', 12.3, 10),
+        City('Chennai', 13.0827, 80.2707, '600', 10.9, 9),
+        City('Hyderabad', 17.3850, 78.4867, '500', 10.0, 9),
+        City('Ahmedabad', 23.0225, 72.5714, '380', 8.0, 7),
+        City('Pune', 18.5204, 73.8567, '411', 6.6, 7),
+        City('Surat', 21.1702, 72.8311, '395', 6.5, 6),
+        City('Jaipur', 26.9124, 75.7873, '302', 3.9, 6),
+        City('Lucknow', 26.8467, 80.9462, '226', 3.6, 6),
+        City('Kanpur', 26.4499, 80.3319, '208', 3.0, 5),
+        City('Nagpur', 21.1458, 79.0882, '440', 2.9, 5),
+        City('Indore', 22.7196, 75.8577, '452', 2.5, 5),
+        City('Bhopal', 23.2599, 77.4126, '462', 2.3, 5),
+        City('Patna', 25.5941, 85.1376, '800', 2.3, 5),
+        City('Coimbatore', 11.0168, 76.9558, '641', 2.2, 5),
+        City('Kochi', 9.9312, 76.2673, '682', 2.1, 5),
+        City('Chandigarh', 30.7333, 76.7794, '160', 1.2, 4),
+        City('Guwahati', 26.1445, 91.7362, '781', 1.1, 4),
+    ]
+}
+
+# Share of points in the rural tail around each city, and how far it reaches.
+RURAL_SHARE = 0.05
+RURAL_SPREAD = 6
+# Points never land further out than this many core radii (or rural spreads).
+MAX_RADII = 4
+
+RING_KM = 2
+SECTORS = 8
+
+
+def parse_cities(value):
+    """
+    Turns a comma-separated list of city names (or 'all') into City tuples.
+    Raises ValueError naming any unknown city.
+    """
+    if not value or value.strip().lower() == 'all':
+        return list(CITY_CENTROIDS.values())
+    names = [name.strip().lower() for name in value.split(',') if name.strip()]
+    unknown = [name for name in names if name not in CITY_CENTROIDS]
+    if unknown:
+        raise ValueError(f"Unknown cities: {', '.join(unknown)}. Choose from: {', '.join(CITY_CENTROIDS)}.")
+    return [CITY_CENTROIDS[name] for name in names]
+
+
+def _offset(latitude, longitude, distance_km, bearing):
+    lat = latitude + distance_km * math.cos(bearing) / KM_PER_DEGREE_LATITUDE
+    lng = longitude + distance_km * math.sin(bearing) / (KM_PER_DEGREE_LATITUDE * math.cos(math.radians(latitude)))
+    return lat, lng
+
+
+class GeoWorkload:
+    """Draws clustered points from `cities` using `rng` (a random.Random)."""
+
+    def __init__(self, cities=None, rng=None):
+        self.cities = cities or list(CITY_CENTROIDS.values())
+        self.rng = rng or random.Random()
+        self.weights = [city.population_millions for city in self.cities]
+        self._by_prefix = {city.pincode_prefix: city for city in self.cities}
+
+    def point(self):
+        city = self.rng.choices(self.cities, weights=self.weights)[0]
+        scale = city.core_radius_km * (RURAL_SPREAD if self.rng.random() < RURAL_SHARE else 1)
+        distance = min(self.rng.expovariate(1 / scale), scale * MAX_RADII)
+        bearing = self.rng.uniform(0, 2 * math.pi)
+        latitude, longitude = _offset(city.latitude, city.longitude, distance, bearing)
+        return GeoPoint(latitude, longitude, self._pincode(city, distance, bearing), city.name)
+
+    def near(self, latitude, longitude, max_km):
+        """A point uniformly within `max_km` of (latitude, longitude), e.g. an NGO's event venue."""
+        distance = max_km * math.sqrt(self.rng.random())
+        return _offset(latitude, longitude, distance, self.rng.uniform(0, 2 * math.pi))
+
+    def _pincode(self, city, distance, bearing):
+        ring = int(distance // RING_KM)
+        sector = int(bearing / (2 * math.pi) * SECTORS) % SECTORS
+        return f"{city.pincode_prefix}{min(1 + ring * SECTORS + sector, 999):03d}"
+
+    def locate(self, pincode):
+        """Returns the (lat, lng) centre of a pincode produced by point(), or None."""
+        city = self._by_prefix.get(str(pincode)[:3])
+        if city is None or len(str(pincode)) != 6 or not str(pincode)[3:].isdigit():
+            return None
+        ring, sector = divmod(int(str(pincode)[3:]) - 1, SECTORS)
+        if ring < 0:
+            return None
+        distance = (ring + 0.5) * RING_KM
+        bearing = (sector + 0.5) * 2 * math.pi / SECTORS
+        return _offset(city.latitude, city.longitude, distance, bearing)
@@ -0,0 +1,177 @@
+# core/mail.py
+
+"""
+Outbound email queue.
+
+Request handlers call queue_mail() / queue_mass_mail() which only INSERT
+rows into OutboundEmail. The queue is drained by the `send_queued_mail`
+management command or, on Vercel, by the cron route in core/views.py,
+reusing one backend connection per batch, retrying failures with
+exponential backoff and parking messages that keep failing as DEAD.
+Until one of those is scheduled (OUTBOUND_EMAIL_WORKER), queued emails are
+sent right after their transaction commits instead, so they still go out.
+
+No transaction or row lock is held while talking to SMTP. A worker first
+claims a batch in one short transaction (status SENDING, leased for
+OUTBOUND_EMAIL_LEASE_SECONDS), sends it, then records the results. If the
+worker dies mid-batch, the lease runs out and another worker resends the
+unfinished messages.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboundEmail
+from .profiling import timed
+
+logger = logging.getLogger(__name__)
+
+
+def _send_without_worker(count):
+    """With no worker draining the queue, sends `count` due emails once the transaction commits."""
+    if not settings.OUTBOUND_EMAIL_WORKER and count:
+        # robust: a failure is logged, and the emails stay queued for a later attempt.
+        transaction.on_commit(lambda: send_queued_batch(count), robust=True)
+
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """Drop-in, non-blocking replacement for django.core.mail.send_mail()."""
+    with timed('mail'):
+        email = OutboundEmail.objects.create(
+            subject=subject,
+            body=message,
+            html_body=html_message or '',
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=list(recipient_list),
+        )
+    _send_without_worker(1)
+    return email
+
+
+def queue_mass_mail(messages, idempotency_keys=None):
+    """
+    Queues many emails with a single INSERT.
+    `messages` is an iterable of (subject, message, from_email, recipient_list, html_message) tuples.
+    `idempotency_keys`, if given, holds one key per message; messages whose key
+    was queued before are skipped, so a producer that runs twice sends once.
+    """
+    with timed('mail'):
+        emails = [
+            OutboundEmail(
+                subject=subject,
+                body=message,
+                html_body=html_message or '',
+                from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+                to=list(recipient_list),
+            )
+            for subject, message, from_email, recipient_list, html_message in messages
+        ]
+        if idempotency_keys is not None:
+            for email, key in zip(emails, idempotency_keys, strict=True):
+                email.idempotency_key = key
+        emails = OutboundEmail.objects.bulk_create(emails, ignore_conflicts=idempotency_keys is not None)
+    _send_without_worker(len(emails))
+    return emails
+
+
+def _retry_delay(attempts):
+    return timedelta(seconds=settings.OUTBOUND_EMAIL_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+def _build_message(email, connection):
+    message = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, email.to, connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, 'text/html')
+    return message
+
+
+def _claim_batch(batch_size, now):
+    """Marks up to `batch_size` due emails SENDING under a lease; returns them."""
+    # A SENDING row that is due belongs to a worker that died before its lease ran out.
+    due = OutboundEmail.objects.filter(status__in=['QUEUED', 'SENDING', 'FAILED'], next_attempt_at__lte=now)
+    lease_until = now + timedelta(seconds=settings.OUTBOUND_EMAIL_LEASE_SECONDS)
+    with transaction.atomic():
+        # skip_locked lets several workers claim side by side.
+        ids = list(
+            due.select_for_update(skip_locked=True).order_by('next_attempt_at').values_list('pk', flat=True)[:batch_size]
+        )
+        # Re-checked in the UPDATE: without row locks (SQLite) a concurrent worker may have claimed them.
+        due.filter(pk__in=ids).update(status='SENDING', next_attempt_at=lease_until)
+    return list(OutboundEmail.objects.filter(pk__in=ids, status='SENDING', next_attempt_at=lease_until))
+
+
+def send_queued_batch(batch_size=100):
+    """
+    Sends up to `batch_size` due emails over one backend connection.
+    Returns (sent, failed) counts; (0, 0) means nothing was due.
+    """
+    now = timezone.now()
+    batch = _claim_batch(batch_size, now)
+    if not batch:
+        return 0, 0
+
+    failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as exc:
+        # Can't reach the mail server at all: push the whole batch back.
+        logger.warning("Could not open mail connection: %s", exc)
+        for email in batch:
+            _mark_failed(email, exc, now)
+        return 0, len(batch)
+
+    sent_ids = []
+    try:
+        for email in batch:
+            try:
+                _build_message(email, connection).send()
+            except Exception as exc:
+                _mark_failed(email, exc, now)
+                failed += 1
+            else:
+                sent_ids.append(email.pk)
+    finally:
+        connection.close()
+
+    OutboundEmail.objects.filter(pk__in=sent_ids).update(
+        status='SENT', sent_at=timezone.now(), last_error='', attempts=F('attempts') + 1,
+    )
+    return len(sent_ids), failed
+
+
+def drain_queue(batch_size=100, max_seconds=None):
+    """
+    Sends batches until nothing is due, or until `max_seconds` have passed.
+    Returns the (sent, failed) totals.
+    """
+    deadline = None if max_seconds is None else time.monotonic() + max_seconds
+    total_sent = total_failed = 0
+    while deadline is None or time.monotonic() < deadline:
+        sent, failed = send_queued_batch(batch_size)
+        if not (sent or failed):
+            break
+        total_sent += sent
+        total_failed += failed
+    return total_sent, total_failed
+
+
+def _mark_failed(email, exc, now):
+    email.attempts += 1
+    email.last_error = str(exc)
+    if email.attempts >= settings.OUTBOUND_EMAIL_MAX_ATTEMPTS:
+        email.status = 'DEAD'
+        logger.error("Giving up on email #%s to %s: %s", email.pk, email.to, exc)
+    else:
+        email.status = 'FAILED'
+        email.next_attempt_at = now + _retry_delay(email.attempts)
+    email.save(update_fields=['status', 'attempts', 'last_error', 'next_attempt_at'])
@@ -0,0 +1,80 @@
+import json
+import platform
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.bench import build_scenarios, pick_personas, run_benchmarks, stub_geocoding
+from donations.models import DonationOffer
+from messaging.models import Message
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the main views with donor, NGO and admin personas and writes the results as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help="Timed requests per scenario.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per scenario before timing.")
+        parser.add_argument('--only', default='', help="Comma-separated scenario names to run (default: all).")
+        parser.add_argument('--output', default='bench.json', help="Where to write the JSON results.")
+        parser.add_argument('--reseed', action='store_true', help="Re-run seed_db first, even if data exists.")
+        parser.add_argument('--donors', type=int, default=5000, help="seed_db --donors when seeding.")
+        parser.add_argument('--ngos', type=int, default=200, help="seed_db --ngos when seeding.")
+        parser.add_argument('--offers', type=int, default=5000, help="seed_db --offers when seeding.")
+        parser.add_argument('--messages', type=int, default=20000, help="seed_db --messages when seeding.")
+        parser.add_argument('--seed', type=int, default=42, help="seed_db --seed when seeding.")
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError("--iterations must be at least 1.")
+        if options['reseed'] or not CustomUser.objects.filter(user_type='DONOR').exists():
+            self.stdout.write("Seeding benchmark dataset...")
+            call_command(
+                'seed_db', donors=options['donors'], ngos=options['ngos'], offers=options['offers'],
+                messages=options['messages'], seed=options['seed'], stdout=self.stdout,
+            )
+
+        only = {name.strip() for name in options['only'].split(',') if name.strip()}
+        # Benchmark requests write (drafts, read receipts, sessions); roll them all back.
+        with stub_geocoding(), transaction.atomic():
+            try:
+                personas = pick_personas()
+            except ValueError as exc:
+                raise CommandError(exc)
+            scenarios = build_scenarios(personas)
+            results = run_benchmarks(scenarios, personas, options['iterations'], options['warmup'], only)
+            transaction.set_rollback(True)
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+                'iterations': options['iterations'],
+                'warmup': options['warmup'],
+                'dataset': {
+                    'donors': CustomUser.objects.filter(user_type='DONOR').count(),
+                    'ngos': CustomUser.objects.filter(user_type='NGO').count(),
+                    'offers': DonationOffer.objects.count(),
+                    'messages': Message.objects.count(),
+                },
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write(f"{'scenario':<22}{'persona':<11}{'status':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}{'bytes':>10}")
+        for row in results:
+            self.stdout.write(
+                f"{row['name']:<22}{row['persona']:<11}{row['status']:>6}{row['p50_ms']:>10}"
+                f"{row['p95_ms']:>10}{row['p99_ms']:>10}{row['queries']:>9}{row['bytes']:>10}"
+            )
+        self.stdout.write(self.style.SUCCESS(f"\nWrote {len(results)} result(s) to {options['output']}."))
@@ -0,0 +1,67 @@
+import json
+import platform
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.coldstart import heaviest_modules, measure, self_time_by_package
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures cold starts: imports kindway.wsgi and serves one request in fresh processes, "
+        "then reports the timings and the modules with the heaviest import time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh processes to time.")
+        parser.add_argument('--path', default='/', help="URL of the first request.")
+        parser.add_argument('--host', default='localhost', help="Host header of the first request.")
+        parser.add_argument('--top', type=int, default=20, help="Modules to list.")
+        parser.add_argument('--warmup', action='store_true', help="Start the processes with WARMUP_ENABLED=True.")
+        parser.add_argument('--output', default='coldstart.json', help="Where to write the JSON results.")
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError("--runs must be at least 1.")
+        try:
+            report = measure(options['runs'], options['path'], options['host'], options['warmup'])
+        except RuntimeError as exc:
+            raise CommandError(exc)
+
+        modules = report.pop('modules')
+        heaviest = heaviest_modules(modules, options['top'])
+        packages = self_time_by_package(modules, options['top'])
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'runs': options['runs'],
+                'path': options['path'],
+                'warmup': options['warmup'],
+            },
+            **report,
+            'heaviest_modules': [module._asdict() for module in heaviest],
+            'packages': [{'package': name, 'self_ms': round(ms, 1)} for name, ms in packages],
+        }
+        with open(options['output'], 'w') as f:
+            json.dump(report, f, indent=2)
+
+        self.stdout.write(f"{'':<22}{'median ms':>11}{'min ms':>10}{'max ms':>10}")
+        for key, label in (('process_ms', 'process'), ('import_ms', 'import kindway.wsgi'),
+                           ('first_request_ms', f"first request ({report['status']})")):
+            row = report[key]
+            self.stdout.write(f"{label:<22}{row['median']:>11}{row['min']:>10}{row['max']:>10}")
+
+        self.stdout.write("\nHeaviest imports (cumulative ms, first import of each package; one -X importtime run):")
+        self.stdout.write(f"{'module':<55}{'cumul ms':>10}{'self ms':>9}  imported by")
+        for module in heaviest:
+            self.stdout.write(
+                f"{module.name:<55}{module.cumulative_ms:>10.1f}{module.self_ms:>9.1f}  {module.imported_by or '-'}"
+            )
+        self.stdout.write(f"\n{'package':<30}{'self ms':>9}")
+        for name, ms in packages:
+            self.stdout.write(f"{name:<30}{ms:>9.1f}")
+        self.stdout.write(self.style.SUCCESS(f"\nWrote the results to {options['output']}."))
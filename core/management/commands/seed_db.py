@@ -1,199 +1,364 @@
 import random
 from datetime import timedelta
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from django.db import transaction
 from django.contrib.auth.hashers import make_password
 from faker import Faker
 
+from core import cache
+from core.geo_workload import GeoWorkload, parse_cities
+
 # Import all your models
 # Make sure your import paths are correct
 from users.models import CustomUser, DonorProfile, NGOProfile
 from donations.models import Category, Donation, DonationOffer, NGORequest
 from communications.models import Event, SuccessStory
-from messaging.models import Conversation, Message
+from messaging.models import Conversation, Message, Notification
+
+# Faker is slow per call, so text is drawn from pools generated up front.
+TEXT_POOL_SIZE = 500
+
 
 class Command(BaseCommand):
-    help = "Seeds the database with a rich set of fake data for testing."
+    help = (
+        "Seeds the database with a rich set of fake data for testing. "
+        "Use --donors/--ngos/--offers/--messages to seed at production scale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--donors', type=int, default=50, help="Number of donors to create.")
+        parser.add_argument('--ngos', type=int, default=15, help="Number of NGOs to create.")
+        parser.add_argument('--offers', type=int, default=30, help="Number of direct donation offers (each gets a conversation).")
+        parser.add_argument('--messages', type=int, default=150, help="Total messages spread across the offer conversations.")
+        parser.add_argument(
+            '--cities', default='all',
+            help="Comma-separated Indian cities to cluster donors and NGOs around (default: all known cities).",
+        )
+        parser.add_argument('--seed', type=int, default=None, help="Random seed; the same seed produces the same data.")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per bulk INSERT.")
 
     @transaction.atomic  # Ensures all operations succeed or none do
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
+        try:
+            cities = parse_cities(options['cities'])
+        except ValueError as exc:
+            raise CommandError(exc)
+        self.chunk_size = options['chunk_size']
+        self.rng = random.Random(options['seed'])
+        self.geo = GeoWorkload(cities, self.rng)
+        Faker.seed(options['seed'])
+        fake = Faker(['en_IN', 'en_US'])
+
         self.stdout.write("Cleaning old data...")
-        # Clean database (but keep superusers)
+        # Clean database (but keep superusers). Leaf tables go first so most
+        # deletes are a single DELETE rather than a cascade collection.
+        Notification.objects.all().delete()
         Message.objects.all().delete()
         Conversation.objects.all().delete()
+        Event.volunteers.through.objects.all().delete()
         Event.objects.all().delete()
         DonationOffer.objects.all().delete()
         Donation.objects.all().delete()
         NGORequest.objects.all().delete()
         SuccessStory.objects.all().delete()
-        CustomUser.objects.filter(is_superuser=False).delete()
+        DonorProfile.objects.all().delete()
+        NGOProfile.accepted_categories.through.objects.all().delete()
+        NGOProfile.objects.all().delete()
+        # Users go in chunks: one cascade over a million users overflows
+        # SQLite's bound-parameter limit.
+        user_ids = list(CustomUser.objects.filter(is_superuser=False).values_list('id', flat=True))
+        for start in range(0, len(user_ids), self.chunk_size):
+            CustomUser.objects.filter(id__in=user_ids[start:start + self.chunk_size]).delete()
         Category.objects.all().delete()
-        
+
         self.stdout.write("Creating new data...")
-        
-        # Initialize Faker
-        fake = Faker(['en_IN', 'en_US'])
-        password = make_password('password123')
+
+        # Every user shares one password hash; hashing per user is the slowest part otherwise.
+        self.password = make_password('password123')
+        self.pools = {
+            'first_name': [fake.first_name() for _ in range(TEXT_POOL_SIZE)],
+            'last_name': [fake.last_name() for _ in range(TEXT_POOL_SIZE)],
+            'phone': [fake.phone_number()[:20] for _ in range(TEXT_POOL_SIZE)],
+            'company': [fake.company() for _ in range(TEXT_POOL_SIZE)],
+            'street': [fake.street_address() for _ in range(TEXT_POOL_SIZE)],
+            'city': [fake.city() for _ in range(TEXT_POOL_SIZE)],
+            'word': [fake.word() for _ in range(TEXT_POOL_SIZE)],
+            'bs': [fake.bs().title() for _ in range(TEXT_POOL_SIZE)],
+            'sentence': [fake.sentence() for _ in range(TEXT_POOL_SIZE)],
+            'paragraph': [fake.paragraph() for _ in range(TEXT_POOL_SIZE)],
+            'long_paragraph': [fake.paragraph(nb_sentences=10) for _ in range(TEXT_POOL_SIZE // 10)],
+        }
+        self.now = timezone.now()
 
         # --- 1. Create Categories ---
         categories_list = [
-            "Food", "Clothes", "Blood", "Books", "Toys", 
+            "Food", "Clothes", "Blood", "Books", "Toys",
             "Saplings", "Electronics", "Furniture", "Medical Supplies"
         ]
-        category_objs = []
-        for cat_name in categories_list:
-            cat = Category.objects.create(name=cat_name)
-            category_objs.append(cat)
-        self.stdout.write(f"Created {len(category_objs)} categories.")
+        category_ids = [cat.id for cat in Category.objects.bulk_create([Category(name=name) for name in categories_list])]
+        if None in category_ids:
+            category_ids = list(Category.objects.values_list('id', flat=True))
+        self.stdout.write(f"Created {len(category_ids)} categories.")
 
         # --- 2. Create Users (Donors and NGOs) ---
-        donors = []
-        ngos = []
-
-        # Create Donors
-        for i in range(50):
-            first_name = fake.first_name()
-            last_name = fake.last_name()
-            email = fake.unique.email()
-            
-            user = CustomUser.objects.create(
-                username=email,
-                email=email,
-                password=password,
-                user_type='DONOR',
-                first_name=first_name,
-                last_name=last_name
-            )
-            DonorProfile.objects.create(
-                user=user,
-                full_name=f"{first_name} {last_name}",
-                phone_number=fake.phone_number()[:20],
-                pincode=fake.postcode(),
-                latitude=fake.latitude(),
-                longitude=fake.longitude()
-            )
-            donors.append(user)
-        
-        # Create NGOs
-        for i in range(15):
-            ngo_name = fake.company() + " Foundation"
-            email = fake.unique.email()
-            
-            user = CustomUser.objects.create(
-                username=email,
-                email=email,
-                password=password,
-                user_type='NGO'
-            )
-            ngo_profile = NGOProfile.objects.create(
-                user=user,
-                ngo_name=ngo_name,
-                address=fake.address().replace('\n', ', '),
-                mission_statement=fake.paragraph(nb_sentences=3),
-                verification_status=random.choice(['VERIFIED', 'PENDING']),
-                latitude=fake.latitude(),
-                longitude=fake.longitude()
-            )
-            # Assign some accepted categories randomly
-            ngo_profile.accepted_categories.set(random.sample(category_objs, k=random.randint(1, 4)))
-            ngos.append(user)
-            
-        self.stdout.write(f"Created {len(donors)} donors and {len(ngos)} NGOs.")
-        
+        donor_ids = self.create_donors(options['donors'])
+        ngo_ids, verified_ngo_ids, self.ngo_locations = self.create_ngos(options['ngos'], category_ids)
+        self.stdout.write(f"Created {len(donor_ids)} donors and {len(ngo_ids)} NGOs.")
+
         # --- 3. Create NGO Requests ---
-        verified_ngos = [u for u in ngos if u.ngoprofile.verification_status == 'VERIFIED']
-        if verified_ngos:
-            for ngo in verified_ngos:
-                for _ in range(random.randint(1, 4)):
-                    NGORequest.objects.create(
-                        ngo=ngo,
-                        category=random.choice(category_objs),
-                        title=f"Urgent Need: {fake.bs().title()}",
-                        description=fake.paragraph(nb_sentences=4),
-                        is_active=True
-                    )
-            self.stdout.write("Created NGO requests.")
-        
+        lifetime = timedelta(days=settings.NGO_REQUEST_DEFAULT_LIFETIME_DAYS)
+        count = self.bulk_insert(NGORequest, (
+            NGORequest(
+                ngo_id=ngo_id,
+                category_id=self.rng.choice(category_ids),
+                title=f"Urgent Need: {self.pick('bs')}",
+                description=self.pick('paragraph'),
+                is_active=True,
+                expires_at=self.now + lifetime,  # bulk_create skips NGORequest.save()
+            )
+            for ngo_id in verified_ngo_ids
+            for _ in range(self.rng.randint(1, 4))
+        ))
+        self.stdout.write(f"Created {count} NGO requests.")
+
         # --- 4. Create Donations (Available Items) ---
-        for donor in donors:
-            for _ in range(random.randint(0, 3)):
-                status = random.choice(['AVAILABLE', 'PENDING', 'COMPLETED'])
-                Donation.objects.create(
-                    donor=donor,
-                    category=random.choice(category_objs),
-                    title=f"Offering: {fake.word().capitalize()} {fake.word()}",
-                    description=fake.paragraph(),
-                    status=status,
-                    requested_by=random.choice(ngos) if status != 'AVAILABLE' else None
-                )
-        self.stdout.write("Created available donation items.")
+        def donations():
+            for donor_id in donor_ids:
+                for _ in range(self.rng.randint(0, 3)):
+                    status = self.rng.choice(['AVAILABLE', 'PENDING', 'COMPLETED'])
+                    yield Donation(
+                        donor_id=donor_id,
+                        category_id=self.rng.choice(category_ids),
+                        title=f"Offering: {self.pick('word').capitalize()} {self.pick('word')}",
+                        description=self.pick('paragraph'),
+                        status=status,
+                        requested_by_id=self.rng.choice(ngo_ids) if status != 'AVAILABLE' and ngo_ids else None,
+                    )
+        count = self.bulk_insert(Donation, donations())
+        self.stdout.write(f"Created {count} available donation items.")
 
         # --- 5. Create Donation Offers (Direct) ---
-        donation_offers = []
-        if donors and verified_ngos:
-            for _ in range(30): # Create 30 direct offers
-                offer = DonationOffer.objects.create(
-                    title=f"Offer of {fake.word()} for {fake.company()}",
-                    description=fake.paragraph(),
-                    category=random.choice(category_objs),
-                    donor=random.choice(donors),
-                    ngo=random.choice(verified_ngos),
-                    status=random.choice(['PENDING', 'ACCEPTED', 'REJECTED']),
-                    delivery_type=random.choice(['PICKUP', 'DROP_OFF'])
-                )
-                donation_offers.append(offer)
-            self.stdout.write(f"Created {len(donation_offers)} direct donation offers.")
+        offer_parties = []
+        if donor_ids and verified_ngo_ids:
+            offer_parties = self.create_offers(options['offers'], donor_ids, verified_ngo_ids, category_ids)
+            self.stdout.write(f"Created {len(offer_parties)} direct donation offers.")
 
         # --- 6. Create Events ---
-        if verified_ngos:
-            for ngo in verified_ngos:
-                for _ in range(random.randint(0, 2)):
-                    event = Event.objects.create(
-                        ngo=ngo,
-                        title=f"{fake.word().capitalize()} Drive at {fake.city()}",
-                        description=fake.paragraph(),
-                        location=fake.address(),
-                        event_date=fake.date_time_between(start_date='+1d', end_date='+60d', tzinfo=timezone.get_current_timezone())
-                    )
-                    # Add volunteers
-                    event.volunteers.set(random.sample(donors, k=random.randint(1, 10)))
-            self.stdout.write("Created events with volunteers.")
+        if verified_ngo_ids and donor_ids:
+            count = self.create_events(verified_ngo_ids, donor_ids)
+            self.stdout.write(f"Created {count} events with volunteers.")
 
         # --- 7. Create Success Stories ---
-        for _ in range(10):
-            SuccessStory.objects.create(
-                name=fake.name(),
-                city=fake.city(),
-                story_content=fake.paragraph(nb_sentences=10),
-                is_featured=random.choice([True, False])
+        self.bulk_insert(SuccessStory, (
+            SuccessStory(
+                name=f"{self.pick('first_name')} {self.pick('last_name')}",
+                city=self.pick('city'),
+                story_content=self.pick('long_paragraph'),
+                is_featured=self.rng.choice([True, False]),
             )
+            for _ in range(10)
+        ))
         self.stdout.write("Created success stories.")
-        
+
         # --- 8. Create Conversations and Messages ---
-        for offer in donation_offers:
-            # Create a conversation for the offer
-            convo = Conversation.objects.create(offer=offer)
-            convo.participants.add(offer.donor, offer.ngo)
-            
-            last_time = convo.created_at
-            for _ in range(random.randint(2, 7)):
-                sender = random.choice([offer.donor, offer.ngo])
-                msg_time = last_time + timedelta(minutes=random.randint(5, 60 * 24))
-                
-                Message.objects.create(
-                    conversation=convo,
-                    sender=sender,
-                    content=fake.sentence(),
-                    is_read=random.choice([True, False]),
-                    timestamp=msg_time  # Manually set timestamp
-                )
-                last_time = msg_time
-            
-            # Update the conversation's 'updated_at' field
-            convo.updated_at = last_time
-            convo.save()
-        self.stdout.write("Created conversations and messages.")
+        count = self.create_conversations(offer_parties, options['messages'])
+        self.stdout.write(f"Created {len(offer_parties)} conversations and {count} messages.")
+
+        # Bulk inserts skip the signals that invalidate cached pages and lookups.
+        cache.clear()
 
         self.stdout.write(self.style.SUCCESS("\nDatabase successfully seeded!"))
-        self.stdout.write(f"Test login with any user (e.g., 'donor1@example.com') and password 'password123'")
\ No newline at end of file
+        self.stdout.write(f"Test login with any user (e.g., 'donor1@example.com' or 'ngo1@example.com') and password 'password123'")
+
+    # --- Helpers ---
+
+    def pick(self, pool):
+        return self.rng.choice(self.pools[pool])
+
+    def chunks(self, rows):
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def bulk_insert(self, model, rows):
+        """bulk_creates `rows` (any iterable) chunk by chunk; returns the row count."""
+        count = 0
+        for chunk in self.chunks(rows):
+            model.objects.bulk_create(chunk)
+            count += len(chunk)
+        return count
+
+    def create_users(self, user_type, prefix, count, extra_fields=lambda i: {}):
+        """
+        Creates `count` users with deterministic emails (<prefix><n>@example.com)
+        and yields (user_id, n) per created user, one chunk at a time.
+        """
+        for start in range(1, count + 1, self.chunk_size):
+            numbers = range(start, min(start + self.chunk_size, count + 1))
+            users = [
+                CustomUser(
+                    username=f"{prefix}{n}@example.com",
+                    email=f"{prefix}{n}@example.com",
+                    password=self.password,
+                    user_type=user_type,
+                    **extra_fields(n),
+                )
+                for n in numbers
+            ]
+            CustomUser.objects.bulk_create(users)
+            if users[0].pk is None:
+                # Backends that can't return ids from a bulk INSERT.
+                ids = dict(CustomUser.objects.filter(username__in=[u.username for u in users]).values_list('username', 'id'))
+                for user in users:
+                    user.pk = ids[user.username]
+            yield [(user, n) for user, n in zip(users, numbers)]
+
+    def create_donors(self, count):
+        donor_ids = []
+        for chunk in self.create_users('DONOR', 'donor', count, lambda n: {
+            'first_name': self.pick('first_name'),
+            'last_name': self.pick('last_name'),
+        }):
+            profiles = []
+            for user, _ in chunk:
+                point = self.geo.point()
+                profiles.append(DonorProfile(
+                    user_id=user.pk,
+                    full_name=f"{user.first_name} {user.last_name}",
+                    phone_number=self.pick('phone'),
+                    pincode=point.pincode,
+                    latitude=point.latitude,
+                    longitude=point.longitude,
+                ))
+            DonorProfile.objects.bulk_create(profiles)
+            donor_ids.extend(user.pk for user, _ in chunk)
+        return donor_ids
+
+    def create_ngos(self, count, category_ids):
+        """Returns (ngo ids, verified ngo ids, {verified ngo id: GeoPoint})."""
+        ngo_ids, verified_ngo_ids, locations = [], [], {}
+        AcceptedCategory = NGOProfile.accepted_categories.through
+        for chunk in self.create_users('NGO', 'ngo', count):
+            profiles = []
+            for user, _ in chunk:
+                status = self.rng.choice(['VERIFIED', 'PENDING'])
+                point = self.geo.point()
+                profiles.append(NGOProfile(
+                    user_id=user.pk,
+                    ngo_name=self.pick('company') + " Foundation",
+                    address=f"{self.pick('street')}, {point.city} - {point.pincode}",
+                    mission_statement=self.pick('paragraph'),
+                    verification_status=status,
+                    # Seeded NGOs never get a verification email.
+                    is_verification_email_sent=status == 'VERIFIED',
+                    latitude=point.latitude,
+                    longitude=point.longitude,
+                ))
+                ngo_ids.append(user.pk)
+                if status == 'VERIFIED':
+                    verified_ngo_ids.append(user.pk)
+                    locations[user.pk] = point
+            NGOProfile.objects.bulk_create(profiles)
+            # Assign some accepted categories randomly
+            AcceptedCategory.objects.bulk_create([
+                AcceptedCategory(ngoprofile_id=profile.user_id, category_id=category_id)
+                for profile in profiles
+                for category_id in self.rng.sample(category_ids, k=self.rng.randint(1, 4))
+            ])
+        return ngo_ids, verified_ngo_ids, locations
+
+    def create_offers(self, count, donor_ids, ngo_ids, category_ids):
+        """Creates the offers; returns [(offer_id, donor_id, ngo_id), ...]."""
+        offer_parties = []
+        for start in range(0, count, self.chunk_size):
+            offers = [
+                DonationOffer(
+                    title=f"Offer of {self.pick('word')} for {self.pick('company')}",
+                    description=self.pick('paragraph'),
+                    category_id=self.rng.choice(category_ids),
+                    donor_id=self.rng.choice(donor_ids),
+                    ngo_id=self.rng.choice(ngo_ids),
+                    status=self.rng.choice(['PENDING', 'ACCEPTED', 'REJECTED']),
+                    delivery_type=self.rng.choice(['PICKUP', 'DROP_OFF']),
+                )
+                for _ in range(min(self.chunk_size, count - start))
+            ]
+            DonationOffer.objects.bulk_create(offers)
+            if offers[0].pk is None:
+                offers = list(DonationOffer.objects.order_by('-id')[:len(offers)])[::-1]
+            offer_parties.extend((offer.pk, offer.donor_id, offer.ngo_id) for offer in offers)
+        return offer_parties
+
+    def create_events(self, ngo_ids, donor_ids):
+        Volunteer = Event.volunteers.through
+        count = 0
+        planned = (
+            (ngo_id, self.rng.sample(donor_ids, k=min(len(donor_ids), self.rng.randint(1, 10))))
+            for ngo_id in ngo_ids
+            for _ in range(self.rng.randint(0, 2))
+        )
+        for chunk in self.chunks(planned):
+            events = []
+            for ngo_id, volunteers in chunk:
+                # Events are held within a few km of the NGO, already geocoded.
+                ngo_location = self.ngo_locations[ngo_id]
+                latitude, longitude = self.geo.near(ngo_location.latitude, ngo_location.longitude, 5)
+                events.append(Event(
+                    ngo_id=ngo_id,
+                    title=f"{self.pick('word').capitalize()} Drive at {ngo_location.city}",
+                    description=self.pick('paragraph'),
+                    location=f"{self.pick('street')}, {ngo_location.city}",
+                    latitude=latitude,
+                    longitude=longitude,
+                    event_date=self.now + timedelta(days=1, seconds=self.rng.randint(0, 59 * 24 * 3600)),
+                    volunteer_count=len(volunteers),  # bulk inserts bypass the m2m_changed recount
+                ))
+            Event.objects.bulk_create(events)
+            if events[0].pk is None:
+                events = list(Event.objects.order_by('-id')[:len(events)])[::-1]
+            # Add volunteers
+            Volunteer.objects.bulk_create([
+                Volunteer(event_id=event.pk, customuser_id=donor_id)
+                for event, (_, volunteers) in zip(events, chunk)
+                for donor_id in volunteers
+            ])
+            count += len(events)
+        return count
+
+    def create_conversations(self, offer_parties, message_count):
+        """One conversation per offer, with `message_count` messages spread across them."""
+        if not offer_parties:
+            return 0
+        Participant = Conversation.participants.through
+        conversation_ids = []
+        for chunk in self.chunks(offer_parties):
+            conversations = Conversation.objects.bulk_create([Conversation(offer_id=offer_id) for offer_id, _, _ in chunk])
+            if conversations[0].pk is None:
+                ids = dict(Conversation.objects.filter(offer_id__in=[o for o, _, _ in chunk]).values_list('offer_id', 'id'))
+                for conversation in conversations:
+                    conversation.pk = ids[conversation.offer_id]
+            Participant.objects.bulk_create([
+                Participant(conversation_id=conversation.pk, customuser_id=user_id)
+                for conversation, (_, donor_id, ngo_id) in zip(conversations, chunk)
+                for user_id in (donor_id, ngo_id)
+            ])
+            conversation_ids.extend(conversation.pk for conversation in conversations)
+
+        def messages():
+            for _ in range(message_count):
+                index = self.rng.randrange(len(conversation_ids))
+                _, donor_id, ngo_id = offer_parties[index]
+                yield Message(
+                    conversation_id=conversation_ids[index],
+                    sender_id=self.rng.choice([donor_id, ngo_id]),
+                    content=self.pick('sentence'),
+                    is_read=self.rng.choice([True, False]),
+                )
+        return self.bulk_insert(Message, messages())
@@ -0,0 +1,45 @@
+import os
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.digests import build_digests, chunked, render_digests
+from core.mail import queue_mass_mail
+
+
+class Command(BaseCommand):
+    help = "Builds the weekly offer/message digest for every NGO and donor and queues it for sending."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help="How many days of activity to summarise.")
+        parser.add_argument('--chunk-size', type=int, default=500, help="Digests queued per INSERT.")
+        parser.add_argument('--dry-run', action='store_true', help="Write digests to files instead of queueing emails.")
+        parser.add_argument('--output-dir', default=os.path.join(tempfile.gettempdir(), 'kindway-digests'), help="Where --dry-run writes files.")
+
+    def handle(self, *args, **options):
+        since = timezone.now() - timedelta(days=options['days'])
+        digests = build_digests(since)
+        rendered = render_digests(digests, since)
+
+        if options['dry_run']:
+            os.makedirs(options['output_dir'], exist_ok=True)
+            for digest, subject, text_body, html_body in rendered:
+                base = os.path.join(options['output_dir'], f"digest-{digest['user_id']}")
+                with open(f"{base}.txt", 'w') as f:
+                    f.write(f"To: {digest['email']}\nSubject: {subject}\n\n{text_body}")
+                with open(f"{base}.html", 'w') as f:
+                    f.write(html_body)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(digests)} digest(s) to {options['output_dir']}."))
+            return
+
+        queued = 0
+        for chunk in chunked(rendered, options['chunk_size']):
+            queue_mass_mail(
+                (subject, text_body, settings.DEFAULT_FROM_EMAIL, [digest['email']], html_body)
+                for digest, subject, text_body, html_body in chunk
+            )
+            queued += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} digest email(s). Run send_queued_mail to deliver them."))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.mail import send_queued_batch
+
+
+class Command(BaseCommand):
+    help = "Sends queued OutboundEmail messages, one mail connection per batch."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help="Emails sent per connection.")
+        parser.add_argument('--forever', action='store_true', help="Keep polling for new mail instead of exiting when the queue is empty.")
+        parser.add_argument('--interval', type=float, default=5.0, help="Seconds to sleep between polls with --forever.")
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_queued_batch(options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f"Batch: {sent} sent, {failed} failed.")
+                continue
+            if not options['forever']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f"Done: {total_sent} sent, {total_failed} failed."))
@@ -0,0 +1,185 @@
+# core/metrics.py
+
+"""
+Prometheus metrics, served in the text exposition format at /metrics.
+
+gunicorn runs several worker processes, so each one buffers its counters in
+memory and adds them to a shared SQLite file (METRICS_DB_PATH) at most every
+METRICS_FLUSH_SECONDS; /metrics reads the totals back from that file. Only
+the metrics declared in METRICS can be recorded:
+
+    metrics.inc('kindway_message_polls_total', {'result': 'empty'})
+    metrics.observe('kindway_geocoder_duration_seconds', elapsed)
+
+Gauges that describe the database (such as the email queue depth) are
+computed when /metrics is scraped instead of being recorded.
+
+Everything here is off unless METRICS_ENABLED; the totals are per host, so
+they only make sense on long-lived servers, not on serverless instances.
+"""
+
+import atexit
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Seconds; the upper bounds of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = {
+    'kindway_http_request_duration_seconds': ('histogram', "Request latency by URL name and status."),
+    'kindway_db_queries_total': ('counter', "SQL queries run while serving requests, by URL name."),
+    'kindway_cache_requests_total': ('counter', "Cache lookups by namespace and result (hit_l1, hit_l2 or miss)."),
+    'kindway_geocoder_duration_seconds': ('histogram', "Geocoder (Nominatim) call latency."),
+    'kindway_geocoder_failures_total': ('counter', "Geocoder calls that raised an error."),
+    'kindway_message_polls_total': ('counter', "Chat polls for new messages, by result (new or empty)."),
+    'kindway_email_queue_depth': ('gauge', "Outbound emails by status, read from the database at scrape time."),
+}
+
+_LE = re.compile(r',?le="([^"]+)"')
+
+_lock = threading.Lock()
+_buffer = {}
+_last_flush = time.monotonic()
+
+
+class QueryCounter:
+    """A connection.execute_wrapper() that counts queries (independent of DEBUG)."""
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def _format_labels(labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{key}="{escape(value)}"' for key, value in labels.items())
+
+
+def _add(series, labels, value):
+    key = (series, labels)
+    _buffer[key] = _buffer.get(key, 0) + value
+
+
+def _record(name, updates):
+    if not settings.METRICS_ENABLED:
+        return
+    if name not in METRICS:
+        raise ValueError(f"Unknown metric {name!r}; declare it in core.metrics.METRICS.")
+    with _lock:
+        for series, labels, value in updates:
+            _add(series, labels, value)
+    if time.monotonic() - _last_flush >= settings.METRICS_FLUSH_SECONDS:
+        flush()
+
+
+def inc(name, labels=None, value=1):
+    """Adds `value` to a counter."""
+    _record(name, [(name, _format_labels(labels or {}), value)])
+
+
+def observe(name, seconds, labels=None, buckets=LATENCY_BUCKETS):
+    """Records one observation in a histogram."""
+    labels = labels or {}
+    base = _format_labels(labels)
+    updates = [(f'{name}_sum', base, seconds), (f'{name}_count', base, 1)]
+    for bound in buckets:
+        # Empty buckets are still written, so every series exposes the full set.
+        updates.append((f'{name}_bucket', _format_labels({**labels, 'le': bound}), int(seconds <= bound)))
+    updates.append((f'{name}_bucket', _format_labels({**labels, 'le': '+Inf'}), 1))
+    _record(name, updates)
+
+
+def _connect():
+    db = sqlite3.connect(settings.METRICS_DB_PATH, timeout=5)
+    db.execute('PRAGMA journal_mode=WAL')
+    db.execute(
+        'CREATE TABLE IF NOT EXISTS metrics ('
+        'series TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (series, labels))'
+    )
+    return db
+
+
+def flush():
+    """Adds this process's buffered samples to the shared file."""
+    global _last_flush
+    with _lock:
+        pending = list(_buffer.items())
+        _buffer.clear()
+        _last_flush = time.monotonic()
+    if not pending:
+        return
+    try:
+        db = _connect()
+        with db:
+            db.executemany(
+                'INSERT INTO metrics (series, labels, value) VALUES (?, ?, ?) '
+                'ON CONFLICT (series, labels) DO UPDATE SET value = value + excluded.value',
+                [(series, labels, value) for (series, labels), value in pending],
+            )
+        db.close()
+    except sqlite3.Error as exc:
+        logger.warning("Could not write metrics to %s: %s", settings.METRICS_DB_PATH, exc)
+        with _lock:
+            for (series, labels), value in pending:
+                _add(series, labels, value)
+
+
+atexit.register(flush)
+
+
+def _gauges():
+    """Yields (name, labels, value) for the gauges computed at scrape time."""
+    from django.db.models import Count
+    from .models import OutboundEmail
+
+    depth = dict(OutboundEmail.objects.exclude(status='SENT').values_list('status').annotate(n=Count('id')))
+    for status in ('QUEUED', 'SENDING', 'FAILED', 'DEAD'):
+        yield 'kindway_email_queue_depth', _format_labels({'status': status.lower()}), depth.get(status, 0)
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render():
+    """Returns every metric in the Prometheus text exposition format."""
+    flush()
+    try:
+        db = _connect()
+        rows = db.execute('SELECT series, labels, value FROM metrics').fetchall()
+        db.close()
+    except sqlite3.Error as exc:
+        logger.warning("Could not read metrics from %s: %s", settings.METRICS_DB_PATH, exc)
+        rows = []
+    rows.extend(_gauges())
+
+    by_metric = {}
+    for series, labels, value in rows:
+        name = next((m for m in METRICS if series == m or series.startswith(m + '_')), None)
+        if name is not None:
+            by_metric.setdefault(name, []).append((series, labels, value))
+
+    def order(row):
+        # Per label set: buckets in ascending `le`, then _sum and _count.
+        series, labels, _ = row
+        le = _LE.search(labels)
+        suffix = next((i for i, s in enumerate(('_bucket', '_sum', '_count')) if series.endswith(s)), 0)
+        return (_LE.sub('', labels), suffix, float(le.group(1)) if le else 0)
+
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for series, labels, value in sorted(by_metric.get(name, []), key=order):
+            lines.append(f'{series}{{{labels}}} {_format_value(value)}' if labels else f'{series} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,203 @@
+# core/middleware.py
+
+import cProfile
+import json
+import logging
+import marshal
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from users.models import CustomUser
+from . import metrics
+from .models import RequestProfile
+from .nplusone import NPlusOneDetected, QueryRecorder, format_findings
+from .profiling import PROFILE_HEADER, STAGES, end_request, profile_token_user_id, start_request
+
+logger = logging.getLogger('kindway.profiling')
+nplusone_logger = logging.getLogger('kindway.nplusone')
+
+
+class ServerTimingMiddleware:
+    """
+    Times a sample of requests (PROFILING_SAMPLE_RATE) and reports SQL,
+    template, geocoder and email time as a Server-Timing header plus one
+    JSON log line on the 'kindway.profiling' logger. With a sample rate of
+    0 the middleware removes itself at startup and costs nothing.
+    """
+
+    def __init__(self, get_response):
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timings, token = start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            end_request(token)
+        total = time.perf_counter() - start
+
+        entries = []
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+        }
+        for stage in STAGES:
+            count, seconds = timings.stages.get(stage, (0, 0.0))
+            if count:
+                entries.append(f'{stage};dur={seconds * 1000:.2f};desc="{count}x"')
+            record[f'{stage}_count'] = count
+            record[f'{stage}_ms'] = round(seconds * 1000, 2)
+        entries.append(f'total;dur={total * 1000:.2f}')
+
+        response['Server-Timing'] = ', '.join(entries)
+        logger.info(json.dumps(record))
+        return response
+
+
+class NPlusOneMiddleware:
+    """
+    Records every query a request runs and reports repeated query shapes
+    (N+1s) and exact duplicates on the 'kindway.nplusone' logger, with the
+    template line or code that issued them and a select_related() /
+    prefetch_related() suggestion. With NPLUSONE_RAISE the request fails
+    with NPlusOneDetected instead, which is how the test suite uses it.
+    Enabled by NPLUSONE_ENABLED (off by default); meant for development and staging.
+    """
+
+    def __init__(self, get_response):
+        if not settings.NPLUSONE_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        findings = recorder.findings(settings.NPLUSONE_THRESHOLD, settings.NPLUSONE_IGNORE)
+        if findings:
+            report = f"{request.method} {request.path}\n{format_findings(findings)}"
+            if settings.NPLUSONE_RAISE and any(f.kind == 'n+1' for f in findings):
+                raise NPlusOneDetected(report)
+            nplusone_logger.warning(report)
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Records each request's latency (by URL name and status) and its SQL
+    query count for /metrics (core/metrics.py). Off when METRICS_ENABLED is False.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = metrics.QueryCounter()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(queries))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+
+        view = getattr(request.resolver_match, 'view_name', None) or '<unresolved>'
+        metrics.observe('kindway_http_request_duration_seconds', elapsed, {'view': view, 'status': response.status_code})
+        metrics.inc('kindway_db_queries_total', {'view': view}, queries.count)
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Captures a cProfile profile of a sample of requests (PROFILER_SAMPLE_RATE)
+    and of every request carrying a valid staff token in the X-Kindway-Profile
+    header (see core.profiling.profile_token), and stores it as a
+    RequestProfile with the URL, timing and query count. The admin lists
+    them slowest first. Opt-in: off unless PROFILER_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILER_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def _requested_by(self, request):
+        """Returns the id of the active staff user whose token is on the request, or None."""
+        token = request.headers.get(PROFILE_HEADER)
+        user_id = profile_token_user_id(token) if token else None
+        if user_id is None:
+            return None
+        return user_id if CustomUser.objects.filter(pk=user_id, is_staff=True, is_active=True).exists() else None
+
+    def __call__(self, request):
+        user_id = self._requested_by(request)
+        if user_id is None and random.random() >= settings.PROFILER_SAMPLE_RATE:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        queries = metrics.QueryCounter()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiler is already active on this thread.
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        if user_id is None and duration_ms < settings.PROFILER_MIN_DURATION_MS:
+            return response
+        profiler.create_stats()
+        profile = self._save(request, response, duration_ms, queries.count, user_id, marshal.dumps(profiler.stats))
+        if user_id is not None:
+            response['X-Kindway-Profile-Id'] = str(profile.pk)
+        return response
+
+    def _save(self, request, response, duration_ms, query_count, user_id, stats):
+        profile = RequestProfile.objects.create(
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            view_name=getattr(request.resolver_match, 'view_name', None) or '',
+            status_code=response.status_code,
+            duration_ms=duration_ms,
+            query_count=query_count,
+            trigger='HEADER' if user_id is not None else 'SAMPLED',
+            user_id=user_id,
+            stats=stats,
+        )
+        # Keep only the newest PROFILER_MAX_PROFILES captures.
+        cutoff = (
+            RequestProfile.objects.order_by('-created_at', '-id')
+            .values_list('created_at', flat=True)[settings.PROFILER_MAX_PROFILES:settings.PROFILER_MAX_PROFILES + 1]
+        )
+        if cutoff:
+            RequestProfile.objects.filter(created_at__lte=cutoff[0]).exclude(pk=profile.pk).delete()
+        return profile
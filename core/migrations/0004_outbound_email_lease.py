@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_outboundemail_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='outboundemail',
+            name='core_outbox_due_idx',
+        ),
+        migrations.AlterField(
+            model_name='outboundemail',
+            name='status',
+            field=models.CharField(choices=[('QUEUED', 'Queued'), ('SENDING', 'Sending'), ('FAILED', 'Failed (will retry)'), ('SENT', 'Sent'), ('DEAD', 'Dead letter')], default='QUEUED', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='outboundemail',
+            index=models.Index(condition=models.Q(('status__in', ['QUEUED', 'SENDING', 'FAILED'])), fields=['next_attempt_at'], name='core_outbox_pending_idx'),
+        ),
+    ]
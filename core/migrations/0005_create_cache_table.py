@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-19 21:05
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    # The DatabaseCache table (CACHE_BACKEND=db) has no model, so `migrate`
+    # alone would leave it missing; createcachetable skips existing tables.
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_outbound_email_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,78 @@
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutboundEmail(models.Model):
+    """
+    An email waiting to be sent by the `send_queued_mail` worker.
+    Views queue mail here (see core/mail.py) instead of talking to SMTP.
+    """
+    STATUS_CHOICES = (
+        ('QUEUED', 'Queued'),
+        ('SENDING', 'Sending'),
+        ('FAILED', 'Failed (will retry)'),
+        ('SENT', 'Sent'),
+        ('DEAD', 'Dead letter'),
+    )
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    to = models.JSONField()  # List of recipient addresses
+    # Set by producers that may run twice (e.g. a resumed fan-out); a second copy is not queued.
+    idempotency_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    attempts = models.PositiveIntegerField(default=0)
+    # For SENDING rows: when the worker's lease runs out and another worker may take over.
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # The worker only ever looks at mail that still has to go out.
+            models.Index(
+                fields=['next_attempt_at'],
+                condition=models.Q(status__in=['QUEUED', 'SENDING', 'FAILED']),
+                name='core_outbox_pending_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.to)} ({self.status})"
+
+
+class RequestProfile(models.Model):
+    """
+    A cProfile capture of one production request, recorded by
+    core.middleware.ProfilingMiddleware. `stats` holds the marshalled
+    pstats data, i.e. the contents of a .prof file.
+    """
+    TRIGGER_CHOICES = (
+        ('SAMPLED', 'Sampled'),
+        ('HEADER', 'Requested by staff header'),
+    )
+
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2048)
+    view_name = models.CharField(max_length=255, blank=True)
+    status_code = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    query_count = models.PositiveIntegerField()
+    trigger = models.CharField(max_length=10, choices=TRIGGER_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    stats = models.BinaryField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ['-duration_ms']
+        indexes = [
+            models.Index(fields=['-duration_ms'], name='core_profile_slowest_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.method} {self.path} ({self.duration_ms:.0f} ms)"
@@ -0,0 +1,200 @@
+# core/nplusone.py
+
+"""
+N+1 and duplicate-query detection, used by core.middleware.NPlusOneMiddleware.
+
+Every query a request runs is reduced to a fingerprint (its SQL with literals
+and IN-lists collapsed) and attributed to where it came from: the template
+tag being rendered, or failing that the innermost frame of project code
+(app code, not manage.py, the tests or these wrappers). Queries the
+framework runs on its own, such as the request.user lookup, are attributed
+to the innermost framework frame outside django.db instead.
+When one fingerprint runs more than NPLUSONE_THRESHOLD times from the same
+place, the request has an N+1; when the exact same SQL and parameters run
+more than once, it has a duplicate, reported with every place it ran from.
+N+1 findings carry the select_related()/prefetch_related() path that would
+remove them.
+"""
+
+import os
+import re
+import sys
+from collections import namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.template.base import Node
+
+Finding = namedtuple('Finding', 'kind count sql origin suggestion')
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \((?:%s|\?)(?:, (?:%s|\?))*\)')
+_WHERE_COLUMN = re.compile(r'\bWHERE "(\w+)"\."(\w+)" (?:=|IN)')
+_DOTTED = re.compile(r'\b[a-z_]\w*(?:\.\w+)+')
+
+# The query wrappers themselves; a query is never "from" one of these.
+_INSTRUMENTATION = {
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), name)
+    for name in ('nplusone.py', 'metrics.py', 'profiling.py', 'middleware.py')
+}
+# Where the ORM and the database drivers live; never the interesting frame.
+_DB_LAYER = (os.path.join('django', 'db', ''), os.path.join('django', 'utils', 'functional.py'))
+
+
+class NPlusOneDetected(AssertionError):
+    """Raised at the end of a request with N+1 findings when NPLUSONE_RAISE is on."""
+
+
+def fingerprint(sql):
+    """Returns the query's shape: literals and IN-lists collapsed, whitespace normalised."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return ' '.join(sql.split())
+
+
+def _describe(frame, root):
+    return f"{os.path.relpath(frame.f_code.co_filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+def _is_project_code(filename, base_dir):
+    return (
+        filename.startswith(base_dir) and filename not in _INSTRUMENTATION
+        and 'site-packages' not in filename and os.sep + 'tests' not in filename
+        and os.path.basename(filename) != 'manage.py'
+    )
+
+
+def _project_frame(frame):
+    """Returns 'path:line in function' for the innermost frame of project code, or None."""
+    base_dir = str(settings.BASE_DIR)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        # '<string>', '<stdin>': code run by `manage.py shell` or exec(), not a project file.
+        if not filename.startswith('<') and _is_project_code(os.path.abspath(filename), base_dir):
+            return _describe(frame, base_dir)
+        frame = frame.f_back
+    return None
+
+
+def _framework_frame(frame):
+    """Returns 'path:line in function' for the innermost frame above the ORM (e.g. django/contrib/auth/...), or None."""
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename not in _INSTRUMENTATION and not any(part in filename for part in _DB_LAYER):
+            package_root = filename.rsplit('site-packages' + os.sep, 1)[0] + 'site-packages'
+            return _describe(frame, package_root if 'site-packages' in filename else os.path.dirname(filename))
+        frame = frame.f_back
+    return None
+
+
+def _template_node(frame):
+    """Returns the innermost template node being rendered, or None."""
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        # type(), not isinstance(): the latter would evaluate lazy objects such as request.user.
+        if issubclass(type(node), Node) and getattr(node, 'token', None) is not None and node.origin:
+            return node
+        frame = frame.f_back
+    return None
+
+
+def _origin(frame):
+    """Returns (description, template expression or None) for the query issued under `frame`."""
+    node = _template_node(frame)
+    if node is not None:
+        contents = node.token.contents
+        return f"{node.origin.template_name or node.origin.name}:{node.token.lineno} `{contents}`", contents
+    return _project_frame(frame) or _framework_frame(frame) or '<unknown>', None
+
+
+def _related_model(sql):
+    """Returns (model, field) filtered on by `... WHERE "table"."column" = ...`, or (None, None)."""
+    match = _WHERE_COLUMN.search(sql)
+    if not match:
+        return None, None
+    for model in apps.get_models(include_auto_created=True):
+        if model._meta.db_table == match.group(1):
+            for field in model._meta.concrete_fields:
+                if field.column == match.group(2):
+                    return model, field
+            return model, None
+    return None, None
+
+
+def suggest(sql, expression=None):
+    """Suggests the select_related()/prefetch_related() call that would fold the query away."""
+    model, field = _related_model(sql)
+    if model is None:
+        return "Batch these lookups (fetch them once before the loop)."
+    single = field is not None and (field.primary_key or field.unique)
+    method = 'select_related' if single else 'prefetch_related'
+    target = model._meta.model_name
+    if model._meta.auto_created:
+        # An M2M through table: the relation is named after the other side.
+        method = 'prefetch_related'
+        target = next((f.name for f in model._meta.concrete_fields if f is not field and f.is_relation), target)
+
+    path = None
+    for dotted in _DOTTED.findall(expression or ''):
+        # `offer.donor.donorprofile.full_name` -> donor__donorprofile; drop the loop
+        # variable, then everything after the relation (or the final attribute / .all).
+        lookups = dotted.split('.')[1:]
+        if target in lookups:
+            lookups = lookups[:lookups.index(target) + 1]
+        elif lookups and (single or lookups[-1] in ('all', 'count')):
+            lookups = lookups[:-1]
+        if lookups:
+            path = '__'.join(lookups)
+            break
+    if path:
+        return f"Add .{method}('{path}') to the queryset."
+    return f"Add .{method}() for the relation to {model._meta.label} to the queryset."
+
+
+class QueryRecorder:
+    """A connection.execute_wrapper() that groups a request's queries by fingerprint."""
+
+    def __init__(self):
+        self.shapes = {}
+        self.exact = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        origin, expression = _origin(sys._getframe(1))
+        # Grouped per origin too, so e.g. the request.user lookup in middleware
+        # is not blamed for a template loop that runs the same shape of query.
+        key = (fingerprint(sql), origin)
+        entry = self.shapes.get(key)
+        if entry is None:
+            self.shapes[key] = [1, sql, expression]
+        else:
+            entry[0] += 1
+        exact = (sql, repr(params))
+        if exact not in self.exact:
+            self.exact[exact] = [0, [], []]
+        entry = self.exact[exact]
+        entry[0] += 1
+        # Every place it ran from: the repeat is usually the one to fix.
+        if origin not in entry[1]:
+            entry[1].append(origin)
+            entry[2].append(key)
+        return execute(sql, params, many, context)
+
+    def findings(self, threshold, ignore=()):
+        """Returns the N+1 and duplicate-query findings, skipping origins matching `ignore`."""
+        found = []
+        for (_, origin), (count, sql, expression) in self.shapes.items():
+            if count > threshold:
+                found.append(Finding('n+1', count, sql, origin, suggest(sql, expression)))
+        for (sql, _), (count, origins, keys) in self.exact.items():
+            if count > 1 and all(self.shapes[key][0] <= threshold for key in keys):
+                origin = origins[0] if len(origins) == 1 else f"{origins[0]}, repeated at {', '.join(origins[1:])}"
+                found.append(Finding('duplicate', count, sql, origin, "Reuse the first result instead of querying again."))
+        return [f for f in found if not any(pattern in f.origin for pattern in ignore)]
+
+
+def format_findings(findings):
+    return "\n".join(
+        f"{f.kind} x{f.count} at {f.origin}\n    {f.sql}\n    {f.suggestion}" for f in findings
+    )
@@ -0,0 +1,141 @@
+# core/profiling.py
+
+"""
+Lightweight per-request timing, reported by core.middleware.ServerTimingMiddleware,
+and the helpers behind the cProfile captures of core.middleware.ProfilingMiddleware.
+
+While a sampled request is running, a context variable holds a
+RequestTimings object; code wraps the work it wants attributed in
+`with timed('geocode'): ...`. SQL is measured by the middleware through
+connection.execute_wrapper(), templates by TimedDjangoTemplates (the
+template backend) and email by TimedSMTPEmailBackend. Outside a sampled
+request timed() only does one ContextVar lookup.
+"""
+
+import io
+import marshal
+import pstats
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import signing
+from django.core.mail.backends.smtp import EmailBackend
+from django.template.backends.django import DjangoTemplates, Template
+
+_timings = ContextVar('kindway_request_timings', default=None)
+
+# Order of the Server-Timing entries.
+STAGES = ('sql', 'template', 'geocode', 'mail')
+
+
+class RequestTimings:
+    """Accumulated (count, seconds) per stage for one request."""
+
+    def __init__(self):
+        self.stages = {}
+
+    def add(self, stage, seconds, count=1):
+        total = self.stages.get(stage)
+        if total is None:
+            self.stages[stage] = [count, seconds]
+        else:
+            total[0] += count
+            total[1] += seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        """connection.execute_wrapper() hook: attributes the query to 'sql'."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.add('sql', time.perf_counter() - start)
+
+
+def start_request():
+    timings = RequestTimings()
+    return timings, _timings.set(timings)
+
+
+def end_request(token):
+    _timings.reset(token)
+
+
+def current_timings():
+    return _timings.get()
+
+
+@contextmanager
+def timed(stage):
+    """Attributes the time spent in the block to `stage` of the current request, if sampled."""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(stage, time.perf_counter() - start)
+
+
+# --- Instrumented backends ---
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The standard Django template backend, timing each top-level render."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class TimedSMTPEmailBackend(EmailBackend):
+    """The SMTP email backend, timing each send."""
+
+    def send_messages(self, email_messages):
+        with timed('mail'):
+            return super().send_messages(email_messages)
+
+
+# --- Request profiles ---
+
+PROFILE_HEADER = 'X-Kindway-Profile'
+_PROFILE_TOKEN_SALT = 'kindway.profiling.header'
+
+
+def profile_token(user):
+    """Returns the PROFILE_HEADER value that gets `user`'s requests profiled."""
+    return signing.dumps(user.pk, salt=_PROFILE_TOKEN_SALT)
+
+
+def profile_token_user_id(token):
+    """Returns the id of the user a valid, unexpired token was issued to, or None."""
+    try:
+        return signing.loads(token, salt=_PROFILE_TOKEN_SALT, max_age=settings.PROFILER_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+
+
+class _StoredStats:
+    """Lets pstats.Stats load marshalled stats from memory instead of a file."""
+    def __init__(self, data):
+        self.stats = marshal.loads(data)
+
+    def create_stats(self):
+        pass
+
+
+def top_functions(data, limit=30, sort='cumulative'):
+    """Returns the pstats report of the `limit` most expensive functions in a stored profile."""
+    out = io.StringIO()
+    pstats.Stats(_StoredStats(data), stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,34 @@
+# core/query_budget.py
+
+"""
+Per-view SQL query budgets.
+
+Views declare how many queries a page may cost for each persona:
+
+    @login_required
+    @query_budget(donor=6, ngo=6)
+    def conversation_list(request): ...
+
+core/tests.py renders every benchmark scenario (core/bench.py) against two
+seeded dataset sizes and fails if a page goes over its budget or if its
+query count changes with the amount of data, which is how an N+1 shows up.
+"""
+
+PERSONAS = ('anonymous', 'donor', 'ngo', 'admin')
+
+
+def query_budget(**budgets):
+    """Declares the maximum number of queries the view may run, per persona."""
+    unknown = set(budgets) - set(PERSONAS)
+    if unknown:
+        raise ValueError(f"Unknown personas in query budget: {', '.join(sorted(unknown))}")
+
+    def decorator(view):
+        view.query_budgets = budgets
+        return view
+    return decorator
+
+
+def get_query_budget(view, persona):
+    """Returns the view's budget for `persona`, or None if it declares none."""
+    return getattr(view, 'query_budgets', {}).get(persona)
@@ -0,0 +1,62 @@
+# core/tasks.py
+
+"""
+A tiny in-process background worker.
+
+Work that should not run on the request path (image processing, geocoding,
+notification fan-out, ...) is handed to a small thread pool. Tasks are
+scheduled with `run_after_commit` so they only start once the rows they
+read are visible to other connections.
+
+The pool is best-effort only: nothing persists the queued tasks, so they are
+lost if the process exits, or (on Vercel) is frozen or recycled once the
+response has been sent. Tasks must be safe to run twice, and work that must
+not be lost needs a sweep that finds what was missed and is run periodically
+(cron or any scheduler): `process_pending_images` for uploads and
+`resume_fanouts` for NGO request notifications.
+
+Set KINDWAY_TASKS_ALWAYS_EAGER = True (e.g. in tests) to run tasks inline.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'KINDWAY_TASK_WORKERS', 2),
+            thread_name_prefix='kindway-task',
+        )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    except Exception:
+        logger.exception("Background task %s failed", getattr(func, '__name__', func))
+    finally:
+        # Worker threads own their DB connections; don't leak them.
+        connections.close_all()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Runs func(*args, **kwargs) on the worker pool (or inline when eager)."""
+    if getattr(settings, 'KINDWAY_TASKS_ALWAYS_EAGER', False):
+        return func(*args, **kwargs)
+    return _get_executor().submit(_run, func, args, kwargs)
+
+
+def run_after_commit(func, *args, **kwargs):
+    """Schedules func on the worker pool once the current transaction commits."""
+    transaction.on_commit(lambda: run_in_background(func, *args, **kwargs))
@@ -1,3 +1,357 @@
-from django.test import TestCase
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.backends import ModelBackend
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.template import engines
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from donations.models import DonationOffer
+from donations.services import transition_offer
+from messaging.models import Conversation, Message
+from users.models import CustomUser, DonorProfile, NGOProfile
+from . import cache as two_tier_cache, metrics
+from .bench import build_scenarios, pick_personas, stub_geocoding
+from .cache import CacheNamespace
+from .coldstart import heaviest_modules, parse_importtime
+from .digests import DIGEST_SUBJECT, build_digests
+from .mail import _claim_batch, queue_mail, queue_mass_mail, send_queued_batch
+from .models import OutboundEmail, RequestProfile
+from .nplusone import QueryRecorder
+from .profiling import profile_token
+from .query_budget import get_query_budget
+from .warmup import warm_up
+
+# Two dataset sizes; a view whose query count differs between them has an N+1.
+SEED_SIZES = {
+    'small': {'donors': 30, 'ngos': 8, 'offers': 20, 'messages': 60},
+    'large': {'donors': 300, 'ngos': 40, 'offers': 200, 'messages': 800},
+}
+
+
+# Any query shape repeated from one place fails the request with NPlusOneDetected;
+# the seeded personas only own a few rows each, hence the low threshold.
+# Per-process L2, so cache bookkeeping doesn't count against the views' budgets.
+@override_settings(NPLUSONE_ENABLED=True, NPLUSONE_RAISE=True, NPLUSONE_THRESHOLD=1, CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+class QueryBudgetTests(TestCase):
+    def render_scenarios(self, size):
+        """Seeds `size` and returns {(view name, persona): query count} for every scenario."""
+        call_command('seed_db', seed=1, stdout=StringIO(), **SEED_SIZES[size])
+        counts = {}
+        with stub_geocoding():
+            personas = pick_personas()
+            for scenario in build_scenarios(personas):
+                client = Client()
+                if personas[scenario.persona] is not None:
+                    client.force_login(personas[scenario.persona])
+                with self.subTest(size=size, view=scenario.name, persona=scenario.persona):
+                    budget = get_query_budget(resolve(scenario.url).func, scenario.persona)
+                    self.assertIsNotNone(budget, f"{scenario.name} declares no query budget for {scenario.persona}")
+                    with CaptureQueriesContext(connection) as queries:
+                        response = getattr(client, scenario.method)(scenario.url, scenario.data)
+                    self.assertEqual(response.status_code, 200)
+                    self.assertLessEqual(len(queries), budget, "\n".join(q['sql'] for q in queries))
+                counts[scenario.name, scenario.persona] = len(queries)
+        return counts
+
+    def test_views_stay_within_query_budgets(self):
+        small = self.render_scenarios('small')
+        large = self.render_scenarios('large')
+        for key, count in small.items():
+            with self.subTest(view=key[0], persona=key[1]):
+                self.assertEqual(large.get(key), count, "query count grows with the amount of data")
+
+
+class NPlusOneDetectorTests(TestCase):
+    def test_reports_template_line_and_select_related_path(self):
+        call_command('seed_db', seed=1, stdout=StringIO(), **SEED_SIZES['small'])
+        template = engines['django'].from_string(
+            "{% for offer in offers %}\n{{ offer.donor.donorprofile.full_name }}\n{% endfor %}"
+        )
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            template.render({'offers': DonationOffer.objects.all()[:10]})
+
+        findings = recorder.findings(threshold=3)
+        self.assertTrue(findings)
+        for finding in findings:
+            self.assertEqual(finding.kind, 'n+1')
+            self.assertIn(':2 `offer.donor.donorprofile.full_name`', finding.origin)
+            self.assertIn(".select_related('donor__donorprofile')", finding.suggestion)
+
+    def test_duplicates_name_the_framework_frame_and_every_repeat(self):
+        user = CustomUser.objects.create_user('ngo', 'ngo@example.com', 'pw', user_type='NGO')
+        offer = DonationOffer.objects.create(donor=user, ngo=user, title='Coat', description='-', delivery_type='PICKUP')
+        offer = DonationOffer.objects.get(pk=offer.pk)
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            ModelBackend().get_user(user.pk)  # What AuthenticationMiddleware does for request.user.
+            offer.ngo  # The same row again, through a lazy foreign key.
+
+        [finding] = recorder.findings(threshold=3)
+        self.assertEqual((finding.kind, finding.count), ('duplicate', 2))
+        first, repeat = finding.origin.split(', repeated at ')
+        self.assertRegex(first, r'^django/contrib/auth/backends\.py:\d+ in get_user$')
+        self.assertRegex(repeat, r'^tests\.py:\d+ in test_duplicates_name_the_framework_frame_and_every_repeat$')
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        fd, path = tempfile.mkstemp(suffix='.sqlite3')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        override = override_settings(
+            METRICS_ENABLED=True, METRICS_DB_PATH=path, METRICS_FLUSH_SECONDS=0, METRICS_TOKEN='scrape-secret',
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def test_metrics_endpoint_reports_latency_histograms_and_counters(self):
+        Client().get(reverse('about_us'))
+        metrics.inc('kindway_message_polls_total', {'result': 'empty'}, 2)
+        metrics.inc('kindway_message_polls_total', {'result': 'empty'})
+
+        response = Client().get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('kindway_http_request_duration_seconds_bucket{view="about_us",status="200",le="+Inf"} 1', body)
+        self.assertIn('kindway_http_request_duration_seconds_count{view="about_us",status="200"} 1', body)
+        self.assertIn('kindway_message_polls_total{result="empty"} 3', body)
+        self.assertIn('kindway_email_queue_depth{status="queued"} 0', body)
+
+    def test_metrics_endpoint_requires_the_bearer_token(self):
+        # A local reverse proxy makes every client look like 127.0.0.1; that alone grants nothing.
+        client = Client(REMOTE_ADDR='127.0.0.1')
+        self.assertEqual(client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        with override_settings(METRICS_TOKEN=''):
+            self.assertEqual(client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ').status_code, 403)
+        with override_settings(METRICS_ENABLED=False):
+            self.assertEqual(client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 404)
+
+
+@override_settings(PROFILER_ENABLED=True, PROFILER_SAMPLE_RATE=0)
+class ProfilingTests(TestCase):
+    def test_staff_header_captures_a_downloadable_profile(self):
+        staff = CustomUser.objects.create_superuser('staff@example.com', 'staff@example.com', 'pw')
+        donor = CustomUser.objects.create_user('donor@example.com', 'donor@example.com', 'pw')
+
+        response = Client().get(reverse('about_us'), HTTP_X_KINDWAY_PROFILE=profile_token(donor))
+        self.assertNotIn('X-Kindway-Profile-Id', response)
+        response = Client().get(reverse('about_us'), HTTP_X_KINDWAY_PROFILE=profile_token(staff))
+        profile = RequestProfile.objects.get(pk=response['X-Kindway-Profile-Id'])
+        self.assertEqual((profile.path, profile.trigger, profile.user), ('/about/', 'HEADER', staff))
+
+        client = Client()
+        client.force_login(staff)
+        download = client.get(reverse('kindway_admin:core_requestprofile_download', args=[profile.pk]))
+        self.assertEqual(download.content, bytes(profile.stats))
+
+        # Staff without view permission on profiles can't download them either.
+        client.force_login(CustomUser.objects.create_user('clerk@example.com', 'clerk@example.com', 'pw', is_staff=True))
+        with self.assertLogs('django.request', 'WARNING'):
+            download = client.get(reverse('kindway_admin:core_requestprofile_download', args=[profile.pk]))
+        self.assertEqual(download.status_code, 403)
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    OUTBOUND_EMAIL_MAX_ATTEMPTS=3, OUTBOUND_EMAIL_RETRY_BASE_SECONDS=60, OUTBOUND_EMAIL_LEASE_SECONDS=600,
+)
+class MailQueueTests(TestCase):
+    def send_failing(self, error=OSError("SMTP said no")):
+        with mock.patch('django.core.mail.EmailMultiAlternatives.send', side_effect=error):
+            return send_queued_batch()
+
+    def test_failures_back_off_exponentially_then_go_dead(self):
+        email = queue_mail("Hi", "Body", None, ['a@example.com'])
+        for attempt, delay in ((1, 60), (2, 120)):
+            before = timezone.now()
+            self.assertEqual(self.send_failing(), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts, email.last_error), ('FAILED', attempt, "SMTP said no"))
+            self.assertGreaterEqual(email.next_attempt_at, before + timedelta(seconds=delay))
+            self.assertLess(email.next_attempt_at, timezone.now() + timedelta(seconds=delay))
+            # Not due yet, so a run in between leaves it alone.
+            self.assertEqual(send_queued_batch(), (0, 0))
+            OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+
+        with self.assertLogs('core.mail', 'ERROR'):
+            self.assertEqual(self.send_failing(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('DEAD', 3))
+        OutboundEmail.objects.filter(pk=email.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(send_queued_batch(), (0, 0))
+
+    def test_batches_are_claimed_before_sending_and_reclaimed_after_the_lease(self):
+        email = queue_mail("Hi", "Body", None, ['a@example.com'])
+        seen = []
+
+        def send(message):
+            # While this worker talks to SMTP the row is leased; a second worker gets nothing.
+            seen.append((OutboundEmail.objects.get(pk=email.pk).status, _claim_batch(10, timezone.now())))
+            return 1
+
+        with mock.patch('django.core.mail.EmailMultiAlternatives.send', send):
+            self.assertEqual(send_queued_batch(), (1, 0))
+        self.assertEqual(seen, [('SENDING', [])])
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('SENT', 1))
+
+        # A worker that died mid-batch: its lease runs out and the mail goes out again.
+        lost = queue_mail("Hi", "Body", None, ['b@example.com'])
+        self.assertEqual([e.pk for e in _claim_batch(10, timezone.now())], [lost.pk])
+        self.assertEqual(send_queued_batch(), (0, 0))
+        OutboundEmail.objects.filter(pk=lost.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(send_queued_batch(), (1, 0))
+
+    def test_without_a_worker_queued_mail_is_sent_after_commit(self):
+        with override_settings(OUTBOUND_EMAIL_WORKER=False), self.captureOnCommitCallbacks(execute=True):
+            email = queue_mail("Hi", "Body", None, ['a@example.com'])
+            self.assertEqual(mail.outbox, [])  # Not before the transaction commits.
+        self.assertEqual([m.to for m in mail.outbox], [['a@example.com']])
+        email.refresh_from_db()
+        self.assertEqual(email.status, 'SENT')
+
+        with override_settings(OUTBOUND_EMAIL_WORKER=True), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            queue_mass_mail([("Hi", "Body", None, ['b@example.com'], None)])
+        self.assertEqual((callbacks, len(mail.outbox)), ([], 1))
+
+    @override_settings(OUTBOUND_EMAIL_WORKER=True, CRON_SECRET='cron-secret')
+    def test_cron_route_drains_the_queue(self):
+        for i in range(3):
+            queue_mail("Hi", "Body", None, [f'{i}@example.com'])
+        url = reverse('send_queued_mail_cron')
+        self.assertEqual(Client().get(url).status_code, 403)
+        self.assertEqual(Client().get(url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+        response = Client().get(url, HTTP_AUTHORIZATION='Bearer cron-secret')
+        self.assertEqual(response.json(), {'sent': 3, 'failed': 0})
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(OutboundEmail.objects.exclude(status='SENT').exists())
+
+
+class DigestTests(TestCase):
+    def setUp(self):
+        self.ngo = CustomUser.objects.create_user('ngo', 'ngo@example.com', 'pw', user_type='NGO')
+        NGOProfile.objects.create(user=self.ngo, ngo_name='Food Bank', address='Pune', latitude=18.52, longitude=73.85)
+        self.donor = CustomUser.objects.create_user('donor', 'donor@example.com', 'pw', user_type='DONOR')
+        DonorProfile.objects.create(user=self.donor, full_name='Asha')
+        CustomUser.objects.create_user('quiet', 'quiet@example.com', 'pw', user_type='DONOR')
+
+        def offer(title):
+            return DonationOffer.objects.create(
+                donor=self.donor, ngo=self.ngo, title=title, description='-', delivery_type='PICKUP',
+            )
+
+        offer('Rice')
+        accepted = offer('Coats')
+        transition_offer(accepted, 'ACCEPTED', changed_by=self.ngo)
+        DonationOffer.objects.filter(pk=offer('Old').pk).update(created_at=timezone.now() - timedelta(days=10))
+        conversation = Conversation.objects.get(offer=accepted)
+        Message.objects.create(conversation=conversation, sender=self.ngo, content="When can we pick up?")
+        Message.objects.create(conversation=conversation, sender=self.donor, content="Friday", is_read=True)
+        self.since = timezone.now() - timedelta(days=7)
+
+    def test_digests_cover_the_week_in_a_fixed_number_of_queries(self):
+        with self.assertNumQueries(4):
+            digests = {d['email']: d for d in build_digests(self.since)}
+        self.assertEqual(set(digests), {'ngo@example.com', 'donor@example.com'})
+        self.assertEqual(
+            {k: digests['ngo@example.com'][k] for k in ('name', 'new_offers', 'still_pending', 'unread_messages')},
+            {'name': 'Food Bank', 'new_offers': 2, 'still_pending': 1, 'unread_messages': 0},
+        )
+        self.assertEqual(
+            {k: digests['donor@example.com'][k] for k in ('name', 'accepted', 'rejected', 'unread_messages')},
+            {'name': 'Asha', 'accepted': 1, 'rejected': 0, 'unread_messages': 1},
+        )
+
+    def test_send_digests_queues_one_email_per_digest(self):
+        with tempfile.TemporaryDirectory() as output_dir:
+            call_command('send_digests', dry_run=True, output_dir=output_dir, stdout=StringIO())
+            self.assertEqual(len(os.listdir(output_dir)), 4)
+            with open(os.path.join(output_dir, f'digest-{self.ngo.pk}.txt')) as f:
+                self.assertIn("New donation offers received: 2 (1 still waiting for your answer)", f.read())
+        self.assertFalse(OutboundEmail.objects.exists())
+
+        call_command('send_digests', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            sorted((e.to[0], e.subject) for e in OutboundEmail.objects.all()),
+            [('donor@example.com', DIGEST_SUBJECT), ('ngo@example.com', DIGEST_SUBJECT)],
+        )
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class CacheNamespaceTests(TestCase):
+    def setUp(self):
+        two_tier_cache.clear()
+
+    def test_late_lock_holder_reuses_the_value_stored_meanwhile(self):
+        namespace = CacheNamespace('cache-tests')
+        real_add = two_tier_cache.l2.add
+        lock_attempts = []
+
+        def add(key, value, timeout=None):
+            if key.endswith(':lock'):
+                lock_attempts.append(key)
+                if len(lock_attempts) == 1:
+                    return False  # Another worker is computing...
+                if len(lock_attempts) == 2:
+                    namespace.set('key', 'theirs')  # ...and stores it just before we get the lock.
+            return real_add(key, value, timeout)
+
+        compute = mock.Mock(return_value='ours')
+        with mock.patch.object(two_tier_cache, 'l2', mock.Mock(wraps=two_tier_cache.l2, add=add)):
+            self.assertEqual(namespace.get_or_set('key', compute), 'theirs')
+        compute.assert_not_called()
+
+    def test_evicted_version_key_never_revives_an_old_epoch(self):
+        namespace = CacheNamespace('cache-tests')
+        namespace.set('key', 'old')
+        namespace.invalidate()
+        namespace.set('key', 'stale')
+        # The backend culls the version key; every process's L1 copy has expired too.
+        two_tier_cache.l2.delete(namespace._version_key())
+        two_tier_cache._l1.clear()
+        self.assertIsNone(namespace.get('key'))
+
+
+IMPORTTIME_SAMPLE = """import time: self [us] | cumulative | imported package
+import time:       900 |        900 |       geopy.point
+import time:       400 |       1300 |     geopy.distance
+import time:       200 |       1500 |   core.geo
+import time:      3000 |       4500 | users.signals
+"""
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ColdStartTests(TestCase):
+    def test_importtime_report_lists_each_package_where_it_is_first_imported(self):
+        modules = parse_importtime(IMPORTTIME_SAMPLE)
+        self.assertEqual(
+            [(m.name, m.cumulative_ms, m.imported_by) for m in heaviest_modules(modules, 10)],
+            [('users.signals', 4.5, None), ('core.geo', 1.5, 'users.signals'), ('geopy.distance', 1.3, 'core.geo')],
+        )
+
+    def test_warm_up_primes_the_homepage_summary(self):
+        self.assertEqual(set(warm_up()), {'load_urls', 'compile_templates', 'prime_caches'})
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(Client().get(reverse('index')).status_code, 200)
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql']], "the summary was recomputed")
+
+    def test_warm_up_logs_a_failing_step_and_runs_the_rest(self):
+        with mock.patch('core.warmup.get_resolver', side_effect=ImportError("broken view")), \
+                self.assertLogs('core.warmup', 'ERROR') as logs:
+            timings = warm_up()
+        self.assertEqual(set(timings), {'load_urls', 'compile_templates', 'prime_caches'})
+        self.assertIn("Warm-up step load_urls failed", logs.output[0])
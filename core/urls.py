@@ -5,4 +5,7 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('about/', views.about_us, name='about_us'),
     path('contact/', views.contact_us, name='contact_us'),
+    path('metrics', views.metrics_view, name='metrics'),
+    path('cron/send-queued-mail', views.send_queued_mail_cron, name='send_queued_mail_cron'),
+    path('cron/send-notification-digests', views.send_notification_digests_cron, name='send_notification_digests_cron'),
 ]
\ No newline at end of file
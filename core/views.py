@@ -1,17 +1,46 @@
 from django.shortcuts import render, redirect
 from django.utils import timezone
-from django.core.mail import send_mail
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db.models import Count
 from django.db.models.functions import TruncDay
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse
+from django.utils.crypto import constant_time_compare
 
 from donations.models import NGORequest, DonationOffer, Category
 from users.models import CustomUser, NGOProfile
 from communications.models import Event
+from communications.services import events_near
+from messaging.services import queue_notification_digests
+from users.services import profile_coordinates
 from .forms import ContactForm
+from . import metrics
+from .cache import CacheNamespace
+from .mail import drain_queue, queue_mail
+from .query_budget import query_budget
 
+# Homepage counters and the about page; a few minutes stale is fine.
+homepage_cache = CacheNamespace('homepage', timeout=300)
+
+CATEGORY_ICONS = {
+    "Food": "bi-basket3-fill", "Clothes": "bi-t-shirt", "Blood": "bi-droplet-half",
+    "Books": "bi-book-half", "Toys": "bi-joystick", "Saplings": "bi-tree-fill",
+    "Electronics": "bi-cpu-fill", "Furniture": "bi-lamp-fill",
+}
+
+def _homepage_summary():
+    all_categories = list(Category.objects.all())
+    for cat in all_categories:
+        cat.icon_class = CATEGORY_ICONS.get(cat.name, "bi-gift-fill")
+    return {
+        'donations_completed': DonationOffer.objects.filter(status='ACCEPTED').count(),
+        'verified_ngos': CustomUser.objects.filter(user_type='NGO', ngoprofile__verification_status='VERIFIED').count(),
+        'registered_donors': CustomUser.objects.filter(user_type='DONOR').count(),
+        'all_categories': all_categories,
+    }
+
+@query_budget(anonymous=5, donor=9)
 def index(request):
     """
     Handles logic for the main homepage, including processing the contact form.
@@ -25,45 +54,33 @@ def index(request):
             subject = f"Contact Form Submission from {name}"
             full_message = f"You received a new message from {name} ({from_email}):\n\n{message_body}"
             admin_email = settings.DEFAULT_FROM_EMAIL
-            try:
-                send_mail(subject, full_message, from_email, [admin_email], fail_silently=False)
-                messages.success(request, "Your message has been sent successfully! We will get back to you soon.")
-                return redirect('index') 
-            except Exception as e:
-                messages.error(request, f"Sorry, there was an error sending your message.")
+            # Queued, not sent: the send_queued_mail worker talks to SMTP.
+            queue_mail(subject, full_message, from_email, [admin_email])
+            messages.success(request, "Your message has been sent successfully! We will get back to you soon.")
+            return redirect('index') 
     else:
         contact_form = ContactForm()
 
     # --- Homepage Data Fetching ---
     ngo_requests = NGORequest.objects.filter(is_active=True).order_by('-created_at')[:3]
-    donations_completed = DonationOffer.objects.filter(status='ACCEPTED').count()
-    verified_ngos_count = CustomUser.objects.filter(user_type='NGO', ngoprofile__verification_status='VERIFIED').count()
-    registered_donors_count = CustomUser.objects.filter(user_type='DONOR').count()
-    upcoming_events = Event.objects.filter(event_date__gte=timezone.now()).order_by('event_date')[:3]
+    # Events near the signed-in user first, falling back to the next ones anywhere.
+    upcoming_events = Event.objects.select_related('ngo__ngoprofile').filter(event_date__gte=timezone.now())
+    center = profile_coordinates(request.user)
+    nearby_events = events_near(upcoming_events, center, settings.EVENTS_NEARBY_RADIUS_KM)[:3] if center else []
+    upcoming_events = nearby_events or upcoming_events.order_by('event_date')[:3]
     featured_ngos = CustomUser.objects.filter(user_type='NGO', ngoprofile__verification_status='VERIFIED').order_by('?')[:3]
-    
-    category_icons = {
-        "Food": "bi-basket3-fill", "Clothes": "bi-t-shirt", "Blood": "bi-droplet-half",
-        "Books": "bi-book-half", "Toys": "bi-joystick", "Saplings": "bi-tree-fill",
-        "Electronics": "bi-cpu-fill", "Furniture": "bi-lamp-fill",
-    }
-    all_categories = Category.objects.all()
-    for cat in all_categories:
-        cat.icon_class = category_icons.get(cat.name, "bi-gift-fill")
 
     context = {
         'contact_form': contact_form,
         'ngo_requests': ngo_requests,
-        'donations_completed': donations_completed,
-        'verified_ngos': verified_ngos_count,
-        'registered_donors': registered_donors_count,
-        'all_categories': all_categories,
+        **homepage_cache.get_or_set('summary', _homepage_summary),
         'upcoming_events': upcoming_events,
         'featured_ngos': featured_ngos,
     }
     
     return render(request, 'core/index.html', context)
 
+@homepage_cache.page()
 def about_us(request):
     return render(request, 'core/about_us.html')
 
@@ -78,7 +95,34 @@ def contact_us(request):
         form = ContactForm()
     return render(request, 'core/contact_us.html', {'form': form})
 
+def _has_bearer_token(request, expected):
+    """True if the request carries `Authorization: Bearer <expected>` (never for an empty `expected`)."""
+    scheme, _, token = request.META.get('HTTP_AUTHORIZATION', '').partition(' ')
+    return bool(expected) and scheme.lower() == 'bearer' and constant_time_compare(token, expected)
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; scrapers send `Authorization: Bearer <METRICS_TOKEN>`."""
+    if not settings.METRICS_ENABLED:
+        raise Http404()
+    if not _has_bearer_token(request, settings.METRICS_TOKEN):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def send_queued_mail_cron(request):
+    """Vercel Cron entry point (vercel.json) draining the outbound email queue; authenticated with CRON_SECRET."""
+    if not _has_bearer_token(request, settings.CRON_SECRET):
+        return HttpResponseForbidden()
+    sent, failed = drain_queue(max_seconds=settings.OUTBOUND_EMAIL_CRON_SECONDS)
+    return JsonResponse({'sent': sent, 'failed': failed})
+
+def send_notification_digests_cron(request):
+    """Vercel Cron entry point (vercel.json) queueing the per-donor notification digests."""
+    if not _has_bearer_token(request, settings.CRON_SECRET):
+        return HttpResponseForbidden()
+    return JsonResponse({'queued': queue_notification_digests()})
+
 @login_required
+@query_budget(admin=13)
 def admin_dashboard(request):
     if not request.user.is_staff:
         messages.error(request, "You do not have permission to view this page.")
@@ -100,7 +144,7 @@ def admin_dashboard(request):
     
     pending_ngos_count = NGOProfile.objects.filter(verification_status='PENDING').count()
     pending_ngo_list = NGOProfile.objects.filter(verification_status='PENDING').select_related('user').order_by('-user__date_joined')[:5]
-    recent_offers = DonationOffer.objects.order_by('-created_at')[:5]
+    recent_offers = DonationOffer.objects.select_related('donor', 'ngo__ngoprofile').order_by('-created_at')[:5]
     recent_users = CustomUser.objects.order_by('-date_joined')[:5]
 
     context = {
@@ -0,0 +1,86 @@
+# core/warmup.py
+
+"""
+Optional warm-up for freshly started workers, run from kindway/wsgi.py when
+WARMUP_ENABLED is on.
+
+A new worker does a lot of one-off work on its first request: importing the
+views behind the URLconf, compiling templates, connecting to the database
+and filling the per-process (L1) cache. On Vercel every cold start is such
+a worker, so warm_up() does that work while the function is initialising
+instead of while a user waits. Each step is best-effort: any exception is
+logged and startup carries on, so warm-up can never stop a worker from
+booting.
+
+It is off by default. Measured with `manage.py coldstart --warmup`, the
+import of kindway.wsgi gets slower by more than the first request gets
+faster, so it only pays off where init time is cheaper than request time
+(e.g. platforms that pre-warm instances).
+"""
+
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.template import engines
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def load_urls():
+    """Imports every view module and builds the reverse() lookup table."""
+    resolver = get_resolver()
+    return len(resolver.reverse_dict)
+
+
+def project_templates(backend):
+    """Returns the names of the project's own templates (not those of installed packages)."""
+    base_dir = str(settings.BASE_DIR)
+    names = set()
+    for directory in backend.template_dirs:
+        directory = str(directory)
+        if not directory.startswith(base_dir) or 'site-packages' in directory:
+            continue
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                if filename.endswith(('.html', '.txt')):
+                    names.add(os.path.relpath(os.path.join(root, filename), directory).replace(os.sep, '/'))
+    return sorted(names)
+
+
+def compile_templates():
+    """Parses the project's templates into the cached template loader."""
+    backend = engines['django']
+    compiled = 0
+    for name in project_templates(backend):
+        try:
+            backend.get_template(name)
+            compiled += 1
+        except Exception as exc:
+            logger.warning("Warm-up could not compile %s: %s", name, exc)
+    return compiled
+
+
+def prime_caches():
+    """Fills the caches of reference data every page needs: the current Site and the homepage summary."""
+    from .views import _homepage_summary, homepage_cache
+
+    Site.objects.get_current()
+    homepage_cache.get_or_set('summary', _homepage_summary)
+
+
+def warm_up():
+    """Runs every warm-up step; returns {step: milliseconds}."""
+    timings = {}
+    for step in (load_urls, compile_templates, prime_caches):
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception("Warm-up step %s failed", step.__name__)
+        timings[step.__name__] = round((time.perf_counter() - start) * 1000, 1)
+    logger.info("Warm-up finished: %s", timings)
+    return timings
@@ -0,0 +1,81 @@
+# donations/exports.py
+
+"""
+Streaming CSV / JSONL exports.
+
+Rows are read with .values(...).iterator(chunk_size=...) and written out one
+at a time, so memory use stays flat no matter how many rows are exported and
+the first bytes reach the client before the query has finished.
+"""
+
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+EXPORT_CHUNK_SIZE = 2000
+
+# Spreadsheets run cells starting with these as formulas (CSV injection).
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Columns exported for DonationOffer rows: header -> values() lookup.
+OFFER_EXPORT_FIELDS = {
+    'id': 'id',
+    'title': 'title',
+    'category': 'category__name',
+    'status': 'status',
+    'delivery_type': 'delivery_type',
+    'donor_email': 'donor__email',
+    'donor_name': 'donor__donorprofile__full_name',
+    'ngo_email': 'ngo__email',
+    'ngo_name': 'ngo__ngoprofile__ngo_name',
+    'created_at': 'created_at',
+}
+
+
+class _EchoBuffer:
+    """A file-like object whose write() hands the line straight back."""
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    """Defuses user-supplied text that Excel or Sheets would evaluate as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def _csv_lines(rows, columns):
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(columns.keys())
+    lookups = list(columns.values())
+    for row in rows:
+        yield writer.writerow([_csv_cell(row[lookup]) for lookup in lookups])
+
+
+def _jsonl_lines(rows, columns):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode({name: row[lookup] for name, lookup in columns.items()}) + '\n'
+
+
+def stream_export(queryset, columns, filename, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Returns a StreamingHttpResponse exporting `queryset` as CSV or JSONL.
+    `columns` maps output column names to values() lookups.
+    """
+    if fmt not in EXPORT_FORMATS:
+        fmt = 'csv'
+    rows = queryset.values(*columns.values()).iterator(chunk_size=chunk_size)
+    lines = _csv_lines(rows, columns) if fmt == 'csv' else _jsonl_lines(rows, columns)
+
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -0,0 +1,93 @@
+# donations/fanout.py
+
+"""
+Notifies donors near an NGO when it posts a new NGORequest.
+
+Runs on the background worker (core/tasks.py). Candidate donors come from
+an indexed latitude/longitude bounding box, are checked exactly with the
+great-circle distance, and are then processed in chunks. Each chunk is one
+transaction: a bulk INSERT of notifications and the progress update on the
+RequestFanout row.
+
+With NGO_REQUEST_FANOUT_EMAILS on, the notifications are also marked
+email_pending. No email is sent per request: the periodic digest
+(messaging.services.queue_notification_digests) sends each donor one email
+listing everything new since the last digest, however many NGOs posted.
+
+A fan-out can be run again, e.g. by `resume_fanouts` after the worker was
+lost mid-run: donors who already have the request's notification are skipped.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+
+from core.geo import distance_km, within_bounding_box
+from messaging.models import Notification
+from users.models import DonorProfile
+from .models import RequestFanout
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def find_nearby_donors(center, radius_km):
+    """Returns [(user_id, email), ...] for donors within `radius_km` of `center`."""
+    candidates = within_bounding_box(DonorProfile.objects.all(), center, radius_km).values_list(
+        'user_id', 'user__email', 'latitude', 'longitude',
+    )
+    return [
+        (user_id, email)
+        for user_id, email, lat, lng in candidates.iterator(chunk_size=settings.NGO_REQUEST_FANOUT_CHUNK_SIZE)
+        if distance_km(center, (lat, lng)) <= radius_km
+    ]
+
+
+def fan_out_ngo_request(fanout_id):
+    """Background task: delivers the notifications for one RequestFanout. Safe to re-run."""
+    fanout = RequestFanout.objects.select_related('ngo_request__ngo__ngoprofile').get(pk=fanout_id)
+    ngo_request = fanout.ngo_request
+    profile = ngo_request.ngo.ngoprofile
+    RequestFanout.objects.filter(pk=fanout.pk).update(
+        status='RUNNING', attempts=F('attempts') + 1, error='', updated_at=timezone.now(),
+    )
+
+    try:
+        recipients = []
+        if profile.latitude is not None and profile.longitude is not None:
+            recipients = find_nearby_donors((profile.latitude, profile.longitude), fanout.radius_km)
+        RequestFanout.objects.filter(pk=fanout.pk).update(recipients_total=len(recipients))
+
+        title = f"{profile.ngo_name} needs {ngo_request.category.name}"
+        url = reverse('fulfill_ngo_request', args=[ngo_request.id])
+
+        for chunk in _chunks(recipients, settings.NGO_REQUEST_FANOUT_CHUNK_SIZE):
+            with transaction.atomic():
+                # Donors reached by an earlier, interrupted run of this fan-out.
+                done = set(Notification.objects.filter(
+                    recipient_id__in=[user_id for user_id, _ in chunk], url=url,
+                ).values_list('recipient_id', flat=True))
+                chunk = [(user_id, email) for user_id, email in chunk if user_id not in done]
+                notifications = Notification.objects.bulk_create([
+                    Notification(
+                        recipient_id=user_id, title=title, body=ngo_request.title, url=url,
+                        email_pending=settings.NGO_REQUEST_FANOUT_EMAILS and bool(email),
+                    )
+                    for user_id, email in chunk
+                ])
+                RequestFanout.objects.filter(pk=fanout.pk).update(
+                    recipients_notified=F('recipients_notified') + len(chunk),
+                    email_recipients=F('email_recipients') + sum(n.email_pending for n in notifications),
+                    updated_at=timezone.now(),
+                )
+    except Exception as exc:
+        RequestFanout.objects.filter(pk=fanout.pk).update(
+            status='FAILED', error=str(exc), updated_at=timezone.now(), finished_at=timezone.now(),
+        )
+        raise
+
+    RequestFanout.objects.filter(pk=fanout.pk).update(status='DONE', updated_at=timezone.now(), finished_at=timezone.now())
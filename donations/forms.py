@@ -21,9 +21,13 @@ class DonationCreationForm(forms.ModelForm):
 class NGORequestForm(forms.ModelForm):
     class Meta:
         model = NGORequest
-        fields = ['title', 'description', 'category']
+        fields = ['title', 'description', 'category', 'expires_at']
         widgets = {
             'description': forms.Textarea(attrs={'rows': 4}),
+            'expires_at': forms.DateTimeInput(attrs={'type': 'datetime-local'}),
+        }
+        labels = {
+            'expires_at': 'Needed until',
         }
 
     def __init__(self, *args, **kwargs):
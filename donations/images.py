@@ -0,0 +1,123 @@
+# donations/images.py
+
+"""
+Image ingestion for Donation and DonationOffer uploads.
+
+Each upload is re-encoded without EXIF, downscaled to IMAGE_MAX_DIMENSION,
+and given the WebP renditions listed in IMAGE_RENDITIONS. Files are stored under a
+content-hash path, so the same photo uploaded twice is only stored once.
+
+Pillow is imported by the functions that need it: this module is loaded at
+startup (via donations.signals), but images are only processed in the
+background task.
+"""
+
+import hashlib
+import logging
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+
+logger = logging.getLogger(__name__)
+
+# Original formats we keep as-is; anything else is stored as JPEG.
+KEPT_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def hashed_image_dir(digest):
+    """images/ab/abcdef.../ - the directory holding one image and its renditions."""
+    return f"images/{digest[:2]}/{digest}"
+
+
+def is_processed(obj):
+    """True if obj.image already points at its content-hash location."""
+    return bool(obj.image_hash) and obj.image.name.startswith(hashed_image_dir(obj.image_hash) + '/')
+
+
+def _encode(image, fmt, **options):
+    buffer = BytesIO()
+    # No exif=/pnginfo= arguments are passed, so metadata is dropped here.
+    image.save(buffer, format=fmt, **options)
+    return ContentFile(buffer.getvalue())
+
+
+def _prepare(image, fmt):
+    if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+        return image.convert('RGB')
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        return image.convert('RGBA')
+    return image
+
+
+def build_renditions(raw):
+    """
+    Returns {'original': (ext, ContentFile), '<rendition>': ('webp', ContentFile), ...}
+    for the raw uploaded bytes.
+    """
+    from PIL import Image, ImageOps
+
+    source = Image.open(BytesIO(raw))
+    fmt = source.format if source.format in KEPT_FORMATS else 'JPEG'
+    # Apply the EXIF orientation before we throw the EXIF block away.
+    image = ImageOps.exif_transpose(source)
+
+    image.thumbnail((settings.IMAGE_MAX_DIMENSION, settings.IMAGE_MAX_DIMENSION))
+    files = {'original': (KEPT_FORMATS[fmt], _encode(_prepare(image, fmt), fmt, quality=85))}
+
+    for name, size in settings.IMAGE_RENDITIONS.items():
+        rendition = image.copy()
+        rendition.thumbnail((size, size))
+        files[name] = ('webp', _encode(_prepare(rendition, 'WEBP'), 'WEBP', quality=80))
+    return files
+
+
+def process_image(model_label, pk):
+    """
+    Background task: normalises the image of one Donation/DonationOffer row
+    and points it at the content-hash location.
+    """
+    from PIL import UnidentifiedImageError
+
+    model = apps.get_model(model_label)
+    obj = model.objects.filter(pk=pk).only('image', 'image_hash').first()
+    if obj is None or not obj.image or is_processed(obj):
+        return
+
+    storage = obj.image.storage
+    uploaded_name = obj.image.name
+    with obj.image.open('rb') as f:
+        raw = f.read()
+
+    digest = hashlib.sha256(raw).hexdigest()
+    directory = hashed_image_dir(digest)
+    names = {}
+    existing = {}
+    if storage.exists(directory):
+        existing = {filename.split('.')[0]: filename for filename in storage.listdir(directory)[1]}
+
+    if {'original', *settings.IMAGE_RENDITIONS} <= existing.keys():
+        # Duplicate upload: reuse the files we already have.
+        names = {key: f"{directory}/{filename}" for key, filename in existing.items()}
+    else:
+        try:
+            files = build_renditions(raw)
+        except (UnidentifiedImageError, OSError):
+            logger.warning("Could not process image %s for %s #%s", uploaded_name, model_label, pk)
+            return
+        for key, (ext, content) in files.items():
+            name = f"{directory}/{key}.{ext}"
+            if not storage.exists(name):
+                storage.save(name, content)
+            names[key] = name
+
+    # Only update the row if nobody replaced the image meanwhile.
+    updated = model.objects.filter(pk=pk, image=uploaded_name).update(
+        image=names['original'],
+        image_hash=digest,
+        image_thumbnail=names.get('thumbnail', ''),
+        image_medium=names.get('medium', ''),
+    )
+    if updated and uploaded_name != names['original']:
+        storage.delete(uploaded_name)
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from donations.models import NGORequest
+from donations.services import invalidate_ngo_requests
+
+
+class Command(BaseCommand):
+    help = "Deactivates NGO requests whose expires_at has passed, in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Requests deactivated per UPDATE.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report how many requests have expired.")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        # Served by the partial index on active rows (donations_req_active_exp_idx).
+        expired = NGORequest.objects.filter(is_active=True, expires_at__lte=now)
+
+        if options['dry_run']:
+            self.stdout.write(f"{expired.count()} NGO request(s) would be deactivated.")
+            return
+
+        total = batches = 0
+        while True:
+            ids = list(expired.order_by('expires_at').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            total += NGORequest.objects.filter(id__in=ids, is_active=True).update(is_active=False)
+            batches += 1
+        if total:
+            # update() skips the post_save signal that normally does this.
+            invalidate_ngo_requests()
+
+        still_active = NGORequest.objects.filter(is_active=True).count()
+        self.stdout.write(self.style.SUCCESS(
+            f"Deactivated {total} expired NGO request(s) in {batches} batch(es); {still_active} remain active."
+        ))
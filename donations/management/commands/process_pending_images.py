@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from donations.images import process_image
+from donations.models import Donation, DonationOffer
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs the image pipeline for uploads it never reached (e.g. the worker was "
+        "frozen or recycled before the background task ran). Safe to run repeatedly."
+    )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model in (Donation, DonationOffer):
+            # Processed images live under images/<hash>/ (images.hashed_image_dir); anything else is a raw upload.
+            pending = (
+                model.objects.exclude(image='').exclude(image__isnull=True).exclude(image__startswith='images/')
+                .values_list('id', flat=True)
+            )
+            for pk in pending.iterator():
+                process_image(model._meta.label, pk)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f"Checked {total} pending image(s)."))
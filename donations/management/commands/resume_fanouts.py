@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from donations.fanout import fan_out_ngo_request
+from donations.models import RequestFanout
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-runs NGO request fan-outs that failed, or that never finished because the "
+        "background worker was lost. Donors already notified are not notified again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--stale-minutes', type=int, default=15,
+            help="PENDING/RUNNING fan-outs without progress for this long count as lost.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(minutes=options['stale_minutes'])
+        unfinished = RequestFanout.objects.filter(
+            Q(status='FAILED') | Q(status__in=['PENDING', 'RUNNING'], updated_at__lte=cutoff),
+            attempts__lt=settings.NGO_REQUEST_FANOUT_MAX_ATTEMPTS,
+        ).order_by('created_at')
+
+        resumed = failed = 0
+        for fanout in unfinished:
+            # Claim it first, so a concurrent sweep doesn't run the same fan-out.
+            if not RequestFanout.objects.filter(
+                pk=fanout.pk, status=fanout.status, updated_at=fanout.updated_at,
+            ).update(updated_at=now):
+                continue
+            try:
+                fan_out_ngo_request(fanout.pk)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"Fan-out #{fanout.pk} failed again: {exc}")
+            else:
+                resumed += 1
+        self.stdout.write(self.style.SUCCESS(f"Finished {resumed} fan-out(s); {failed} failed."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from donations.models import OfferDraft
+from donations.services import delete_drafts
+
+
+class Command(BaseCommand):
+    help = "Deletes expired offer drafts and their temporary image uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Drafts deleted per batch.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        total = 0
+        while True:
+            batch = list(OfferDraft.objects.filter(expires_at__lte=timezone.now()).order_by('id')[:batch_size])
+            if not batch:
+                break
+            total += delete_drafts(batch)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {total} expired offer draft(s)."))
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:15
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0004_ngorequest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donationoffer',
+            index=models.Index(fields=['ngo', 'status', '-created_at', '-id'], name='donations_offer_inbox_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0006_offerstatustransition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donation',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='donation',
+            name='image_medium',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='donation',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='donationoffer',
+            name='image_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='donationoffer',
+            name='image_medium',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to=''),
+        ),
+        migrations.AddField(
+            model_name='donationoffer',
+            name='image_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to=''),
+        ),
+    ]
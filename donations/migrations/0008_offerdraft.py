@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0007_image_renditions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OfferDraft',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('description', models.TextField()),
+                ('delivery_type', models.CharField(choices=[('PICKUP', 'I require pickup'), ('DROP_OFF', 'I will drop off the item')], max_length=10)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='offer_drafts/')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='donations.category')),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offer_drafts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
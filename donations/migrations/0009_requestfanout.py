@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0008_offerdraft'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestFanout',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('RUNNING', 'Running'), ('DONE', 'Done'), ('FAILED', 'Failed')], default='PENDING', max_length=10)),
+                ('radius_km', models.FloatField()),
+                ('recipients_total', models.PositiveIntegerField(default=0)),
+                ('recipients_notified', models.PositiveIntegerField(default=0)),
+                ('emails_sent', models.PositiveIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('ngo_request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fanout', to='donations.ngorequest')),
+            ],
+        ),
+    ]
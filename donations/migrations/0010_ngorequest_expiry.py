@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0009_requestfanout'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='default_request_lifetime_days',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ngorequest',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ngorequest',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['expires_at'], name='donations_req_active_exp_idx'),
+        ),
+    ]
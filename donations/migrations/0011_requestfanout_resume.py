@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 21:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0010_ngorequest_expiry'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='requestfanout',
+            old_name='emails_sent',
+            new_name='emails_queued',
+        ),
+        migrations.AddField(
+            model_name='requestfanout',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='requestfanout',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
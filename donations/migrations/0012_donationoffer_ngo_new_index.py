@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 21:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0011_requestfanout_resume'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donationoffer',
+            index=models.Index(fields=['ngo', '-created_at', '-id'], name='donations_offer_ngo_new_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 21:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('donations', '0012_donationoffer_ngo_new_index'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='requestfanout',
+            old_name='emails_queued',
+            new_name='email_recipients',
+        ),
+    ]
@@ -1,10 +1,15 @@
 # donations/models.py
 
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings # To link to our CustomUser
+from django.utils import timezone
 
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True) # e.g., Food, Clothes, Books
+    # How long requests in this category stay active; blank uses NGO_REQUEST_DEFAULT_LIFETIME_DAYS.
+    default_request_lifetime_days = models.PositiveIntegerField(null=True, blank=True)
 
     def __str__(self):
         return self.name
@@ -16,6 +21,21 @@ class NGORequest(models.Model):
     description = models.TextField()
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Deactivated by the `expire_ngo_requests` command once passed. Blank means never.
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Only active rows are indexed, so the sweeper's scan stays small.
+            models.Index(fields=['expires_at'], condition=models.Q(is_active=True), name='donations_req_active_exp_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.expires_at is None:
+            lifetime = self.category.default_request_lifetime_days or settings.NGO_REQUEST_DEFAULT_LIFETIME_DAYS
+            if lifetime:
+                self.expires_at = timezone.now() + timedelta(days=lifetime)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} requested by {self.ngo.ngoprofile.ngo_name}"
@@ -31,6 +51,10 @@ class Donation(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     image = models.ImageField(upload_to='donation_images/', blank=True, null=True)
+    # Filled in by the image pipeline (donations/images.py) after upload.
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_thumbnail = models.ImageField(blank=True, null=True, editable=False)
+    image_medium = models.ImageField(blank=True, null=True, editable=False)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='AVAILABLE')
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -50,6 +74,11 @@ class DonationOffer(models.Model):
       ('ACCEPTED', 'Accepted'),
       ('REJECTED', 'Rejected'),
     )
+    # The offer state machine: status -> statuses it may move to.
+    # ACCEPTED and REJECTED are final.
+    TRANSITIONS = {
+        'PENDING': ('ACCEPTED', 'REJECTED'),
+    }
     DELIVERY_CHOICES = (
         ('PICKUP', 'I require pickup'),
         ('DROP_OFF', 'I will drop off the item'),
@@ -58,6 +87,10 @@ class DonationOffer(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     image = models.ImageField(upload_to='offer_images/', blank=True, null=True)
+    # Filled in by the image pipeline (donations/images.py) after upload.
+    image_hash = models.CharField(max_length=64, blank=True, editable=False)
+    image_thumbnail = models.ImageField(blank=True, null=True, editable=False)
+    image_medium = models.ImageField(blank=True, null=True, editable=False)
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
     
     # Links to the users
@@ -69,5 +102,77 @@ class DonationOffer(models.Model):
     delivery_type = models.CharField(max_length=10, choices=DELIVERY_CHOICES)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Back the keyset-paginated NGO inbox (see donations.views.ngo_offer_list):
+            # the default, unfiltered view and the ?status= view respectively.
+            models.Index(fields=['ngo', '-created_at', '-id'], name='donations_offer_ngo_new_idx'),
+            models.Index(fields=['ngo', 'status', '-created_at', '-id'], name='donations_offer_inbox_idx'),
+        ]
+
+    def __str__(self):
+        return f"Offer from {self.donor.username} to {self.ngo.username}"
+
+class OfferDraft(models.Model):
+    """
+    A donor's validated offer, held server-side between step 1 (describe
+    the item) and step 2 (choose an NGO) of offer_donation_flow.
+    Expired drafts are removed by the `sweep_offer_drafts` command.
+    """
+    donor = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='offer_drafts', on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    description = models.TextField()
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    delivery_type = models.CharField(max_length=10, choices=DonationOffer.DELIVERY_CHOICES)
+    # Temporary upload area; the file is moved to offer_images/ on finalize.
+    image = models.ImageField(upload_to='offer_drafts/', blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"Draft '{self.title}' by {self.donor.username}"
+
+
+class OfferStatusTransition(models.Model):
+    """History of every status change an offer went through."""
+    offer = models.ForeignKey(DonationOffer, related_name='transitions', on_delete=models.CASCADE)
+    from_status = models.CharField(max_length=10, choices=DonationOffer.STATUS_CHOICES)
+    to_status = models.CharField(max_length=10, choices=DonationOffer.STATUS_CHOICES)
+    changed_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Offer #{self.offer_id}: {self.from_status} -> {self.to_status}"
+
+
+class RequestFanout(models.Model):
+    """
+    Progress of the background job that notifies donors near an NGO
+    about a new NGORequest (see donations/fanout.py). Unfinished jobs are
+    picked up again by the `resume_fanouts` command.
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    )
+    ngo_request = models.OneToOneField(NGORequest, related_name='fanout', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    radius_km = models.FloatField()
+    recipients_total = models.PositiveIntegerField(default=0)
+    recipients_notified = models.PositiveIntegerField(default=0)
+    # Notified donors who will also get it in their next digest email.
+    email_recipients = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped on every bit of progress; a RUNNING job that stops updating it was lost.
+    updated_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
     def __str__(self):
-        return f"Offer from {self.donor.username} to {self.ngo.username}"
\ No newline at end of file
+        return f"Fan-out for request #{self.ngo_request_id} ({self.status})"
@@ -0,0 +1,52 @@
+# donations/pagination.py
+
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+
+def encode_cursor(obj):
+    """Builds the opaque 'after' cursor for the last row shown on a page."""
+    return f"{obj.created_at.isoformat()}_{obj.pk}"
+
+
+def decode_cursor(cursor):
+    """
+    Turns an 'after' cursor back into (created_at, id).
+    Returns None for a missing or tampered cursor so the view simply
+    falls back to the first page.
+    """
+    if not cursor:
+        return None
+    try:
+        created_at, pk = cursor.rsplit('_', 1)
+        created_at = datetime.fromisoformat(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError):
+        return None
+    if timezone.is_naive(created_at):
+        created_at = timezone.make_aware(created_at)
+    return created_at, pk
+
+
+def keyset_page(queryset, cursor=None, page_size=25):
+    """
+    Returns one page of `queryset` ordered newest-first on (created_at, id),
+    plus the cursor for the next page (or None on the last page).
+
+    Unlike OFFSET pagination, the database seeks straight to the cursor
+    position using the index, so page 500 costs the same as page 1.
+    """
+    queryset = queryset.order_by('-created_at', '-id')
+    position = decode_cursor(cursor)
+    if position:
+        created_at, pk = position
+        queryset = queryset.filter(
+            Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+        )
+
+    # Fetch one extra row to find out whether another page exists.
+    rows = list(queryset[:page_size + 1])
+    next_cursor = encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
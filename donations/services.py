@@ -0,0 +1,225 @@
+# donations/services.py
+
+import os
+import posixpath
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from core.cache import CacheNamespace
+from core.geo import distance_km, within_bounding_box
+from messaging.services import create_conversations_for_offers
+from .models import DonationOffer, NGORequest, OfferDraft, OfferStatusTransition
+
+# Maps the action names used in URLs and forms to DonationOffer statuses.
+OFFER_ACTIONS = {
+    'accept': 'ACCEPTED',
+    'reject': 'REJECTED',
+}
+
+# Keeps the IN (...) lists and the per-transaction lock set bounded.
+BULK_BATCH_SIZE = 500
+
+
+def can_transition(from_status, to_status):
+    """True if the offer state machine allows moving from `from_status` to `to_status`."""
+    return to_status in DonationOffer.TRANSITIONS.get(from_status, ())
+
+
+def transition_offer(offer, new_status, changed_by=None):
+    """
+    Moves a single offer to `new_status` using optimistic concurrency.
+
+    The change is a conditional UPDATE ... WHERE status = <status we read>,
+    so when two NGO staff click at the same time exactly one of them wins.
+    Disallowed or no-op transitions return False without touching the database.
+    Returns True if this call performed the transition.
+    """
+    from_status = offer.status
+    if not can_transition(from_status, new_status):
+        return False
+
+    with transaction.atomic():
+        won = DonationOffer.objects.filter(pk=offer.pk, status=from_status).update(status=new_status)
+        if not won:
+            return False
+        OfferStatusTransition.objects.create(
+            offer=offer, from_status=from_status, to_status=new_status, changed_by=changed_by,
+        )
+        if new_status == 'ACCEPTED':
+            # update() bypasses post_save, so create the conversation ourselves.
+            create_conversations_for_offers([offer])
+
+    offer.status = new_status
+    return True
+
+
+def _claim_pending_offers(ids, new_status):
+    """
+    Moves the offers in `ids`, already read as PENDING under select_for_update(),
+    to `new_status` and returns the ids that were changed.
+    """
+    if connection.features.has_select_for_update:
+        # The rows are locked, so no concurrent transition can have moved them.
+        DonationOffer.objects.filter(id__in=ids, status='PENDING').update(status=new_status)
+        return set(ids)
+    # No row locks (SQLite): only count the rows this statement still found PENDING.
+    return {
+        pk for pk in ids
+        if DonationOffer.objects.filter(pk=pk, status='PENDING').update(status=new_status)
+    }
+
+
+def bulk_set_offer_status(offer_ids, new_status, ngo=None, changed_by=None):
+    """
+    Moves many PENDING offers to `new_status` at once.
+
+    Each batch is one SELECT (ownership + PENDING check), one conditional
+    UPDATE, one history INSERT and, for acceptances, a bulk conversation
+    insert; all inside a single transaction. Passing `ngo` restricts the
+    change to offers that NGO received (the admin action passes None).
+    The SELECT locks the rows, so a concurrent transition_offer() waits and
+    then finds them answered. Without row locks (SQLite) the UPDATE runs per
+    offer, and offers another request moved first get no history or
+    conversation from this call.
+    Returns the list of offer ids that were actually changed.
+    """
+    if not can_transition('PENDING', new_status):
+        return []
+
+    offer_ids = sorted({int(pk) for pk in offer_ids})
+    changed = []
+    with transaction.atomic():
+        for start in range(0, len(offer_ids), BULK_BATCH_SIZE):
+            batch = offer_ids[start:start + BULK_BATCH_SIZE]
+            offers = DonationOffer.objects.select_for_update().filter(id__in=batch, status='PENDING')
+            if ngo is not None:
+                offers = offers.filter(ngo=ngo)
+            offers = list(offers.only('id', 'donor_id', 'ngo_id'))
+            if not offers:
+                continue
+
+            won = _claim_pending_offers([o.id for o in offers], new_status)
+            offers = [o for o in offers if o.id in won]
+            OfferStatusTransition.objects.bulk_create([
+                OfferStatusTransition(
+                    offer_id=o.id, from_status='PENDING', to_status=new_status, changed_by=changed_by,
+                )
+                for o in offers
+            ])
+            if new_status == 'ACCEPTED':
+                create_conversations_for_offers(offers)
+            changed.extend(o.id for o in offers)
+    return changed
+
+
+# --- Offer drafts (two-step offer_donation_flow) ---
+
+def move_stored_file(storage, name, upload_to):
+    """
+    Moves a stored file into the `upload_to` directory and returns its new name.
+    On local storage this is a rename, so the bytes are never copied.
+    """
+    target = storage.get_available_name(posixpath.join(upload_to, posixpath.basename(name)))
+    try:
+        source_path, target_path = storage.path(name), storage.path(target)
+    except NotImplementedError:
+        # Remote storage: fall back to copy + delete.
+        with storage.open(name) as f:
+            target = storage.save(target, f)
+        storage.delete(name)
+        return target
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    os.replace(source_path, target_path)
+    return target
+
+
+def delete_drafts(drafts):
+    """Deletes drafts along with their temporary uploads. Returns how many were removed."""
+    drafts = list(drafts)
+    for draft in drafts:
+        if draft.image:
+            draft.image.storage.delete(draft.image.name)
+    OfferDraft.objects.filter(id__in=[draft.id for draft in drafts]).delete()
+    return len(drafts)
+
+
+def create_offer_draft(donor, cleaned_data):
+    """
+    Stores a validated DirectDonationOfferForm as the donor's (only) draft.
+    Any previous draft and its uploaded image are discarded.
+    """
+    delete_drafts(OfferDraft.objects.filter(donor=donor))
+    return OfferDraft.objects.create(
+        donor=donor,
+        title=cleaned_data['title'],
+        description=cleaned_data['description'],
+        category=cleaned_data['category'],
+        delivery_type=cleaned_data['delivery_type'],
+        image=cleaned_data.get('image') or None,
+        expires_at=timezone.now() + timedelta(minutes=settings.OFFER_DRAFT_LIFETIME_MINUTES),
+    )
+
+
+def finalize_offer_draft(draft, ngo):
+    """
+    Turns a draft into a DonationOffer for `ngo`.
+    The draft's image is moved into the offer's upload directory rather than
+    uploaded again, then the draft row is removed.
+    """
+    image_name = None
+    if draft.image:
+        upload_to = DonationOffer._meta.get_field('image').upload_to
+        image_name = move_stored_file(draft.image.storage, draft.image.name, upload_to)
+
+    with transaction.atomic():
+        offer = DonationOffer.objects.create(
+            donor=draft.donor,
+            ngo=ngo,
+            title=draft.title,
+            description=draft.description,
+            category=draft.category,
+            delivery_type=draft.delivery_type,
+            image=image_name,
+        )
+        draft.delete()
+    return offer
+
+
+# --- Nearby NGO requests (donor dashboard) ---
+
+request_cache = CacheNamespace('ngo_requests', timeout=600)
+
+
+def nearby_active_requests(center, radius_km):
+    """
+    Active NGO requests within `radius_km` of `center`, newest first, with the
+    NGO profile and category loaded. Which requests are nearby is cached per
+    location (rounded to ~100 m); invalidate_ngo_requests() drops it all.
+    """
+    lat, lng = round(center[0], 3), round(center[1], 3)
+    requests = NGORequest.objects.filter(is_active=True).select_related('ngo__ngoprofile', 'category').order_by('-created_at')
+    found = []
+
+    def find_ids():
+        candidates = within_bounding_box(
+            requests, (lat, lng), radius_km, lat_field='ngo__ngoprofile__latitude', lng_field='ngo__ngoprofile__longitude',
+        )
+        found.extend(
+            req for req in candidates
+            if distance_km((lat, lng), (req.ngo.ngoprofile.latitude, req.ngo.ngoprofile.longitude)) <= radius_km
+        )
+        return [req.pk for req in found]
+
+    ids = request_cache.get_or_set(f'near:{lat}:{lng}:{radius_km}', find_ids)
+    if found or not ids:
+        # Computed just now (the rows are already loaded), or nothing nearby.
+        return found
+    return list(requests.filter(pk__in=ids))
+
+
+def invalidate_ngo_requests():
+    """Drops the cached nearby-request lookups once the current transaction commits."""
+    transaction.on_commit(request_cache.invalidate)
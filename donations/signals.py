@@ -0,0 +1,43 @@
+# donations/signals.py
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from django.conf import settings
+
+from core.tasks import run_after_commit
+from .fanout import fan_out_ngo_request
+from .images import is_processed, process_image
+from .models import Donation, DonationOffer, NGORequest, RequestFanout
+from .services import invalidate_ngo_requests
+
+
+@receiver(post_save, sender=Donation)
+@receiver(post_save, sender=DonationOffer)
+def queue_image_processing(sender, instance, **kwargs):
+    """
+    Hands newly uploaded images to the image pipeline.
+    The pipeline runs on the background worker, after the upload's
+    transaction has committed, so the request never waits on Pillow.
+    """
+    if instance.image and not is_processed(instance):
+        run_after_commit(process_image, sender._meta.label, instance.pk)
+
+
+@receiver(post_save, sender=NGORequest)
+def queue_request_fanout(sender, instance, created, **kwargs):
+    """
+    Starts notifying nearby donors when an NGO posts a new request.
+    The NGO's request returns immediately; progress is tracked on RequestFanout.
+    """
+    if created:
+        fanout = RequestFanout.objects.create(
+            ngo_request=instance, radius_km=settings.NGO_REQUEST_FANOUT_RADIUS_KM,
+        )
+        run_after_commit(fan_out_ngo_request, fanout.pk)
+
+
+@receiver(post_save, sender=NGORequest)
+@receiver(post_delete, sender=NGORequest)
+def drop_cached_requests(sender, **kwargs):
+    invalidate_ngo_requests()
@@ -1,3 +1,320 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from core.models import OutboundEmail
+from messaging.models import Conversation, Notification
+from users.models import CustomUser, DonorProfile, NGOProfile
+from .exports import OFFER_EXPORT_FIELDS, stream_export
+from .fanout import fan_out_ngo_request
+from .services import (
+    _claim_pending_offers, bulk_set_offer_status, create_offer_draft, finalize_offer_draft, nearby_active_requests,
+    request_cache, transition_offer,
+)
+from .views import _filter_offers
+from .models import Category, DonationOffer, NGORequest, OfferDraft, OfferStatusTransition, RequestFanout
+
+
+def make_users():
+    donor = CustomUser.objects.create_user('donor@example.com', 'donor@example.com', 'pw', user_type='DONOR')
+    ngo = CustomUser.objects.create_user('ngo@example.com', 'ngo@example.com', 'pw', user_type='NGO')
+    return donor, ngo
+
+
+def make_offer(donor, ngo, **fields):
+    fields = {'title': 'Winter coats', 'description': 'Two coats', 'delivery_type': 'PICKUP', **fields}
+    return DonationOffer.objects.create(donor=donor, ngo=ngo, **fields)
+
+
+def png_bytes(size=(40, 30)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def use_temp_media_root(test):
+    """Points MEDIA_ROOT at a directory that is removed after the test."""
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root)
+    override = override_settings(MEDIA_ROOT=media_root)
+    override.enable()
+    test.addCleanup(override.disable)
+
+
+class OfferFilterTests(TestCase):
+    def test_date_filters_include_whole_days(self):
+        donor, ngo = make_users()
+        stamps = ['2026-02-28T23:59:59+00:00', '2026-03-01T00:00:00+00:00', '2026-03-01T23:59:59+00:00', '2026-03-02T00:00:00+00:00']
+        for stamp in stamps:
+            DonationOffer.objects.filter(pk=make_offer(donor, ngo).pk).update(created_at=stamp)
+
+        request = RequestFactory().get('/', {'date_from': '2026-03-01', 'date_to': '2026-03-01'})
+        offers, _ = _filter_offers(request, DonationOffer.objects.all())
+        self.assertEqual(
+            sorted(o.created_at.isoformat() for o in offers), ['2026-03-01T00:00:00+00:00', '2026-03-01T23:59:59+00:00'],
+        )
+
+
+class OfferStatusTests(TestCase):
+    def setUp(self):
+        self.donor, self.ngo = make_users()
+        self.offers = [make_offer(self.donor, self.ngo) for _ in range(3)]
+
+    def test_only_one_of_two_racing_transitions_wins(self):
+        first, second = (DonationOffer.objects.get(pk=self.offers[0].pk) for _ in range(2))
+        self.assertTrue(transition_offer(first, 'ACCEPTED', changed_by=self.ngo))
+        # `second` still holds the PENDING it read before the other click landed.
+        self.assertFalse(transition_offer(second, 'REJECTED', changed_by=self.ngo))
+        self.assertEqual(DonationOffer.objects.get(pk=first.pk).status, 'ACCEPTED')
+        self.assertEqual(OfferStatusTransition.objects.filter(offer=first).count(), 1)
+        self.assertFalse(transition_offer(first, 'REJECTED'))  # ACCEPTED is final.
+
+    @override_settings(NPLUSONE_ENABLED=True)
+    def test_a_double_submitted_answer_is_recorded_once(self):
+        client = Client()
+        client.force_login(self.ngo)
+        offer = self.offers[0]
+        with self.assertNoLogs('kindway.nplusone'):
+            client.post(reverse('update_offer_status', args=[offer.pk, 'accept']))
+            response = client.post(reverse('update_offer_status', args=[offer.pk, 'reject']))
+
+        self.assertRedirects(response, reverse('ngo_offer_list'), fetch_redirect_response=False)
+        self.assertEqual(DonationOffer.objects.get(pk=offer.pk).status, 'ACCEPTED')
+        self.assertEqual(OfferStatusTransition.objects.filter(offer=offer).count(), 1)
+        self.assertEqual(Conversation.objects.filter(offer=offer).count(), 1)
+        self.assertIn("has already been answered", [str(m) for m in get_messages(response.wsgi_request)][-1])
+
+    def test_bulk_change_skips_other_ngos_and_finished_offers(self):
+        other_ngo = CustomUser.objects.create_user('other@example.com', 'other@example.com', 'pw', user_type='NGO')
+        foreign = make_offer(self.donor, other_ngo)
+        rejected = make_offer(self.donor, self.ngo, status='REJECTED')
+        ids = [o.pk for o in self.offers] + [foreign.pk, rejected.pk]
+
+        changed = bulk_set_offer_status(ids, 'ACCEPTED', ngo=self.ngo, changed_by=self.ngo)
+        self.assertEqual(sorted(changed), [o.pk for o in self.offers])
+        self.assertEqual(set(Conversation.objects.values_list('offer_id', flat=True)), set(changed))
+        self.assertEqual(OfferStatusTransition.objects.filter(to_status='ACCEPTED').count(), 3)
+        self.assertEqual(DonationOffer.objects.get(pk=foreign.pk).status, 'PENDING')
+
+    def test_locked_offers_are_claimed_with_one_update(self):
+        ids = [o.pk for o in self.offers]
+        with mock.patch.object(connection.features, 'has_select_for_update', True), self.assertNumQueries(1):
+            self.assertEqual(_claim_pending_offers(ids, 'REJECTED'), set(ids))
+        self.assertEqual(set(DonationOffer.objects.values_list('status', flat=True)), {'REJECTED'})
+
+    def test_bulk_change_skips_offers_a_concurrent_transition_moved_first(self):
+        racer = DonationOffer.objects.get(pk=self.offers[1].pk)
+
+        def claim_after_racer(ids, new_status):
+            # The single-offer click lands between the bulk SELECT and its UPDATE.
+            transition_offer(racer, 'REJECTED', changed_by=self.ngo)
+            return _claim_pending_offers(ids, new_status)
+
+        with mock.patch('donations.services._claim_pending_offers', claim_after_racer):
+            changed = bulk_set_offer_status([o.pk for o in self.offers], 'ACCEPTED', ngo=self.ngo)
+        self.assertEqual(sorted(changed), [self.offers[0].pk, self.offers[2].pk])
+        self.assertEqual(DonationOffer.objects.get(pk=racer.pk).status, 'REJECTED')
+        self.assertEqual(list(OfferStatusTransition.objects.filter(offer=racer).values_list('to_status', flat=True)), ['REJECTED'])
+        self.assertFalse(Conversation.objects.filter(offer=racer).exists())
+
+
+class OfferExportTests(TestCase):
+    def test_csv_cells_that_would_run_as_formulas_are_quoted(self):
+        donor, ngo = make_users()
+        for title in ('=HYPERLINK("http://evil.example")', '+1', '-1', '@SUM(A1)', '\tTab', 'Plain coat'):
+            make_offer(donor, ngo, title=title)
+        response = stream_export(DonationOffer.objects.order_by('id'), OFFER_EXPORT_FIELDS, 'offers')
+        titles = [line.split(',')[1] for line in b''.join(response.streaming_content).decode().splitlines()[1:]]
+        self.assertEqual(titles, ['"\'=HYPERLINK(""http://evil.example"")"', "'+1", "'-1", "'@SUM(A1)", "'\tTab", 'Plain coat'])
+
+
+class OfferDraftTests(TestCase):
+    def setUp(self):
+        use_temp_media_root(self)
+        self.donor, self.ngo = make_users()
+
+    def make_draft(self, name='coat.png'):
+        return create_offer_draft(self.donor, {
+            'title': 'Winter coats', 'description': 'Two coats', 'category': None, 'delivery_type': 'PICKUP',
+            'image': SimpleUploadedFile(name, png_bytes(), content_type='image/png'),
+        })
+
+    def test_finalize_moves_the_draft_image_into_the_offer(self):
+        draft = self.make_draft()
+        storage, draft_image = draft.image.storage, draft.image.name
+        self.assertTrue(draft_image.startswith('offer_drafts/'))
+
+        offer = finalize_offer_draft(draft, self.ngo)
+        self.assertEqual((offer.donor, offer.ngo, offer.title), (self.donor, self.ngo, 'Winter coats'))
+        self.assertEqual(offer.image.name, 'offer_images/coat.png')
+        self.assertEqual(offer.image.read(), png_bytes())
+        self.assertFalse(storage.exists(draft_image))
+        self.assertFalse(OfferDraft.objects.exists())
+
+    def test_a_new_draft_replaces_the_previous_one(self):
+        first = self.make_draft('first.png')
+        second = self.make_draft('second.png')
+        self.assertEqual(list(OfferDraft.objects.all()), [second])
+        self.assertFalse(first.image.storage.exists(first.image.name))
+
+    def test_sweep_deletes_only_expired_drafts_and_their_uploads(self):
+        expired = self.make_draft()
+        OfferDraft.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        other_donor = CustomUser.objects.create_user('other@example.com', 'other@example.com', 'pw', user_type='DONOR')
+        fresh = create_offer_draft(other_donor, {
+            'title': 'Blankets', 'description': 'Three', 'category': None, 'delivery_type': 'DROP_OFF',
+        })
+
+        out = StringIO()
+        call_command('sweep_offer_drafts', batch_size=1, stdout=out)
+        self.assertIn("Deleted 1 expired offer draft(s).", out.getvalue())
+        self.assertEqual(list(OfferDraft.objects.all()), [fresh])
+        self.assertFalse(expired.image.storage.exists(expired.image.name))
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class ExpireRequestTests(TestCase):
+    def setUp(self):
+        request_cache.invalidate()
+        self.ngo = CustomUser.objects.create_user('ngo@example.com', 'ngo@example.com', 'pw', user_type='NGO')
+        NGOProfile.objects.create(user=self.ngo, ngo_name='Food Bank', address='Pune', latitude=18.52, longitude=73.85)
+        self.category = Category.objects.create(name='Food', default_request_lifetime_days=7)
+
+    def make_request(self, title, **fields):
+        return NGORequest.objects.create(ngo=self.ngo, category=self.category, title=title, description='-', **fields)
+
+    def test_new_requests_expire_after_their_category_lifetime(self):
+        request = self.make_request('Rice')
+        self.assertAlmostEqual(request.expires_at - timezone.now(), timedelta(days=7), delta=timedelta(minutes=1))
+
+    def test_sweep_deactivates_only_expired_active_requests(self):
+        past = timezone.now() - timedelta(hours=1)
+        expired = [self.make_request(f'Old {i}', expires_at=past) for i in range(3)]
+        current = self.make_request('Rice')
+        self.make_request('Done', expires_at=past, is_active=False)
+        self.assertEqual(len(nearby_active_requests((18.52, 73.85), 10)), 4)
+
+        out = StringIO()
+        call_command('expire_ngo_requests', dry_run=True, stdout=out)
+        self.assertIn("3 NGO request(s) would be deactivated.", out.getvalue())
+        self.assertEqual(NGORequest.objects.filter(is_active=True).count(), 4)
+
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('expire_ngo_requests', batch_size=2, stdout=out)
+        self.assertIn("Deactivated 3 expired NGO request(s) in 2 batch(es); 1 remain active.", out.getvalue())
+        self.assertFalse(NGORequest.objects.filter(pk__in=[r.pk for r in expired], is_active=True).exists())
+        # Donors near the NGO only see the request that is still running.
+        self.assertEqual(nearby_active_requests((18.52, 73.85), 10), [current])
+
+
+class PendingImageTests(TestCase):
+    def setUp(self):
+        use_temp_media_root(self)
+
+    def test_sweep_processes_uploads_the_background_task_missed(self):
+        offer = make_offer(*make_users())
+        # Stored without save(), so the post_save signal never queues the pipeline (as if the task was lost).
+        name = offer.image.storage.save('offer_images/coat.png', ContentFile(png_bytes()))
+        DonationOffer.objects.filter(pk=offer.pk).update(image=name)
+
+        call_command('process_pending_images', stdout=StringIO())
+        offer.refresh_from_db()
+        self.assertTrue(offer.image.name.startswith(f'images/{offer.image_hash[:2]}/{offer.image_hash}/'))
+        self.assertTrue(offer.image_thumbnail)
+
+        out = StringIO()
+        call_command('process_pending_images', stdout=out)
+        self.assertIn("Checked 0 pending image(s).", out.getvalue())
+
+
+@override_settings(NGO_REQUEST_FANOUT_EMAILS=True, NGO_REQUEST_FANOUT_CHUNK_SIZE=2)
+class RequestFanoutTests(TestCase):
+    def setUp(self):
+        ngo = CustomUser.objects.create_user('ngo@example.com', 'ngo@example.com', 'pw', user_type='NGO')
+        NGOProfile.objects.create(user=ngo, ngo_name='Food Bank', address='Pune', latitude=18.52, longitude=73.85)
+        for i in range(5):
+            donor = CustomUser.objects.create_user(f'd{i}@example.com', f'd{i}@example.com', 'pw', user_type='DONOR')
+            DonorProfile.objects.create(user=donor, full_name=f'Donor {i}', latitude=18.5 + i / 100, longitude=73.85)
+        # The post_save signal creates the RequestFanout; its task only runs on commit.
+        self.ngo_request = NGORequest.objects.create(
+            ngo=ngo, category=Category.objects.create(name='Food'), title='Rice', description='10 kg',
+        )
+        self.fanout = self.ngo_request.fanout
+
+    def test_resume_after_a_crash_notifies_every_donor_exactly_once(self):
+        calls = []
+        bulk_create = Notification.objects.bulk_create
+
+        def flaky_bulk_create(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("worker lost")
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', flaky_bulk_create):
+            with self.assertRaises(RuntimeError):
+                fan_out_ngo_request(self.fanout.pk)
+        self.fanout.refresh_from_db()
+        # The first chunk committed; the failed one rolled back as a whole.
+        self.assertEqual((self.fanout.status, self.fanout.recipients_notified), ('FAILED', 2))
+        self.assertEqual(Notification.objects.count(), 2)
+
+        call_command('resume_fanouts', stdout=StringIO())
+        call_command('resume_fanouts', stdout=StringIO())  # Nothing left to do.
+        self.fanout.refresh_from_db()
+        self.assertEqual((self.fanout.status, self.fanout.recipients_notified, self.fanout.email_recipients), ('DONE', 5, 5))
+        self.assertEqual(Notification.objects.filter(email_pending=True).count(), 5)
+        # Nothing is emailed per request; the digest does that.
+        self.assertFalse(OutboundEmail.objects.exists())
+
+    def test_donors_get_one_digest_for_several_requests(self):
+        other = NGORequest.objects.create(
+            ngo=self.ngo_request.ngo, category=self.ngo_request.category, title='Blankets', description='20',
+        )
+        fan_out_ngo_request(self.fanout.pk)
+        fan_out_ngo_request(other.fanout.pk)
+
+        out = StringIO()
+        call_command('send_notification_digests', stdout=out)
+        self.assertIn("Queued 5 notification digest(s).", out.getvalue())
+        emails = OutboundEmail.objects.order_by('to')
+        self.assertEqual([e.to for e in emails], [[f'd{i}@example.com'] for i in range(5)])
+        self.assertIn('Rice', emails[0].body)
+        self.assertIn('Blankets', emails[0].body)
+        self.assertIn(f'https://example.com/donations/fulfill/{other.pk}/', emails[0].body)
+
+        call_command('send_notification_digests', stdout=StringIO())
+        self.assertEqual(OutboundEmail.objects.count(), 5)
+
+    def test_rerunning_a_finished_fanout_sends_nothing_new(self):
+        fan_out_ngo_request(self.fanout.pk)
+        fan_out_ngo_request(self.fanout.pk)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.fanout.refresh_from_db()
+        self.assertEqual(self.fanout.email_recipients, 5)
+
+    @override_settings(NGO_REQUEST_FANOUT_EMAILS=False)
+    def test_without_fanout_emails_nothing_is_left_for_the_digest(self):
+        fan_out_ngo_request(self.fanout.pk)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertFalse(Notification.objects.filter(email_pending=True).exists())
+
+    def test_running_fanouts_are_left_alone_until_stale(self):
+        RequestFanout.objects.filter(pk=self.fanout.pk).update(status='RUNNING')
+        call_command('resume_fanouts', stdout=StringIO())
+        self.assertEqual(Notification.objects.count(), 0)
+        call_command('resume_fanouts', stale_minutes=0, stdout=StringIO())
+        self.assertEqual(Notification.objects.count(), 5)
@@ -15,6 +15,7 @@ urlpatterns = [
     # 3. /donations/history/
     # Shows the logged-in donor a list of all offers they have sent.
     path('history/', views.offer_history, name='offer_history'),
+    path('history/export/', views.offer_history_export, name='offer_history_export'),
 
     # 4. /donations/offer/<offer_id>/
     # The detail page for a single donation offer. (Renamed from donation_detail)
@@ -24,6 +25,7 @@ urlpatterns = [
     # 5. /donations/ngo/offers/
     # The inbox for an NGO to see all offers they have received.
     path('ngo/offers/', views.ngo_offer_list, name='ngo_offer_list'),
+    path('ngo/offers/export/', views.ngo_offer_export, name='ngo_offer_export'),
 
     # 6. /donations/ngo/request/create/
     # The page for an NGO to post a new "need" (NGORequest).
@@ -34,7 +36,11 @@ urlpatterns = [
     # The endpoint that handles an NGO clicking "accept" or "reject".
     path('offer/<int:offer_id>/update/<str:new_status>/', views.update_offer_status, name='update_offer_status'),
 
-    # 8. /donations/fulfill/<request_id>/
+    # 8. /donations/ngo/offers/bulk/
+    # The endpoint that handles an NGO accepting or rejecting several offers at once.
+    path('ngo/offers/bulk/', views.bulk_update_offer_status, name='bulk_update_offer_status'),
+
+    # 9. /donations/fulfill/<request_id>/
     # The page for a donor to respond to a specific "need" from an NGO.
     path('fulfill/<int:request_id>/', views.fulfill_ngo_request, name='fulfill_ngo_request'),
 
@@ -2,13 +2,65 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponseForbidden
-from geopy.distance import great_circle
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from urllib.parse import urlencode
+from datetime import datetime, time, timedelta
 
-from .models import DonationOffer, NGORequest, Category
+from .models import DonationOffer, NGORequest, Category, OfferDraft
 from .forms import DirectDonationOfferForm, NGORequestForm
+from .exports import OFFER_EXPORT_FIELDS, stream_export
+from .pagination import keyset_page
+from .services import (
+    OFFER_ACTIONS,
+    bulk_set_offer_status,
+    create_offer_draft,
+    finalize_offer_draft,
+    transition_offer,
+)
 from users.models import CustomUser, DonorProfile
+from core.geo import distance_km
+from core.query_budget import query_budget
+
+OFFERS_PER_PAGE = 25
+
+
+def _parse_date_param(value):
+    """Parses a YYYY-MM-DD query parameter, ignoring anything malformed."""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def _day_start(day):
+    """Midnight at the start of `day` in the current time zone."""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _filter_offers(request, offers):
+    """
+    Applies the ?status=, ?date_from= and ?date_to= filters to an offer queryset.
+    Returns the filtered queryset and the cleaned filter values.
+    """
+    status = request.GET.get('status', '')
+    date_from = _parse_date_param(request.GET.get('date_from'))
+    date_to = _parse_date_param(request.GET.get('date_to'))
+    if status in dict(DonationOffer.STATUS_CHOICES):
+        offers = offers.filter(status=status)
+    else:
+        status = ''
+    # Plain range bounds on created_at (not __date, which wraps the column in a
+    # function) so the inbox indexes can seek on it.
+    if date_from:
+        offers = offers.filter(created_at__gte=_day_start(date_from))
+    if date_to:
+        offers = offers.filter(created_at__lt=_day_start(date_to + timedelta(days=1)))
+    return offers, {'status': status, 'date_from': date_from or '', 'date_to': date_to or ''}
+
 
 @login_required
+@query_budget(donor=11)
 def offer_donation_flow(request):
     """Handles the 2-step process for a donor to offer an item to a specific NGO."""
     nearby_ngos = []
@@ -18,18 +70,7 @@ def offer_donation_flow(request):
     if request.method == 'POST':
         form = DirectDonationOfferForm(request.POST, request.FILES)
         if form.is_valid():
-            # Step 1: Temporarily save donation details in the session
-            request.session['donation_offer_data'] = {
-                'title': form.cleaned_data['title'],
-                'description': form.cleaned_data['description'],
-                'category_id': form.cleaned_data['category'].id,
-                'delivery_type': form.cleaned_data['delivery_type'],
-            }
-            # Note: Storing image in session is tricky. This flow assumes
-            # you are re-uploading or handling it differently.
-            # For simplicity, we'll skip the image in the session for now.
-
-            # Step 2: Try to get donor's location (but don't require it)
+            # Step 1: Try to get donor's location (but don't require it)
             donor_coords = None
             try:
                 donor_profile = request.user.donorprofile
@@ -42,19 +83,24 @@ def offer_donation_flow(request):
                 messages.error(request, "Please complete your profile to proceed.")
                 return redirect('edit_donor_profile') # Still block if no profile at all
 
+            # Step 2: Keep the validated offer (and its image) in a server-side
+            # draft; the session only carries the draft's id.
+            draft = create_offer_draft(request.user, form.cleaned_data)
+            request.session['offer_draft_id'] = draft.id
+
             category = form.cleaned_data['category']
             relevant_ngos = CustomUser.objects.filter(
                 user_type='NGO',
                 ngoprofile__verification_status='VERIFIED',
                 ngoprofile__accepted_categories=category,
                 ngoprofile__latitude__isnull=False # Ensure NGO has a location
-            ).distinct()
+            ).select_related('ngoprofile').distinct()
 
             if donor_coords:
                 # --- Location is known: Sort into "nearby" and "other" ---
                 for ngo_user in relevant_ngos:
                     ngo_coords = (ngo_user.ngoprofile.latitude, ngo_user.ngoprofile.longitude)
-                    distance = great_circle(donor_coords, ngo_coords).km
+                    distance = distance_km(donor_coords, ngo_coords)
                     ngo_data = {'user': ngo_user, 'distance': round(distance, 1)}
                     
                     if distance <= 50: # 50km radius
@@ -90,53 +136,94 @@ def offer_donation_flow(request):
 
 @login_required
 def send_offer_to_ngo(request, ngo_id):
-    """Finalizes the donation by creating a DonationOffer from session data."""
-    if request.method == 'POST' and 'donation_offer_data' in request.session:
-        offer_data = request.session.pop('donation_offer_data')
+    """Finalizes the donation by creating a DonationOffer from the donor's draft."""
+    if request.method == 'POST' and 'offer_draft_id' in request.session:
         ngo = get_object_or_404(CustomUser, id=ngo_id, user_type='NGO')
-        
-        DonationOffer.objects.create(
+        draft = OfferDraft.objects.filter(
+            id=request.session.pop('offer_draft_id'),
             donor=request.user,
-            ngo=ngo,
-            title=offer_data['title'],
-            description=offer_data['description'],
-            category_id=offer_data['category_id'],
-            delivery_type=offer_data['delivery_type'],
-        )
-        messages.success(request, f"Your donation offer has been sent to {ngo.ngoprofile.ngo_name}!")
-        return redirect('dashboard')
+            expires_at__gt=timezone.now(),
+        ).first()
+
+        if draft:
+            finalize_offer_draft(draft, ngo)
+            messages.success(request, f"Your donation offer has been sent to {ngo.ngoprofile.ngo_name}!")
+            return redirect('dashboard')
     
-    # If session data is gone or it's a GET request, send back to start
+    # If the draft is gone/expired or it's a GET request, send back to start
     messages.error(request, "Your session expired. Please start the offer again.")
     return redirect('offer_donation_flow')
 
 
 @login_required
+@query_budget(donor=3)
 def offer_history(request):
     """Shows the logged-in donor a list of their sent donation offers."""
-    sent_offers = DonationOffer.objects.filter(donor=request.user).order_by('-created_at')
+    sent_offers = DonationOffer.objects.filter(donor=request.user).select_related('ngo__ngoprofile').order_by('-created_at')
     return render(request, 'donations/offer_history.html', {'sent_offers': sent_offers})
 
 
+@login_required
+def offer_history_export(request):
+    """Streams the logged-in donor's offer history as CSV or JSONL (?format=)."""
+    sent_offers, _ = _filter_offers(request, DonationOffer.objects.filter(donor=request.user))
+    return stream_export(
+        sent_offers.order_by('-created_at', '-id'),
+        OFFER_EXPORT_FIELDS,
+        filename='kindway-offer-history',
+        fmt=request.GET.get('format', 'csv'),
+    )
+
+
 @login_required
 def offer_detail(request, offer_id):
     """Shows the detail page for a single donation offer."""
     offer = get_object_or_404(DonationOffer, id=offer_id)
     # Security check: only participants can view the offer
-    if request.user != offer.donor and request.user != offer.ngo:
+    if request.user.id not in (offer.donor_id, offer.ngo_id):
         return HttpResponseForbidden("You do not have permission to view this page.")
     return render(request, 'donations/offer_detail.html', {'offer': offer})
 
 
 @login_required
+@query_budget(ngo=4)
 def ngo_offer_list(request):
     """Shows a verified NGO a list of donation offers they have received."""
     if not (request.user.user_type == 'NGO' and hasattr(request.user, 'ngoprofile') and request.user.ngoprofile.verification_status == 'VERIFIED'):
         messages.error(request, "You do not have permission to view this page.")
         return redirect('dashboard')
     
-    received_offers = DonationOffer.objects.filter(ngo=request.user).order_by('-created_at')
-    return render(request, 'donations/ngo_offer_list.html', {'received_offers': received_offers})
+    received_offers = DonationOffer.objects.filter(ngo=request.user).select_related('donor__donorprofile', 'category')
+    received_offers, filter_params = _filter_offers(request, received_offers)
+
+    # --- Keyset pagination on (created_at, id), served by the inbox indexes ---
+    page, next_cursor = keyset_page(received_offers, request.GET.get('after'), page_size=OFFERS_PER_PAGE)
+    next_query = urlencode({**filter_params, 'after': next_cursor}) if next_cursor else None
+
+    context = {
+        'received_offers': page,
+        'status_choices': DonationOffer.STATUS_CHOICES,
+        'filters': filter_params,
+        'next_query': next_query,
+        'is_first_page': not request.GET.get('after'),
+    }
+    return render(request, 'donations/ngo_offer_list.html', context)
+
+
+@login_required
+def ngo_offer_export(request):
+    """Streams a verified NGO's received offers as CSV or JSONL (?format=), honouring the inbox filters."""
+    if not (request.user.user_type == 'NGO' and hasattr(request.user, 'ngoprofile') and request.user.ngoprofile.verification_status == 'VERIFIED'):
+        messages.error(request, "You do not have permission to view this page.")
+        return redirect('dashboard')
+
+    received_offers, _ = _filter_offers(request, DonationOffer.objects.filter(ngo=request.user))
+    return stream_export(
+        received_offers.order_by('-created_at', '-id'),
+        OFFER_EXPORT_FIELDS,
+        filename='kindway-received-offers',
+        fmt=request.GET.get('format', 'csv'),
+    )
 
 
 @login_required
@@ -146,17 +233,44 @@ def update_offer_status(request, offer_id, new_status):
         return redirect('dashboard')
     
     offer = get_object_or_404(DonationOffer, id=offer_id)
-    if request.user != offer.ngo:
+    if offer.ngo_id != request.user.id:
         return HttpResponseForbidden("You cannot change the status of this offer.")
 
-    if new_status == 'accept' and offer.status == 'PENDING':
-        offer.status = 'ACCEPTED'
-        messages.success(request, f"You have accepted the offer for '{offer.title}'.")
-    elif new_status == 'reject' and offer.status == 'PENDING':
-        offer.status = 'REJECTED'
-        messages.warning(request, f"You have rejected the offer for '{offer.title}'.")
-    
-    offer.save(update_fields=['status'])
+    # transition_offer() only writes if the offer is still PENDING in the
+    # database, so a double click or a colleague's concurrent answer loses cleanly.
+    target_status = OFFER_ACTIONS.get(new_status)
+    if target_status and transition_offer(offer, target_status, changed_by=request.user):
+        if target_status == 'ACCEPTED':
+            messages.success(request, f"You have accepted the offer for '{offer.title}'.")
+        else:
+            messages.warning(request, f"You have rejected the offer for '{offer.title}'.")
+    elif target_status:
+        messages.info(request, f"The offer for '{offer.title}' has already been answered.")
+
+    return redirect('ngo_offer_list')
+
+
+@login_required
+def bulk_update_offer_status(request):
+    """Handles an NGO accepting or rejecting several selected offers at once."""
+    if request.method != 'POST':
+        return redirect('ngo_offer_list')
+
+    new_status = OFFER_ACTIONS.get(request.POST.get('action'))
+    offer_ids = [pk for pk in request.POST.getlist('offer_ids') if pk.isdigit()]
+    if not new_status or not offer_ids:
+        messages.error(request, "Please select at least one offer and an action.")
+        return redirect('ngo_offer_list')
+
+    # Only this NGO's still-pending offers are touched; anything else is skipped.
+    changed = bulk_set_offer_status(offer_ids, new_status, ngo=request.user, changed_by=request.user)
+    skipped = len(set(offer_ids)) - len(changed)
+    if new_status == 'ACCEPTED':
+        messages.success(request, f"You have accepted {len(changed)} offer(s).")
+    else:
+        messages.warning(request, f"You have rejected {len(changed)} offer(s).")
+    if skipped:
+        messages.info(request, f"{skipped} offer(s) were skipped because they were already answered.")
     return redirect('ngo_offer_list')
 
 
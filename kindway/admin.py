@@ -1,13 +1,22 @@
+from django.conf import settings
 from django.contrib import admin
-from django.shortcuts import redirect
-from django.urls import reverse
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404, redirect
+from django.urls import path, reverse
+from django.utils import timezone
 from django.utils.html import format_html
 
 # --- Import ALL models from ALL apps ---
 from users.models import CustomUser, DonorProfile, NGOProfile
-from donations.models import Category, Donation, DonationOffer, NGORequest
-from communications.models import Event, SuccessStory
-from messaging.models import Conversation, Message
+from donations.models import Category, Donation, DonationOffer, NGORequest, OfferStatusTransition, RequestFanout
+from communications.models import Event, EventWaitlistEntry, SuccessStory
+from messaging.models import Conversation, Message, Notification
+from core.models import OutboundEmail, RequestProfile
+from core.profiling import PROFILE_HEADER, profile_token, top_functions
+from donations.exports import OFFER_EXPORT_FIELDS, stream_export
+from donations.services import bulk_set_offer_status
+from users.services import bulk_verify_ngos
 
 # --- Define the Custom Admin Site ---
 class KindwayAdminSite(admin.AdminSite):
@@ -59,13 +68,45 @@ class NGOProfileAdmin(admin.ModelAdmin):
     view_document_link.short_description = 'Document'
     
     def approve_ngos(self, request, queryset):
-        queryset.update(verification_status='VERIFIED')
+        verified, emailed = bulk_verify_ngos(queryset)
+        self.message_user(request, f"{verified} NGO(s) have been verified; {emailed} verification email(s) queued.")
     approve_ngos.short_description = "Approve selected NGOs"
 
     def reject_ngos(self, request, queryset):
         queryset.update(verification_status='REJECTED')
     reject_ngos.short_description = "Reject selected NGOs"
 
+class OfferStatusTransitionInline(admin.TabularInline):
+    model = OfferStatusTransition
+    extra = 0
+    readonly_fields = ('from_status', 'to_status', 'changed_by', 'created_at')
+    can_delete = False
+
+class DonationOfferAdmin(admin.ModelAdmin):
+    list_display = ('title', 'donor', 'ngo', 'status', 'delivery_type', 'created_at')
+    list_filter = ('status', 'delivery_type', 'category')
+    search_fields = ('title', 'donor__email', 'ngo__email')
+    actions = ['accept_offers', 'reject_offers', 'export_offers_csv', 'export_offers_jsonl']
+    inlines = [OfferStatusTransitionInline]
+
+    def accept_offers(self, request, queryset):
+        changed = bulk_set_offer_status(queryset.values_list('id', flat=True), 'ACCEPTED', changed_by=request.user)
+        self.message_user(request, f"{len(changed)} pending offer(s) have been accepted.")
+    accept_offers.short_description = "Accept selected pending offers"
+
+    def reject_offers(self, request, queryset):
+        changed = bulk_set_offer_status(queryset.values_list('id', flat=True), 'REJECTED', changed_by=request.user)
+        self.message_user(request, f"{len(changed)} pending offer(s) have been rejected.")
+    reject_offers.short_description = "Reject selected pending offers"
+
+    def export_offers_csv(self, request, queryset):
+        return stream_export(queryset.order_by('-created_at', '-id'), OFFER_EXPORT_FIELDS, 'kindway-offers', fmt='csv')
+    export_offers_csv.short_description = "Export selected offers as CSV"
+
+    def export_offers_jsonl(self, request, queryset):
+        return stream_export(queryset.order_by('-created_at', '-id'), OFFER_EXPORT_FIELDS, 'kindway-offers', fmt='jsonl')
+    export_offers_jsonl.short_description = "Export selected offers as JSONL"
+
 class MessageInline(admin.TabularInline):
     model = Message
     extra = 1
@@ -79,6 +120,93 @@ class MessageAdmin(admin.ModelAdmin):
     list_display = ('sender', 'conversation', 'timestamp', 'is_read')
     list_filter = ('is_read', 'conversation')
 
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'recipients', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject', 'to')
+    readonly_fields = ('attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+
+    def recipients(self, obj):
+        return ', '.join(obj.to)
+    recipients.short_description = 'To'
+
+    def retry_now(self, request, queryset):
+        count = queryset.exclude(status='SENT').update(status='QUEUED', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, f"{count} email(s) have been re-queued.")
+    retry_now.short_description = "Re-queue selected emails"
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('path', 'view_name', 'status_code', 'duration_ms', 'query_count', 'trigger', 'user', 'created_at', 'download_link')
+    list_filter = ('trigger', 'view_name', 'status_code')
+    search_fields = ('path', 'view_name')
+    ordering = ('-duration_ms',)
+    list_select_related = ('user',)
+    fields = ('method', 'path', 'view_name', 'status_code', 'duration_ms', 'query_count', 'trigger', 'user', 'created_at', 'download_link', 'hot_spots')
+    readonly_fields = fields
+    change_list_template = 'admin/core/requestprofile/change_list.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def get_queryset(self, request):
+        # The stats blob is only loaded on the detail page and for downloads.
+        return super().get_queryset(request).defer('stats')
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/', self.admin_site.admin_view(self.download_view), name='core_requestprofile_download'),
+        ] + super().get_urls()
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {
+            **(extra_context or {}),
+            'profile_header': PROFILE_HEADER,
+            'profile_token': profile_token(request.user),
+            'profile_token_hours': settings.PROFILER_TOKEN_MAX_AGE // 3600,
+        }
+        return super().changelist_view(request, extra_context)
+
+    def download_view(self, request, pk):
+        # admin_view only checks is_staff; the raw profile needs view permission like the detail page.
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        response = HttpResponse(bytes(profile.stats), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="request-{profile.pk}.prof"'
+        return response
+
+    def download_link(self, obj):
+        return format_html('<a href="{}">.prof</a>', reverse('kindway_admin:core_requestprofile_download', args=[obj.pk]))
+    download_link.short_description = 'Profile'
+
+    def hot_spots(self, obj):
+        return format_html('<pre>{}</pre>', top_functions(bytes(obj.stats)))
+    hot_spots.short_description = 'Top functions (cumulative)'
+
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('recipient', 'title', 'created_at', 'is_read')
+    list_filter = ('is_read',)
+    raw_id_fields = ('recipient',)
+
+class RequestFanoutAdmin(admin.ModelAdmin):
+    list_display = ('ngo_request', 'status', 'recipients_notified', 'recipients_total', 'email_recipients', 'attempts', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('ngo_request', 'status', 'radius_km', 'recipients_total', 'recipients_notified', 'email_recipients', 'attempts', 'error', 'created_at', 'updated_at', 'finished_at')
+
+class EventWaitlistEntryInline(admin.TabularInline):
+    model = EventWaitlistEntry
+    extra = 0
+    readonly_fields = ('user', 'created_at')
+    can_delete = True
+
+class EventAdmin(admin.ModelAdmin):
+    list_display = ('title', 'ngo', 'event_date', 'volunteer_count', 'capacity')
+    list_select_related = ('ngo',)
+    readonly_fields = ('volunteer_count',)
+    filter_horizontal = ('volunteers',)
+    inlines = [EventWaitlistEntryInline]
+
 # --- Register ALL models with the custom site ---
 kindway_admin_site.register(CustomUser)
 kindway_admin_site.register(NGOProfile, NGOProfileAdmin)
@@ -86,14 +214,19 @@ kindway_admin_site.register(DonorProfile)
 
 kindway_admin_site.register(Category)
 kindway_admin_site.register(Donation)
-kindway_admin_site.register(DonationOffer)
+kindway_admin_site.register(DonationOffer, DonationOfferAdmin)
 kindway_admin_site.register(NGORequest)
+kindway_admin_site.register(RequestFanout, RequestFanoutAdmin)
 
-kindway_admin_site.register(Event)
+kindway_admin_site.register(Event, EventAdmin)
 kindway_admin_site.register(SuccessStory, SuccessStoryAdmin)
 
 kindway_admin_site.register(Conversation, ConversationAdmin)
 kindway_admin_site.register(Message, MessageAdmin)
+kindway_admin_site.register(Notification, NotificationAdmin)
+
+kindway_admin_site.register(OutboundEmail, OutboundEmailAdmin)
+kindway_admin_site.register(RequestProfile, RequestProfileAdmin)
 
 # Register allauth models
 from django.contrib.sites.models import Site
@@ -2,6 +2,7 @@
 
 from pathlib import Path
 import os
+import tempfile
 import dj_database_url
 from dotenv import load_dotenv
 
@@ -52,6 +53,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Request latency / query counts for /metrics; off unless METRICS_ENABLED
+    'core.middleware.MetricsMiddleware',
+    # cProfile captures of sampled / staff-requested requests; off unless PROFILER_ENABLED
+    'core.middleware.ProfilingMiddleware',
+    # Server-Timing header + per-request log line; off unless PROFILING_SAMPLE_RATE > 0
+    'core.middleware.ServerTimingMiddleware',
     # Whitenoise middleware added
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -59,6 +66,8 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    # Logs N+1 / duplicate queries per request; on in DEBUG (see NPLUSONE_* below)
+    'core.middleware.NPlusOneMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -70,7 +79,10 @@ ROOT_URLCONF = 'kindway.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates, plus render timing for core.middleware.ServerTimingMiddleware
+        'BACKEND': 'core.profiling.TimedDjangoTemplates',
+        # Keep the stock alias, so engines['django'] still resolves
+        'NAME': 'django',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -149,8 +161,130 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# --- Image Pipeline (donations/images.py) ---
+# Uploaded originals are downscaled to fit this box (in pixels).
+IMAGE_MAX_DIMENSION = 1600
+# WebP renditions generated for every upload: name -> bounding box in pixels.
+IMAGE_RENDITIONS = {
+    'thumbnail': 320,
+    'medium': 800,
+}
+
+# --- Offer Drafts ---
+# How long a donor has to pick an NGO after describing their item.
+OFFER_DRAFT_LIFETIME_MINUTES = 120
+
+# --- NGO Request Expiry ---
+# Lifetime of a new NGORequest when its category sets none (0 = never expire).
+NGO_REQUEST_DEFAULT_LIFETIME_DAYS = 30
+
+# --- NGO Request Fan-out (donations/fanout.py) ---
+# Donors within this distance of an NGO hear about its new requests.
+NGO_REQUEST_FANOUT_RADIUS_KM = 50
+NGO_REQUEST_FANOUT_CHUNK_SIZE = 1000
+# Also email nearby donors: new requests are batched into one digest per donor
+# (send_notification_digests) instead of one email per request.
+NGO_REQUEST_FANOUT_EMAILS = os.getenv('NGO_REQUEST_FANOUT_EMAILS', 'False') == 'True'
+# `resume_fanouts` gives up on a fan-out after this many runs.
+NGO_REQUEST_FANOUT_MAX_ATTEMPTS = 5
+
+# --- Events Near Me (communications/views.py) ---
+EVENTS_NEARBY_RADIUS_KM = 25
+EVENTS_NEARBY_MAX_RADIUS_KM = 200
+EVENTS_NEARBY_MAX_RESULTS = 200
+
+# --- Event Feeds (communications/feeds.py) ---
+# How long each worker serves its copy of a feed. The worker that saves an event
+# drops it at once; other workers may serve the old feed for up to this long.
+EVENT_FEED_CACHE_SECONDS = 60 * 60
+EVENT_FEED_CLIENT_MAX_AGE = 15 * 60
+EVENT_FEED_PAST_DAYS = 30
+EVENT_FEED_MAX_EVENTS = 500
+
+# --- Request Profiling (core/middleware.py) ---
+# Share of requests timed and reported via Server-Timing / the 'kindway.profiling' log; 0 disables.
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'kindway.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+        'kindway.nplusone': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+# --- Caching (core/cache.py) ---
+# Shared (L2) cache: 'db' (table created by `migrate`, see core/migrations/0005), 'file' or 'locmem' (per process).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'db')
+_CACHE_BACKENDS = {
+    'db': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'kindway_cache'},
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'kindway-cache')),
+    },
+    'locmem': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+CACHES = {
+    'default': {**_CACHE_BACKENDS[CACHE_BACKEND], 'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': 10000}},
+}
+# Per-process L1 in front of it. Other workers see an invalidation after at most CACHE_L1_TIMEOUT seconds.
+CACHE_L1_MAX_ENTRIES = 1000
+CACHE_L1_TIMEOUT = 10
+# How long a cache miss may be recomputed before waiting callers give up and compute it themselves.
+CACHE_LOCK_TIMEOUT = 10
+
+# --- Request Profiler (core/middleware.py ProfilingMiddleware) ---
+# Opt-in cProfile captures, listed slowest first in the admin under "Request profiles".
+PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'False') == 'True'
+# Share of requests profiled; requests carrying a staff X-Kindway-Profile token always are.
+PROFILER_SAMPLE_RATE = float(os.getenv('PROFILER_SAMPLE_RATE', 0))
+# Sampled requests faster than this are not stored.
+PROFILER_MIN_DURATION_MS = float(os.getenv('PROFILER_MIN_DURATION_MS', 200))
+PROFILER_MAX_PROFILES = 500
+# Lifetime of the X-Kindway-Profile tokens shown in the admin, in seconds.
+PROFILER_TOKEN_MAX_AGE = 24 * 60 * 60
+
+# --- Metrics (core/metrics.py) ---
+# Off by default: every request takes a process-wide lock and workers flush to a
+# host-local SQLite file. Only meaningful on long-lived hosts (gunicorn), not on
+# serverless instances, whose /tmp is per instance.
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+# Shared by all worker processes on the host; /metrics reads the totals from here.
+METRICS_DB_PATH = os.getenv('METRICS_DB_PATH', os.path.join(tempfile.gettempdir(), 'kindway-metrics.sqlite3'))
+# How long a worker buffers samples in memory before adding them to the shared file.
+METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
+# Scrapers authenticate with `Authorization: Bearer <METRICS_TOKEN>`; unset refuses everyone.
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# --- N+1 Query Detection (core/nplusone.py) ---
+# Opt-in, for development and staging: it records every query and logs its findings.
+# The tests that check for N+1s turn it on themselves.
+NPLUSONE_ENABLED = os.getenv('NPLUSONE_ENABLED', 'False') == 'True'
+# A query shape may run this many times per request before it counts as an N+1.
+NPLUSONE_THRESHOLD = int(os.getenv('NPLUSONE_THRESHOLD', 3))
+# Fail the request (NPlusOneDetected) instead of logging; the test suite turns this on.
+NPLUSONE_RAISE = False
+# Known, accepted findings: substrings matched against the reported origin
+# (e.g. 'messaging/conversation_list.html:12'). The database cache's own
+# bookkeeping repeats a few statements on every cache miss.
+NPLUSONE_IGNORE = ['core/cache.py']
+
+# --- Cold Start (core/warmup.py) ---
+# Do the first request's one-off work (URLconf, templates, reference caches) as each worker starts.
+# Off by default: it moves that time into the import rather than removing it (see `manage.py coldstart --warmup`).
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'False') == 'True'
+
+# --- Background Tasks (core/tasks.py) ---
+KINDWAY_TASK_WORKERS = int(os.getenv('KINDWAY_TASK_WORKERS', 2))
+# Run background tasks inline (useful for tests and one-off scripts).
+KINDWAY_TASKS_ALWAYS_EAGER = os.getenv('KINDWAY_TASKS_ALWAYS_EAGER', 'False') == 'True'
+
 # --- EMAIL CONFIGURATION ---
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = 'core.profiling.TimedSMTPEmailBackend'  # Django's SMTP backend, timed
 EMAIL_HOST = 'smtp.sendgrid.net'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
@@ -158,5 +292,20 @@ EMAIL_HOST_USER = 'apikey'
 EMAIL_HOST_PASSWORD = os.getenv('SENDGRID_API_KEY')
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'your-default-email@example.com') 
 
+# Outbound email queue (core/mail.py), drained by `manage.py send_queued_mail` or,
+# on Vercel, by the cron route /cron/send-queued-mail (see vercel.json).
+# Set to True once one of those runs on a schedule. Until then each queued email is
+# sent right after its transaction commits, on the request path.
+OUTBOUND_EMAIL_WORKER = os.getenv('OUTBOUND_EMAIL_WORKER', 'False') == 'True'
+# Vercel Cron authenticates with `Authorization: Bearer <CRON_SECRET>`; unset refuses everyone.
+CRON_SECRET = os.getenv('CRON_SECRET', '')
+# How long one cron call keeps sending, to stay inside the function's time limit.
+OUTBOUND_EMAIL_CRON_SECONDS = 8
+OUTBOUND_EMAIL_MAX_ATTEMPTS = 5
+# Retries back off exponentially: base, 2x base, 4x base, ...
+OUTBOUND_EMAIL_RETRY_BASE_SECONDS = 60
+# A claimed batch must be sent within this long, or another worker takes it over (and may resend).
+OUTBOUND_EMAIL_LEASE_SECONDS = 10 * 60
+
 # --- Database ---
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
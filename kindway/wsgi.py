@@ -13,6 +13,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'kindway.settings')
 
 application = get_wsgi_application()
 
+from django.conf import settings
+
+if settings.WARMUP_ENABLED:
+    # Compile templates and prime caches now rather than on the first request.
+    from core.warmup import warm_up
+    warm_up()
+
 # --- ADD THIS LINE ---
 # Vercel looks for a variable named 'app'.
 app = application
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from messaging.services import queue_notification_digests
+
+
+class Command(BaseCommand):
+    help = (
+        "Queues one email per donor listing the notifications they have not been emailed yet "
+        "(e.g. new NGO requests nearby). Run it hourly or daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Recipients handled per transaction.")
+
+    def handle(self, *args, **options):
+        queued = queue_notification_digests(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Queued {queued} notification digest(s)."))
@@ -33,4 +33,28 @@ class Message(models.Model):
         ordering = ['timestamp'] # Ensure messages are ordered chronologically
 
     def __str__(self):
-        return f"From {self.sender.username} at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"From {self.sender.username} at {self.timestamp.strftime('%Y-%m-%d %H:%M')}"
+
+class Notification(models.Model):
+    """
+    An in-app notification, e.g. "an NGO near you posted a new need".
+    """
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='notifications', on_delete=models.CASCADE)
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    url = models.CharField(max_length=255, blank=True)
+    is_read = models.BooleanField(default=False)
+    # Waiting for the recipient's next digest email (messaging.services.queue_notification_digests).
+    email_pending = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['recipient', 'is_read', '-created_at'], name='messaging_notif_inbox_idx'),
+            # Only the few rows still waiting for a digest are indexed.
+            models.Index(fields=['recipient'], condition=models.Q(email_pending=True), name='messaging_notif_email_idx'),
+        ]
+
+    def __str__(self):
+        return f"Notification for {self.recipient.username}: {self.title}"
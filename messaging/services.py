@@ -0,0 +1,100 @@
+# messaging/services.py
+
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.db import transaction
+from django.template.loader import get_template
+
+from core.mail import queue_mass_mail
+from .models import Conversation, Notification
+
+NOTIFICATION_DIGEST_SUBJECT = "New on Kindway near you"
+
+
+def create_conversations_for_offers(offers):
+    """
+    Bulk version of signals.create_conversation_on_acceptance.
+
+    Creates one conversation per accepted offer (skipping offers that already
+    have one) and adds the donor and NGO as participants, using one INSERT
+    for the conversations and one for the participant rows.
+    Returns the number of conversations created.
+    """
+    offers = list(offers)
+    if not offers:
+        return 0
+
+    existing = set(
+        Conversation.objects.filter(offer__in=[o.id for o in offers]).values_list('offer_id', flat=True)
+    )
+    new_offers = [o for o in offers if o.id not in existing]
+    if not new_offers:
+        return 0
+
+    conversations = Conversation.objects.bulk_create(
+        [Conversation(offer_id=o.id) for o in new_offers]
+    )
+    # bulk_create does not return primary keys on every backend, so re-read them.
+    conversation_ids = dict(
+        Conversation.objects.filter(offer__in=[o.id for o in new_offers]).values_list('offer_id', 'id')
+    )
+
+    Participant = Conversation.participants.through
+    Participant.objects.bulk_create(
+        [
+            Participant(conversation_id=conversation_ids[o.id], customuser_id=user_id)
+            for o in new_offers
+            for user_id in (o.donor_id, o.ngo_id)
+        ],
+        ignore_conflicts=True,
+    )
+    return len(conversations)
+
+
+def queue_notification_digests(batch_size=500):
+    """
+    Queues one email per recipient listing all of their notifications marked
+    email_pending, however many there are, and clears the flag.
+
+    Each batch of recipients is one transaction, so a crash queues and
+    clears everything in it or nothing. The per-digest idempotency key
+    keeps two overlapping runs from sending the same digest twice.
+    Returns the number of digests queued.
+    """
+    template = get_template('emails/notification_digest.txt')
+    site_url = f"https://{Site.objects.get_current().domain}"
+    pending = Notification.objects.filter(email_pending=True)
+    queued = 0
+    while True:
+        with transaction.atomic():
+            recipient_ids = list(pending.order_by('recipient_id').values_list('recipient_id', flat=True).distinct()[:batch_size])
+            if not recipient_ids:
+                return queued
+            rows = (
+                pending.select_for_update(of=('self',)).filter(recipient_id__in=recipient_ids)
+                .order_by('created_at', 'id').values_list('id', 'recipient_id', 'recipient__email', 'title', 'body', 'url')
+            )
+            by_recipient = defaultdict(list)
+            ids = []
+            for pk, recipient_id, email, title, body, url in rows:
+                ids.append(pk)
+                if email:
+                    by_recipient[recipient_id, email].append(
+                        {'id': pk, 'title': title, 'body': body, 'url': f"{site_url}{url}" if url else ''}
+                    )
+
+            digests = list(by_recipient.items())
+            queue_mass_mail(
+                [
+                    (NOTIFICATION_DIGEST_SUBJECT, template.render({'notifications': items}), settings.DEFAULT_FROM_EMAIL, [email], None)
+                    for (_, email), items in digests
+                ],
+                # Named after the newest notification it covers.
+                idempotency_keys=[
+                    f"notification-digest:{recipient_id}:{items[-1]['id']}" for (recipient_id, _), items in digests
+                ],
+            )
+            Notification.objects.filter(id__in=ids).update(email_pending=False)
+            queued += len(digests)
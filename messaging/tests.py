@@ -1,3 +1,37 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from core.models import OutboundEmail
+from users.models import CustomUser
+from .models import Notification
+from .services import queue_notification_digests
+
+
+@override_settings(CRON_SECRET='cron-secret')
+class NotificationDigestTests(TestCase):
+    def setUp(self):
+        self.donor = CustomUser.objects.create_user('donor', 'donor@example.com', 'pw', user_type='DONOR')
+        self.no_email = CustomUser.objects.create_user('anon', '', 'pw', user_type='DONOR')
+        for user in (self.donor, self.no_email):
+            Notification.objects.create(recipient=user, title="New request", body="Rice", url='/a/', email_pending=True)
+            Notification.objects.create(recipient=user, title="New request", body="Blankets", url='/b/', email_pending=True)
+        Notification.objects.create(recipient=self.donor, title="Seen", body="Already emailed", url='/c/')
+
+    def test_pending_notifications_are_sent_as_one_email(self):
+        self.assertEqual(queue_notification_digests(batch_size=1), 1)
+
+        email = OutboundEmail.objects.get()
+        self.assertEqual(email.to, ['donor@example.com'])
+        self.assertLess(email.body.index('Rice'), email.body.index('Blankets'))
+        self.assertIn('https://example.com/b/', email.body)
+        self.assertNotIn('Already emailed', email.body)
+        # Recipients without an address are cleared too, rather than retried forever.
+        self.assertFalse(Notification.objects.filter(email_pending=True).exists())
+        self.assertEqual(queue_notification_digests(), 0)
+
+    def test_cron_route_needs_the_secret(self):
+        url = reverse('send_notification_digests_cron')
+        with self.assertLogs('django.request', 'WARNING'):
+            self.assertEqual(self.client.get(url).status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION='Bearer cron-secret')
+        self.assertEqual(response.json(), {'queued': 1})
@@ -6,5 +6,6 @@ urlpatterns = [
     path('', views.conversation_list, name='conversation_list'),
     path('<int:conversation_id>/', views.conversation_detail, name='conversation_detail'),
     path('<int:conversation_id>/check/', views.check_new_messages, name='check_new_messages'),
+    path('notifications/', views.notification_list, name='notification_list'),
 
 ]
\ No newline at end of file
@@ -1,13 +1,24 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db.models import Prefetch
+from core import metrics
+from core.query_budget import query_budget
+from users.models import CustomUser
 from .models import Conversation
 
+def _with_participants(conversations):
+    """Loads offers and participants (with their profiles) in two extra queries, not per row."""
+    return conversations.select_related('offer').prefetch_related(Prefetch(
+        'participants', queryset=CustomUser.objects.select_related('ngoprofile', 'donorprofile'),
+    ))
+
 @login_required
+@query_budget(donor=4, ngo=4)
 def conversation_list(request):
     """
     Displays a list of all conversations for the logged-in user.
     """
-    conversations = request.user.conversations.all().order_by('-updated_at')
+    conversations = _with_participants(request.user.conversations.all()).order_by('-updated_at')
     
     context = {
         'conversations': conversations
@@ -19,8 +30,9 @@ from .forms import MessageForm # We will create this form next
 # messaging/views.py
 
 @login_required
+@query_budget(donor=6)
 def conversation_detail(request, conversation_id):
-    conversation = get_object_or_404(Conversation, id=conversation_id, participants=request.user)
+    conversation = get_object_or_404(_with_participants(Conversation.objects.all()), id=conversation_id, participants=request.user)
     
     # --- CHANGE IS HERE ---
     # 1. Get all messages, ordered by timestamp (newest first)
@@ -44,7 +56,9 @@ def conversation_detail(request, conversation_id):
     context = {
         'conversation': conversation,
         'form': form,
-        'messages': messages  # 2. Pass the ordered messages into the context
+        # 2. Pass the ordered messages into the context. Not as 'messages':
+        # that would shadow the flash messages base.html renders.
+        'chat_messages': messages
     }
     return render(request, 'messaging/conversation_detail.html', context)
 
@@ -83,5 +97,20 @@ def check_new_messages(request, conversation_id):
         }
         for msg in new_messages
     ]
+    metrics.inc('kindway_message_polls_total', {'result': 'new' if messages_data else 'empty'})
     
-    return JsonResponse({'messages': messages_data})
\ No newline at end of file
+    return JsonResponse({'messages': messages_data})
+
+
+# --- Notifications ---
+from .models import Notification
+
+@login_required
+@query_budget(donor=4)
+def notification_list(request):
+    """
+    Shows the logged-in user their latest notifications and marks them as read.
+    """
+    notifications = list(request.user.notifications.all()[:50])
+    request.user.notifications.filter(is_read=False).update(is_read=True)
+    return render(request, 'messaging/notification_list.html', {'notifications': notifications})
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0007_alter_donorprofile_phone_number'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donorprofile',
+            index=models.Index(fields=['latitude', 'longitude'], name='users_donor_location_idx'),
+        ),
+    ]
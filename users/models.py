@@ -56,5 +56,11 @@ class DonorProfile(models.Model):
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Bounding-box prefilter for radius lookups (see core/geo.py).
+            models.Index(fields=['latitude', 'longitude'], name='users_donor_location_idx'),
+        ]
+
     def __str__(self):
         return self.full_name
\ No newline at end of file
@@ -0,0 +1,82 @@
+# users/services.py
+
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import get_template
+
+from core.cache import CacheNamespace
+from core.geo import geocode
+from core.mail import queue_mass_mail
+from .models import NGOProfile
+
+VERIFICATION_EMAIL_SUBJECT = "Congratulations! Your Kindway NGO Profile is Verified!"
+
+# Pincodes don't move; failed lookups (None) are not cached.
+pincode_cache = CacheNamespace('pincode_coords', timeout=30 * 24 * 60 * 60)
+
+
+@pincode_cache.memoize()
+def get_coords_from_pincode(pincode):
+    """
+    Returns (latitude, longitude) for an Indian pincode, or None if there is
+    no such place. Raises core.geo.GeocoderUnavailable if the geocoder failed.
+    Cached, so only the first search for a pincode waits on the geocoder.
+    """
+    return geocode(f"{pincode}, IN", raise_errors=True) # 'IN' limits search to India
+
+
+def profile_coordinates(user):
+    """Returns the (lat, lng) stored on the user's donor or NGO profile, or None."""
+    if not user.is_authenticated:
+        return None
+    profile_attr = {'DONOR': 'donorprofile', 'NGO': 'ngoprofile'}.get(user.user_type)
+    profile = getattr(user, profile_attr, None) if profile_attr else None
+    if profile is None or profile.latitude is None or profile.longitude is None:
+        return None
+    return (profile.latitude, profile.longitude)
+
+
+def bulk_verify_ngos(queryset):
+    """
+    Verifies every NGO profile in `queryset` and queues their verification emails.
+
+    Unlike queryset.update() on its own (which skips post_save and therefore
+    signals.send_verification_email), this still notifies every newly verified
+    NGO, but in a fixed number of queries: one UPDATE for the statuses, one
+    SELECT for the profiles still owed an email, one INSERT into the mail
+    queue and one UPDATE for the sent flags. Templates are loaded once per
+    batch. The send_queued_mail worker then delivers the batch over a single
+    connection.
+
+    Returns (number of profiles verified, number of emails queued).
+    """
+    profile_ids = list(queryset.values_list('pk', flat=True))
+    with transaction.atomic():
+        verified = NGOProfile.objects.filter(pk__in=profile_ids).exclude(
+            verification_status='VERIFIED',
+        ).update(verification_status='VERIFIED')
+
+        pending_email = list(
+            NGOProfile.objects.select_for_update()
+            .filter(pk__in=profile_ids, verification_status='VERIFIED', is_verification_email_sent=False)
+            .select_related('user')
+        )
+        if not pending_email:
+            return verified, 0
+
+        html_template = get_template('emails/ngo_verified.html')
+        text_template = get_template('emails/ngo_verified.txt')
+        queue_mass_mail(
+            (
+                VERIFICATION_EMAIL_SUBJECT,
+                text_template.render({'ngo_name': profile.ngo_name}),
+                settings.DEFAULT_FROM_EMAIL,
+                [profile.user.email],
+                html_template.render({'ngo_name': profile.ngo_name}),
+            )
+            for profile in pending_email
+        )
+        NGOProfile.objects.filter(pk__in=[profile.pk for profile in pending_email]).update(
+            is_verification_email_sent=True,
+        )
+    return verified, len(pending_email)
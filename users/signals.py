@@ -1,14 +1,15 @@
 # users/signals.py
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
+from core.mail import queue_mail
 from django.template.loader import render_to_string
 from django.conf import settings
 from .models import NGOProfile
 from .models import NGOProfile, DonorProfile
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
+from .services import VERIFICATION_EMAIL_SUBJECT
+from core.geo import geocode
+from donations.services import invalidate_ngo_requests
 
 @receiver(post_save, sender=DonorProfile)
 def geocode_donor_pincode(sender, instance, **kwargs):
@@ -17,16 +18,11 @@ def geocode_donor_pincode(sender, instance, **kwargs):
     """
     # Check if pincode was provided and coordinates are missing
     if instance.pincode and not (instance.latitude and instance.longitude):
-        geolocator = Nominatim(user_agent="kindway_donor_geocoder")
-        try:
-            # Add ", India" for better accuracy
-            location = geolocator.geocode(f"{instance.pincode}, India")
-            if location:
-                instance.latitude = location.latitude
-                instance.longitude = location.longitude
-                instance.save(update_fields=['latitude', 'longitude'])
-        except (GeocoderTimedOut, GeocoderUnavailable):
-            pass
+        # Add ", India" for better accuracy
+        coords = geocode(f"{instance.pincode}, India", user_agent="kindway_donor_geocoder")
+        if coords:
+            instance.latitude, instance.longitude = coords
+            instance.save(update_fields=['latitude', 'longitude'])
         
 @receiver(post_save, sender=NGOProfile)
 def geocode_ngo_address(sender, instance, created, **kwargs):
@@ -36,17 +32,18 @@ def geocode_ngo_address(sender, instance, created, **kwargs):
     """
     # Check if address was provided and coordinates are missing
     if instance.address and not (instance.latitude and instance.longitude):
-        geolocator = Nominatim(user_agent="kindway_app")
-        try:
-            location = geolocator.geocode(instance.address)
-            if location:
-                instance.latitude = location.latitude
-                instance.longitude = location.longitude
-                # Use update_fields to avoid triggering the signal again in a loop
-                instance.save(update_fields=['latitude', 'longitude'])
-        except (GeocoderTimedOut, GeocoderUnavailable):
-            # Handle cases where the geocoding service is unavailable
-            pass
+        # geocode() returns None when the geocoding service is unavailable
+        coords = geocode(instance.address)
+        if coords:
+            instance.latitude, instance.longitude = coords
+            # Use update_fields to avoid triggering the signal again in a loop
+            instance.save(update_fields=['latitude', 'longitude'])
+
+@receiver(post_save, sender=NGOProfile)
+@receiver(post_delete, sender=NGOProfile)
+def drop_cached_ngo_requests(sender, **kwargs):
+    """An NGO's location decides which donors see its requests as nearby."""
+    invalidate_ngo_requests()
 
 # The @receiver decorator connects this function to the post_save signal
 # for the NGOProfile model.
@@ -58,22 +55,21 @@ def send_verification_email(sender, instance, **kwargs):
     # Check if the NGO is verified AND if the email has NOT been sent yet
     if instance.verification_status == 'VERIFIED' and not instance.is_verification_email_sent:
         
-        # Prepare email content
-        subject = "Congratulations! Your Kindway NGO Profile is Verified!"
+        # Prepare email content (bulk approvals go through services.bulk_verify_ngos)
+        subject = VERIFICATION_EMAIL_SUBJECT
         ngo_user = instance.user
         
         # We will create these templates in the next step
         html_message = render_to_string('emails/ngo_verified.html', {'ngo_name': instance.ngo_name})
         plain_message = render_to_string('emails/ngo_verified.txt', {'ngo_name': instance.ngo_name})
 
-        # Send the email
-        send_mail(
+        # Queue the email; the send_queued_mail worker delivers it
+        queue_mail(
             subject,
             plain_message,
             settings.DEFAULT_FROM_EMAIL, # Sender's email
             [ngo_user.email],            # Recipient's email
             html_message=html_message,
-            fail_silently=False,
         )
 
         # Mark that the email has been sent to prevent re-sending
@@ -1,3 +1,39 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.messages import get_messages
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from geopy.exc import GeocoderTimedOut
+
+from core import cache as two_tier_cache
+from .models import CustomUser, NGOProfile
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class SearchNGOTests(TestCase):
+    def setUp(self):
+        two_tier_cache.clear()
+        ngo = CustomUser.objects.create_user('ngo', 'ngo@example.com', 'pw', user_type='NGO')
+        NGOProfile.objects.create(
+            user=ngo, ngo_name='Food Bank', address='Pune', latitude=18.52, longitude=73.85, verification_status='VERIFIED',
+        )
+
+    def search(self, **geocode):
+        with mock.patch('geopy.geocoders.Nominatim.geocode', **geocode):
+            response = self.client.get(reverse('search_ngo'), {'pincode': '411001'})
+        return response, [str(m) for m in get_messages(response.wsgi_request)]
+
+    def test_an_unknown_pincode_is_reported_as_not_found(self):
+        response, errors = self.search(return_value=None)
+        self.assertEqual(errors, ["Could not find a location for pincode 411001."])
+        self.assertEqual(response.context['nearby_ngos'], [])
+
+    def test_a_geocoder_failure_is_reported_as_an_outage_and_not_cached(self):
+        with self.assertLogs('core.geo', 'WARNING'):
+            response, errors = self.search(side_effect=GeocoderTimedOut("timed out"))
+        self.assertEqual(errors, ["The location service is unavailable. Please try again later."])
+        self.assertEqual(response.context['nearby_ngos'], [])
+
+        response, errors = self.search(return_value=mock.Mock(latitude=18.52, longitude=73.85))
+        self.assertEqual(errors, [])
+        self.assertEqual([n['user'].ngoprofile.ngo_name for n in response.context['nearby_ngos']], ['Food Bank'])
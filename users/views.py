@@ -4,14 +4,13 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q
 
-# Geopy Imports
-from geopy.distance import great_circle
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderUnavailable
+from core.geo import GeocoderUnavailable, distance_km
+from core.query_budget import query_budget
 
 # Model Imports
 from .models import CustomUser, Category, DonorProfile, NGOProfile
-from donations.models import NGORequest
+from donations.services import nearby_active_requests
+from .services import get_coords_from_pincode
 
 # Form Imports
 from .forms import (
@@ -44,21 +43,6 @@ def redirect_after_login(request):
         # Fallback for any other case
         return redirect('homepage')
         
-def get_coords_from_pincode(pincode):
-    """
-    Helper function to get (latitude, longitude) from a pincode.
-    """
-    try:
-        # Added a timeout to prevent hanging
-        geolocator = Nominatim(user_agent="kindway_app", timeout=5) 
-        location = geolocator.geocode(f"{pincode}, IN") # 'IN' limits search to India
-        if location:
-            return (location.latitude, location.longitude)
-        return None
-    except Exception as e:
-        print(f"Error geocoding: {e}")
-        return None
-
 # --- Views ---
 
 @login_required
@@ -114,6 +98,7 @@ def edit_donor_profile(request):
     return render(request, 'users/edit_donor_profile.html', {'form': form})
 
 
+@query_budget(anonymous=3, donor=4)
 def search_ngo(request):
     nearby_ngos = []
     searched_pincode = request.GET.get('pincode', '')
@@ -123,7 +108,7 @@ def search_ngo(request):
     base_query = CustomUser.objects.filter(
         user_type='NGO',
         ngoprofile__verification_status='VERIFIED'
-    )
+    ).select_related('ngoprofile').prefetch_related('ngoprofile__accepted_categories')
 
     if searched_name:
         base_query = base_query.filter(
@@ -133,24 +118,25 @@ def search_ngo(request):
     if searched_pincode:
         try:
             search_coords = get_coords_from_pincode(searched_pincode)
-            radius = int(radius)
-            
-            if search_coords:
-                for ngo_user in base_query:
-                    if ngo_user.ngoprofile.latitude and ngo_user.ngoprofile.longitude:
-                        ngo_coords = (ngo_user.ngoprofile.latitude, ngo_user.ngoprofile.longitude)
-                        distance = great_circle(search_coords, ngo_coords).km
-                        
-                        if distance <= radius:
-                            nearby_ngos.append({'user': ngo_user, 'distance': round(distance, 1)})
-                
-                nearby_ngos.sort(key=lambda x: x['distance'])
-            else:
+        except GeocoderUnavailable:
+            search_coords = None
+            messages.error(request, "The location service is unavailable. Please try again later.")
+        else:
+            if search_coords is None:
                 messages.error(request, f"Could not find a location for pincode {searched_pincode}.")
+        radius = int(radius)
         
-        except (GeocoderTimedOut, GeocoderUnavailable):
-            messages.error(request, "The location service is unavailable. Please try again later.")
-    
+        if search_coords:
+            for ngo_user in base_query:
+                if ngo_user.ngoprofile.latitude and ngo_user.ngoprofile.longitude:
+                    ngo_coords = (ngo_user.ngoprofile.latitude, ngo_user.ngoprofile.longitude)
+                    distance = distance_km(search_coords, ngo_coords)
+                    
+                    if distance <= radius:
+                        nearby_ngos.append({'user': ngo_user, 'distance': round(distance, 1)})
+            
+            nearby_ngos.sort(key=lambda x: x['distance'])
+
     elif searched_name:
         for ngo_user in base_query:
             nearby_ngos.append({'user': ngo_user, 'distance': None}) 
@@ -197,6 +183,7 @@ def ngo_register(request):
 
 # --- THIS IS THE UPDATED VIEW ---
 @login_required
+@query_budget(donor=4, ngo=3)
 def dashboard(request):
     
     # 1. NEW: Check for admin first
@@ -221,13 +208,7 @@ def dashboard(request):
         nearby_requests = []
         if donor_profile.latitude and donor_profile.longitude:
             donor_coords = (donor_profile.latitude, donor_profile.longitude)
-            all_requests = NGORequest.objects.filter(is_active=True).select_related('ngo__ngoprofile', 'category')
-            for req in all_requests:
-                if req.ngo.ngoprofile.latitude and req.ngo.ngoprofile.longitude:
-                    ngo_coords = (req.ngo.ngoprofile.latitude, req.ngo.ngoprofile.longitude)
-                    distance = great_circle(donor_coords, ngo_coords).km
-                    if distance <= 50: # 50km radius
-                        nearby_requests.append(req)
+            nearby_requests = nearby_active_requests(donor_coords, 50) # 50km radius
         
         return render(request, 'users/dashboard_donor.html', {'nearby_requests': nearby_requests})
     